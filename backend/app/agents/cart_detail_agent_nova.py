@@ -4,14 +4,20 @@ Cart Detail agent using Amazon Nova Act
 Extracts current cart contents from platforms
 """
 
-from nova_act import NovaAct
 from config.platforms import PLATFORM_CONFIGS
+from app.services.browser_allocator import browser_allocator
+from app.services.browser_profile import popup_report
 from models.cart_models import CartItem, PlatformCart, ItemStatus
+from app.agents.cart_extraction import CART_SCHEMA, CartExtraction, build_extraction_prompt, parse_cart_response
+from app.agents.scripted_flows import ScriptedFlowError, scripted_flow
+from app.config import settings
+from app.services.product_catalog import product_catalog
+from app.services.cart_state_store import cart_state_store
+from app.services.session_preflight import session_preflight
 import logging
 import os
 from dotenv import load_dotenv
-import re
-import json
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 load_dotenv()
@@ -22,47 +28,50 @@ if not nova_key:
     raise ValueError("NOVA_ACT_API_KEY environment variable not set")
 os.environ["NOVA_ACT_API_KEY"] = nova_key
 
-# Browser debugging port
-os.environ["NOVA_ACT_BROWSER_ARGS"] = "--remote-debugging-port=9222"
-
 
 class CartDetailAgentNova:
     """
     Extract cart details from platforms using Nova Act
     
-    Uses natural language queries to get cart contents
+    Uses natural language queries to get cart contents. With a user_id,
+    each extracted cart is also stored in that user's CartState.
     """
     
-    def __init__(self, platform_name: str):
+    def __init__(self, platform_name: str, user_id: Optional[str] = None):
         self.platform_name = platform_name
+        self.user_id = user_id
         self.config = PLATFORM_CONFIGS[platform_name]
         self.nova = None
+        self.lease = None
     
     def start_session(self):
         """Start a persistent Nova Act session"""
         if self.nova is None:
             logger.info(f"[{self.platform_name}] Starting cart detail session...")
             
-            # Convert relative path to absolute path for Windows compatibility
-            user_data_path = os.path.abspath(self.config["user_data_dir"])
-            
-            # Create directory if it doesn't exist
-            os.makedirs(user_data_path, exist_ok=True)
-            logger.info(f"[{self.platform_name}] User data directory: {user_data_path}")
+            # Debugging port plus the platform profile (a clone if another browser holds it)
+            self.lease = browser_allocator.lease(self.platform_name)
+            logger.info(f"[{self.platform_name}] User data directory: {self.lease.user_data_dir}, port {self.lease.port}")
             
-            self.nova = NovaAct(
-                starting_page=self.config["cart_url"],
-                user_data_dir=user_data_path
-            )
-            self.nova.start()
+            try:
+                self.nova = browser_allocator.start_nova(self.lease, starting_page=self.config["cart_url"])
+            except Exception:
+                self.lease.release()
+                self.lease = None
+                raise
             logger.info(f"[{self.platform_name}] Session started")
     
     def stop_session(self):
         """Stop the persistent Nova Act session"""
         if self.nova:
             logger.info(f"[{self.platform_name}] Stopping cart detail session...")
-            self.nova.stop()
-            self.nova = None
+            try:
+                self.nova.stop()
+            finally:
+                self.nova = None
+                if self.lease:
+                    self.lease.release()
+                    self.lease = None
     
     async def extract_cart_details(self) -> PlatformCart:
         """
@@ -72,7 +81,11 @@ class CartDetailAgentNova:
         import asyncio
         return await asyncio.to_thread(self._extract_cart_details_sync)
     
-    def _extract_cart_details_sync(self) -> PlatformCart:
+    def extract_on_session(self, nova) -> PlatformCart:
+        """Extract the cart on a NovaAct someone else started and will stop (e.g. the platform session manager)"""
+        return self._extract_cart_details_sync(nova)
+    
+    def _extract_cart_details_sync(self, nova=None) -> PlatformCart:
         """
         Synchronous implementation of cart detail extraction
         """
@@ -83,118 +96,119 @@ class CartDetailAgentNova:
         
         logger.info(f"[{self.platform_name}] Extracting cart details...")
         
-        # Start session
-        self.start_session()
+        # Start session, unless running on a shared one
+        if nova is None:
+            self.start_session()
+        else:
+            self.nova = nova
         
         try:
-            # Build instruction to extract cart details
-            instruction = (
-                "Go to the cart page. "
-                "List all items in the cart with their names, prices, and quantities. "
-                "If the cart is empty, say 'Cart is empty'. "
-                "Return the subtotal or total amount."
-            )
-            
-            # Execute
-            result = self.nova.act(instruction, max_steps=50)
-            logger.info(f"[{self.platform_name}] Cart extraction result: {result}")
+            # Read the cart page with selectors; the model only if they don't fit
+            result = self._scrape_cart()
+            if result is None:
+                # Ask for the cart as schema-constrained JSON
+                instruction = build_extraction_prompt("Go to the cart page.")
+                
+                # Execute
+                result = self.nova.act(instruction, max_steps=50, schema=CART_SCHEMA)
+                logger.info(f"[{self.platform_name}] Cart extraction result: {result}")
             
             # Parse the result
             cart = self._parse_cart_response(result)
+            cart.session_valid = session_preflight.check(self.platform_name).valid
+            self._record_products(cart)
+            if self.user_id:
+                cart_state_store.update_cart(self.user_id, cart)
             
             logger.info(f"[{self.platform_name}] Found {len(cart.items)} items, total: ${cart.total:.2f}")
+            self._log_popups()
         
         except Exception as e:
             logger.error(f"[{self.platform_name}] Cart detail extraction error: {e}")
             # Return empty cart on error
         
         finally:
-            self.stop_session()
+            if nova is None:
+                self.stop_session()
+            else:
+                self.nova = None
         
         return cart
     
-    def _parse_cart_response(self, response: str) -> PlatformCart:
+    def _log_popups(self):
+        popups = popup_report(self.nova)
+        if popups:
+            logger.info(f"[{self.platform_name}] Auto-dismissed {len(popups)} popup(s): {[p.get('popup') for p in popups]}")
+    
+    def _scrape_cart(self):
+        """CartExtraction from the scripted flow, or None to fall back to Nova Act"""
+        flow = scripted_flow(self.nova, self.platform_name)
+        if flow is None:
+            return None
+        try:
+            return flow.scrape_cart()
+        except ScriptedFlowError as e:
+            logger.info(f"[{self.platform_name}] Scripted cart scrape failed ({e}); using Nova Act")
+            return None
+    
+    def _record_products(self, cart: PlatformCart):
+        """Feed extracted products into the product catalog"""
+        if not settings.product_catalog_enabled or not cart.items:
+            return
+        try:
+            product_catalog.record_products(
+                self.platform_name,
+                self.config.get("store_name"),
+                [
+                    {"name": item.product_name, "price": item.price, "product_url": item.product_url, "sku": item.sku}
+                    for item in cart.items
+                ]
+            )
+        except Exception as e:
+            logger.warning(f"[{self.platform_name}] Could not update product catalog: {e}")
+    
+    def _parse_cart_response(self, response) -> PlatformCart:
         """
         Parse Nova Act's response to extract cart items
         
-        This is a best-effort parser. Nova's responses may vary.
+        Accepts the act result, its text, or a scraped CartExtraction; see
+        app.agents.cart_extraction for the JSON fast path and the tolerant fallbacks.
         """
         cart = PlatformCart(
             platform_name=self.platform_name,
             platform_id=self.config["merchant_id"]
         )
         
-        if not response or "empty" in response.lower():
+        extraction = response if isinstance(response, CartExtraction) else parse_cart_response(response)
+        if extraction.empty and not extraction.items:
             logger.info(f"[{self.platform_name}] Cart is empty")
             return cart
         
-        # Try to parse items from the response
-        # Look for patterns like:
-        # - "Item Name - $X.XX"
-        # - "Item Name: $X.XX"
-        # - "Item Name $X.XX x 2"
+        for item in extraction.items:
+            cart.add_item(CartItem(
+                ingredient_requested="",  # Unknown at extraction time
+                product_name=item.name,
+                product_url=item.product_url,
+                price=item.price,
+                quantity=item.quantity,
+                status=ItemStatus.ADDED,
+                confidence=item.confidence
+            ))
+            logger.debug(f"[{self.platform_name}] Parsed item: {item.name} - ${item.price} x {item.quantity} ({item.confidence:.2f})")
         
-        lines = response.split('\n')
+        if not extraction.items:
+            logger.warning(f"[{self.platform_name}] No cart items could be parsed from the response")
+        else:
+            logger.info(f"[{self.platform_name}] Parsed {len(extraction.items)} items via {extraction.method} (confidence {extraction.confidence:.2f})")
         
-        for line in lines:
-            # Skip empty lines and headers
-            if not line.strip() or len(line.strip()) < 5:
-                continue
-            
-            # Try to extract item name and price
-            # Pattern 1: Name - $X.XX
-            match = re.search(r'(.+?)\s*[-:]\s*\$(\d+\.?\d*)', line)
-            if not match:
-                # Pattern 2: Name $X.XX
-                match = re.search(r'(.+?)\s+\$(\d+\.?\d*)', line)
-            
-            if match:
-                item_name = match.group(1).strip()
-                price_str = match.group(2)
-                
-                # Skip if this looks like a total line
-                if any(keyword in item_name.lower() for keyword in ['total', 'subtotal', 'tax', 'fee', 'delivery']):
-                    continue
-                
-                try:
-                    price = float(price_str)
-                    
-                    # Try to extract quantity
-                    quantity = 1
-                    qty_match = re.search(r'x\s*(\d+)', line, re.IGNORECASE)
-                    if qty_match:
-                        quantity = int(qty_match.group(1))
-                    
-                    # Create cart item
-                    cart.add_item(CartItem(
-                        ingredient_requested="",  # Unknown at extraction time
-                        product_name=item_name,
-                        product_url="",
-                        price=price,
-                        quantity=quantity,
-                        status=ItemStatus.ADDED
-                    ))
-                    
-                    logger.debug(f"[{self.platform_name}] Parsed item: {item_name} - ${price} x {quantity}")
-                
-                except ValueError:
-                    logger.warning(f"[{self.platform_name}] Could not parse price from: {line}")
-                    continue
-        
-        # Try to extract total
-        total_match = re.search(r'(?:total|subtotal)[:\s]*\$(\d+\.?\d*)', response, re.IGNORECASE)
-        if total_match:
-            try:
-                total = float(total_match.group(1))
-                # Override calculated total with extracted total if available
-                cart.total = total
-                logger.info(f"[{self.platform_name}] Extracted total: ${total:.2f}")
-            except ValueError:
-                pass
+        # Override calculated total with extracted total if available
+        extracted_total = extraction.total if extraction.total is not None else extraction.subtotal
+        if extracted_total is not None:
+            cart.total = extracted_total
+            logger.info(f"[{self.platform_name}] Extracted total: ${extracted_total:.2f}")
         
         return cart
 
-
 def main():
     """
     CLI entry point for testing cart detail extraction
@@ -0,0 +1,401 @@
+"""
+Cart extraction shared by all Nova Act agents.
+
+Agents ask Nova Act for the cart as JSON constrained by CART_SCHEMA and hand
+whatever comes back to parse_cart_response(), which tries, in order:
+
+1. schema  - the act result's parsed_response, already validated by Nova Act
+2. json    - strict json.loads of the response text
+3. json_tolerant - the first JSON object/array embedded in the text, with
+   common drift repaired (code fences, trailing commas, "$" prices, aliased keys)
+4. lines   - the legacy "Item 1: name | Qty: n | Price: $x | Size: s" format
+   and loose "name - $x.xx x 2" lines
+
+When the platform's selectors fit the page, scripted_flows reads the cart off
+the DOM instead and from_scraped_rows() builds the extraction (no act call).
+
+Every item carries a confidence in [0, 1] reflecting how it was recovered and
+which fields were missing, so callers can tell a clean extraction from a
+best-effort one instead of silently losing items.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+CART_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "empty": {"type": "boolean"},
+        "items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "quantity": {"type": "integer"},
+                    "unit_price": {"type": "number"},
+                    "total_price": {"type": "number"},
+                    "size": {"type": "string"},
+                    "product_url": {"type": "string"}
+                },
+                "required": ["name", "quantity", "unit_price"]
+            }
+        },
+        "item_count": {"type": "integer"},
+        "subtotal": {"type": "number"},
+        "total": {"type": "number"}
+    },
+    "required": ["items"]
+}
+
+EXTRACTION_REQUEST = (
+    "For every item in the cart, report the product name, quantity, price per unit, "
+    "total price for that line, package size, and the product page link if one is shown. "
+    "Scroll if necessary so no item is missed. "
+    "Also report the number of items and the subtotal and total amounts. "
+    "If the cart is empty, return an empty items list and set empty to true. "
+    "Respond only with JSON matching the requested schema."
+)
+
+# Confidence by the path an item was recovered through
+METHOD_CONFIDENCE = {
+    "schema": 1.0,
+    "json": 0.95,
+    "json_tolerant": 0.85,
+    "lines": 0.7,
+    "loose_lines": 0.5,
+    "selectors": 0.9,  # Scraped from the cart page DOM (app.agents.scripted_flows)
+}
+
+_NAME_KEYS = ("name", "product_name", "product", "item", "title")
+_QTY_KEYS = ("quantity", "qty", "count")
+_UNIT_PRICE_KEYS = ("unit_price", "price", "price_per_unit", "unit_cost")
+_TOTAL_PRICE_KEYS = ("total_price", "line_total", "total", "price_total")
+_SIZE_KEYS = ("size", "package_size", "unit", "weight")
+_URL_KEYS = ("product_url", "url", "link")
+
+_PIPE_LINE = re.compile(
+    r"(.+?)\s*\|\s*Qty:\s*(\d+)\s*\|\s*Price:\s*\$?([\d,.]+)\s*(?:\|\s*Size:\s*(.+))?", re.IGNORECASE
+)
+_LOOSE_LINE = re.compile(r"(.+?)\s*[-:]?\s*\$(\d[\d,]*\.?\d*)")
+_LOOSE_QTY = re.compile(r"(?:x\s*(\d+)|qty:?\s*(\d+))", re.IGNORECASE)
+_ITEM_PREFIX = re.compile(r"^\s*(?:[-*•]|\d+[.)]|item\s*\d+\s*:)\s*", re.IGNORECASE)
+_SUBTOTAL = re.compile(r"subtotal[:\s]*\$?([\d,]+\.?\d*)", re.IGNORECASE)
+_TOTAL = re.compile(r"(?<!sub)total(?:\s+amount)?[:\s]*\$([\d,]+\.?\d*)", re.IGNORECASE)
+_ITEM_COUNT = re.compile(r"total items:\s*(\d+)", re.IGNORECASE)
+_SUMMARY_WORDS = ("total", "subtotal", "tax", "fee", "delivery", "tip", "discount", "savings")
+_EMPTY_CART = re.compile(r"\b(?:cart is empty|empty cart|no items in (?:your |the )?cart)\b", re.IGNORECASE)
+
+
+@dataclass
+class ExtractedItem:
+    name: str
+    quantity: int
+    unit_price: Optional[float]
+    total_price: Optional[float] = None
+    size: str = ""
+    confidence: float = 1.0
+    product_url: str = ""
+
+    @property
+    def price(self) -> float:
+        """Best available unit price"""
+        if self.unit_price is not None:
+            return self.unit_price
+        if self.total_price is not None and self.quantity:
+            return round(self.total_price / self.quantity, 2)
+        return 0.0
+
+
+@dataclass
+class CartExtraction:
+    items: List[ExtractedItem] = field(default_factory=list)
+    subtotal: Optional[float] = None
+    total: Optional[float] = None
+    item_count: Optional[int] = None
+    empty: bool = False
+    method: str = "none"
+
+    @property
+    def successful(self) -> bool:
+        return bool(self.items) or self.empty
+
+    @property
+    def confidence(self) -> float:
+        """Lowest item confidence (1.0 for a confirmed empty cart, 0.0 if nothing parsed)"""
+        if self.items:
+            return min(item.confidence for item in self.items)
+        return 1.0 if self.empty else 0.0
+
+
+def build_extraction_prompt(context: str = "") -> str:
+    """Platform context (where the cart is, how to reach it) plus the shared JSON request"""
+    return f"{context.strip()} {EXTRACTION_REQUEST}".strip()
+
+
+def extract_cart(nova, context: str = "", max_steps: int = 20) -> CartExtraction:
+    """Ask Nova Act for the cart as schema-constrained JSON and parse the answer"""
+    result = nova.act(build_extraction_prompt(context), max_steps=max_steps, schema=CART_SCHEMA)
+    return parse_cart_response(result)
+
+
+def response_text(response: Any) -> str:
+    """Text of an act result, or the value itself as a string"""
+    if hasattr(response, "response"):
+        return str(response.response or "")
+    return "" if response is None else str(response)
+
+
+def parse_cart_response(response: Any) -> CartExtraction:
+    """Parse an act result (or plain text/dict) into a CartExtraction, trying the fastest paths first"""
+    parsed = getattr(response, "parsed_response", None)
+    if isinstance(parsed, dict) and getattr(response, "matches_schema", True):
+        extraction = _from_json(parsed, "schema")
+        if extraction is not None:
+            return extraction
+
+    if isinstance(response, (dict, list)):
+        return _from_json(response, "json") or CartExtraction()
+
+    text = response_text(response)
+    if not text.strip():
+        return CartExtraction()
+
+    try:
+        extraction = _from_json(json.loads(text), "json")
+        if extraction is not None:
+            return extraction
+    except ValueError:
+        pass
+
+    data = _find_embedded_json(text)
+    if data is not None:
+        extraction = _from_json(data, "json_tolerant")
+        if extraction is not None:
+            return extraction
+
+    return _from_lines(text)
+
+
+def from_scraped_rows(rows: List[Dict[str, Any]], subtotal: Any = None) -> CartExtraction:
+    """Extraction from cart lines read off the page by scripted_flows"""
+    items = []
+    for raw in rows:
+        item = _item_from_dict(raw, METHOD_CONFIDENCE["selectors"])
+        if item is not None:
+            items.append(item)
+    return CartExtraction(
+        items=items,
+        subtotal=_to_float(subtotal),
+        empty=not rows,
+        method="selectors"
+    )
+
+
+def to_cart_json(extraction: CartExtraction) -> Dict[str, Any]:
+    """The cart_jsons/ file format read by build_knot_like_from_cart"""
+    subtotal = extraction.subtotal
+    return {
+        "item_count": extraction.item_count if extraction.item_count is not None else len(extraction.items),
+        "subtotal": f"{subtotal:.2f}" if subtotal is not None else "N/A",
+        "cart_items": [
+            {
+                "name": item.name,
+                "quantity": item.quantity,
+                "price": f"{item.price:.2f}",
+                "size": item.size,
+                "product_url": item.product_url,
+                "confidence": item.confidence
+            }
+            for item in extraction.items
+        ],
+        "extraction_successful": len(extraction.items) > 0,
+        "extraction_method": extraction.method,
+        "extraction_confidence": extraction.confidence
+    }
+
+
+# ==================== JSON PATHS ====================
+
+def _from_json(data: Any, method: str) -> Optional[CartExtraction]:
+    """Build an extraction from decoded JSON, or None if it isn't cart-shaped"""
+    if isinstance(data, list):
+        data = {"items": data}
+    if not isinstance(data, dict):
+        return None
+
+    raw_items = data.get("items")
+    if raw_items is None:
+        raw_items = data.get("cart_items", data.get("products"))
+    if not isinstance(raw_items, list):
+        return None
+
+    base_confidence = METHOD_CONFIDENCE[method]
+    items = []
+    for raw in raw_items:
+        if not isinstance(raw, dict):
+            continue
+        item = _item_from_dict(raw, base_confidence)
+        if item is not None:
+            items.append(item)
+
+    return CartExtraction(
+        items=items,
+        subtotal=_to_float(data.get("subtotal")),
+        total=_to_float(data.get("total")),
+        item_count=_to_int(data.get("item_count")),
+        empty=bool(data.get("empty")) or not raw_items,
+        method=method
+    )
+
+
+def _item_from_dict(raw: Dict[str, Any], base_confidence: float) -> Optional[ExtractedItem]:
+    name = _first(raw, _NAME_KEYS)
+    if not name or not str(name).strip():
+        return None
+
+    confidence = base_confidence
+    quantity = _to_int(_first(raw, _QTY_KEYS))
+    if quantity is None or quantity <= 0:
+        quantity = 1
+        confidence -= 0.1
+    unit_price = _to_float(_first(raw, _UNIT_PRICE_KEYS))
+    total_price = _to_float(_first(raw, _TOTAL_PRICE_KEYS))
+    if unit_price is None and total_price is None:
+        confidence -= 0.3
+    size = _first(raw, _SIZE_KEYS)
+    url = _first(raw, _URL_KEYS)
+
+    return ExtractedItem(
+        name=str(name).strip(),
+        quantity=quantity,
+        unit_price=unit_price,
+        total_price=total_price,
+        size=str(size).strip() if size is not None else "",
+        confidence=round(max(confidence, 0.0), 2),
+        product_url=str(url).strip() if url is not None else ""
+    )
+
+
+def _find_embedded_json(text: str) -> Optional[Any]:
+    """First decodable JSON object or array in free text, after light repairs"""
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    candidates = [fenced.group(1)] if fenced else []
+    for opener in ("{", "["):
+        start = text.find(opener)
+        if start != -1:
+            candidates.append(text[start:])
+
+    decoder = json.JSONDecoder()
+    for candidate in candidates:
+        candidate = candidate.strip()
+        for attempt in (candidate, _repair_json(candidate)):
+            try:
+                data, _ = decoder.raw_decode(attempt)
+                return data
+            except ValueError:
+                continue
+    return None
+
+
+def _repair_json(text: str) -> str:
+    text = re.sub(r",\s*([}\]])", r"\1", text)  # trailing commas
+    text = re.sub(r":\s*\$(\d)", r": \1", text)  # "price": $3.99
+    text = re.sub(r"(?<=[{,])\s*'([^']+)'\s*:", r'"\1":', text)  # 'key':
+    text = re.sub(r":\s*'([^']*)'", r': "\1"', text)  # : 'value'
+    text = re.sub(r"\bTrue\b", "true", re.sub(r"\bFalse\b", "false", text))
+    return text
+
+
+# ==================== LINE PATHS ====================
+
+def _from_lines(text: str) -> CartExtraction:
+    items = []
+    method = "none"
+
+    for line in text.splitlines():
+        match = _PIPE_LINE.search(line)
+        if match:
+            name = _ITEM_PREFIX.sub("", match.group(1)).strip()
+            if not name:
+                continue
+            size = (match.group(4) or "").strip()
+            confidence = METHOD_CONFIDENCE["lines"] - (0 if size else 0.1)
+            items.append(ExtractedItem(
+                name=name,
+                quantity=int(match.group(2)),
+                unit_price=_to_float(match.group(3)),
+                size=size,
+                confidence=round(confidence, 2)
+            ))
+            method = "lines"
+
+    if not items:
+        items = _from_loose_lines(text)
+        if items:
+            method = "loose_lines"
+
+    subtotal = _SUBTOTAL.search(text)
+    total = _TOTAL.search(text)
+    count = _ITEM_COUNT.search(text)
+    return CartExtraction(
+        items=items,
+        subtotal=_to_float(subtotal.group(1)) if subtotal else None,
+        total=_to_float(total.group(1)) if total else None,
+        item_count=int(count.group(1)) if count else None,
+        empty=not items and bool(_EMPTY_CART.search(text)),
+        method=method
+    )
+
+
+def _from_loose_lines(text: str) -> List[ExtractedItem]:
+    """Best effort for free-form lines like 'Whole Milk - $3.99 x 2'"""
+    items = []
+    for line in text.splitlines():
+        line = line.strip()
+        if len(line) < 5:
+            continue
+        match = _LOOSE_LINE.search(line)
+        if not match:
+            continue
+        name = _ITEM_PREFIX.sub("", match.group(1)).strip(" -:")
+        if not name or any(word in name.lower() for word in _SUMMARY_WORDS):
+            continue
+        qty_match = _LOOSE_QTY.search(line)
+        quantity = int(qty_match.group(1) or qty_match.group(2)) if qty_match else 1
+        items.append(ExtractedItem(
+            name=name,
+            quantity=quantity,
+            unit_price=_to_float(match.group(2)),
+            confidence=METHOD_CONFIDENCE["loose_lines"]
+        ))
+    return items
+
+
+# ==================== HELPERS ====================
+
+def _first(data: Dict[str, Any], keys) -> Any:
+    for key in keys:
+        if data.get(key) not in (None, ""):
+            return data[key]
+    return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r"-?\d[\d,]*\.?\d*", str(value))
+    if not match:
+        return None
+    try:
+        return float(match.group(0).replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    number = _to_float(value)
+    return int(number) if number is not None else None
@@ -4,13 +4,18 @@ Edit Cart agent using Amazon Nova Act
 Applies user edits (diffs) to platform carts
 """
 
-from nova_act import NovaAct
 from config.platforms import PLATFORM_CONFIGS
-from models.cart_models import CartDiff, PlatformCart
+from app.services.browser_allocator import browser_allocator
+from app.services.browser_profile import popup_report
+from app.services.cart_state_store import cart_state_store
+from app.agents.scripted_flows import PartialAddError, ScriptedFlowError, scripted_flow
+from app.services.product_catalog import name_tokens
+from models.cart_models import CartDiff, DiffResult, NetChange, PlatformCart, compact_diffs, item_key
 import logging
 import os
+from dataclasses import replace
 from dotenv import load_dotenv
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 load_dotenv()
@@ -21,138 +26,321 @@ if not nova_key:
     raise ValueError("NOVA_ACT_API_KEY environment variable not set")
 os.environ["NOVA_ACT_API_KEY"] = nova_key
 
-# Browser debugging port
-os.environ["NOVA_ACT_BROWSER_ARGS"] = "--remote-debugging-port=9222"
+# Per-item outcome of a batched edit pass
+EDIT_RESULT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "done": {"type": "boolean"}
+                },
+                "required": ["name", "done"]
+            }
+        }
+    },
+    "required": ["results"]
+}
 
 
 class EditCartAgentNova:
     """
     Apply user edits to platform carts using Nova Act
     
-    Processes CartDiff objects and applies changes to actual carts
+    Folds CartDiff objects into net changes and applies them to actual carts
+    in two batched passes (cart page, then search). With a user_id, the
+    user's CartState supplies pending diffs and the known cart, and records
+    which diffs were applied.
     """
     
-    def __init__(self, platform_name: str):
+    def __init__(self, platform_name: str, user_id: Optional[str] = None):
         self.platform_name = platform_name
+        self.user_id = user_id
         self.config = PLATFORM_CONFIGS[platform_name]
         self.nova = None
+        self.lease = None
     
     def start_session(self):
         """Start a persistent Nova Act session"""
         if self.nova is None:
             logger.info(f"[{self.platform_name}] Starting edit cart session...")
             
-            # Convert relative path to absolute path for Windows compatibility
-            user_data_path = os.path.abspath(self.config["user_data_dir"])
+            # Debugging port plus the platform profile (a clone if another browser holds it)
+            self.lease = browser_allocator.lease(self.platform_name)
+            logger.info(f"[{self.platform_name}] User data directory: {self.lease.user_data_dir}, port {self.lease.port}")
             
-            # Create directory if it doesn't exist
-            os.makedirs(user_data_path, exist_ok=True)
-            logger.info(f"[{self.platform_name}] User data directory: {user_data_path}")
-            
-            self.nova = NovaAct(
-                starting_page=self.config["cart_url"],
-                user_data_dir=user_data_path
-            )
-            self.nova.start()
+            try:
+                self.nova = browser_allocator.start_nova(self.lease, starting_page=self.config["cart_url"])
+            except Exception:
+                self.lease.release()
+                self.lease = None
+                raise
             logger.info(f"[{self.platform_name}] Session started")
     
     def stop_session(self):
         """Stop the persistent Nova Act session"""
         if self.nova:
             logger.info(f"[{self.platform_name}] Stopping edit cart session...")
-            self.nova.stop()
-            self.nova = None
+            try:
+                self.nova.stop()
+            finally:
+                self.nova = None
+                if self.lease:
+                    self.lease.release()
+                    self.lease = None
     
-    async def apply_diffs(self, diffs: List[CartDiff]) -> bool:
+    async def apply_diffs(self, diffs: List[CartDiff], cart: Optional[PlatformCart] = None) -> bool:
         """
         Public async API expected by orchestrators.
         Runs synchronous NovaAct in a background thread.
         
         Args:
             diffs: List of CartDiff objects to apply
+            cart: Last known platform cart, used to fold the diffs into net changes
         
         Returns:
             True if all diffs applied successfully
         """
+        results = await self.apply_diffs_detailed(diffs, cart)
+        return all(result.success for result in results)
+    
+    async def apply_pending_diffs(self) -> List[DiffResult]:
+        """Apply the user's pending diffs for this platform from the cart state store"""
+        if not self.user_id:
+            raise ValueError("apply_pending_diffs needs a user_id")
+        state = cart_state_store.get(self.user_id)
+        return await self.apply_diffs_detailed(state.get_pending_diffs(self.platform_name))
+    
+    async def apply_diffs_detailed(self, diffs: List[CartDiff], cart: Optional[PlatformCart] = None) -> List[DiffResult]:
+        """
+        Like apply_diffs, but returns one DiffResult per diff (in input order)
+        so failed diffs can be retried on their own
+        """
         import asyncio
-        return await asyncio.to_thread(self._apply_diffs_sync, diffs)
+        return await asyncio.to_thread(self._apply_diffs_sync, diffs, cart)
+    
+    def apply_on_session(self, nova, diffs: List[CartDiff], cart: Optional[PlatformCart] = None) -> List[DiffResult]:
+        """Apply diffs on a NovaAct someone else started and will stop (e.g. the platform session manager)"""
+        return self._apply_diffs_sync(diffs, cart, nova=nova)
     
-    def _apply_diffs_sync(self, diffs: List[CartDiff]) -> bool:
+    def _apply_diffs_sync(self, diffs: List[CartDiff], cart: Optional[PlatformCart] = None, nova=None) -> List[DiffResult]:
         """
         Synchronous implementation of diff application
+        
+        Folds the diffs into net changes (compact_diffs), then applies every
+        removal and quantity change in one pass over the cart page and every
+        addition in one search pass. Each pass tries the scripted flow per
+        change and hands what's left to a single Nova Act instruction.
         """
         if not diffs:
             logger.info(f"[{self.platform_name}] No diffs to apply")
-            return True
-        
-        logger.info(f"[{self.platform_name}] Applying {len(diffs)} cart edits...")
+            return []
         
-        # Start session
-        self.start_session()
-        
-        success_count = 0
+        if cart is None and self.user_id:
+            cart = cart_state_store.get(self.user_id).get_cart(self.platform_name)
+        changes, cancelled = compact_diffs(diffs, cart)
+        outcome: Dict[int, DiffResult] = {
+            id(diff): DiffResult(diff=diff, success=True, net_action="noop") for diff in cancelled
+        }
+        logger.info(
+            f"[{self.platform_name}] {len(diffs)} cart edits folded into {len(changes)} changes "
+            f"({len(cancelled)} cancelled out)"
+        )
         
-        try:
-            for idx, diff in enumerate(diffs):
-                logger.info(f"[{self.platform_name}] Applying diff {idx + 1}/{len(diffs)}: {diff.action} - {diff.item.product_name}")
+        if changes:
+            # Start session, unless running on a shared one
+            if nova is None:
+                self.start_session()
+            else:
+                self.nova = nova
+            
+            try:
+                flow = scripted_flow(self.nova, self.platform_name)
+                cart_changes = [c for c in changes if c.action in ("remove", "update_quantity")]
+                add_changes = [c for c in changes if c.action == "add"]
                 
-                try:
-                    # Build instruction based on action
-                    if diff.action == "remove":
-                        instruction = self._build_remove_instruction(diff)
-                    elif diff.action == "add":
-                        instruction = self._build_add_instruction(diff)
-                    else:
-                        logger.warning(f"[{self.platform_name}] Unknown action: {diff.action}")
-                        continue
-                    
-                    # Execute the instruction
-                    result = self.nova.act(instruction, max_steps=50)
-                    logger.info(f"[{self.platform_name}] Diff applied: {result}")
-                    
-                    # Mark diff as applied
-                    diff.applied = True
-                    success_count += 1
+                for change, error in self._apply_pass(flow, cart_changes, self._build_cart_pass_instruction):
+                    self._record_outcome(outcome, change, error)
+                for change, error in self._apply_pass(flow, add_changes, self._build_add_pass_instruction):
+                    self._record_outcome(outcome, change, error)
                 
-                except Exception as e:
-                    logger.error(f"[{self.platform_name}] Error applying diff {idx + 1}: {e}")
-                    # Continue with next diff even if this one fails
-                    continue
+                if flow is not None:
+                    logger.info(f"[{self.platform_name}] Scripted steps: {flow.summary()}")
+                popups = popup_report(self.nova)
+                if popups:
+                    logger.info(f"[{self.platform_name}] Auto-dismissed {len(popups)} popup(s): {[p.get('popup') for p in popups]}")
             
-            logger.info(f"[{self.platform_name}] Applied {success_count}/{len(diffs)} diffs successfully")
+            finally:
+                if nova is None:
+                    self.stop_session()
+                else:
+                    self.nova = None
         
-        finally:
-            self.stop_session()
+        results = []
+        for diff in diffs:
+            result = outcome.get(id(diff)) or DiffResult(diff=diff, success=False, net_action="none", error="Not applied")
+            if result.success:
+                diff.applied = True
+            results.append(result)
         
-        return success_count == len(diffs)
+        applied = [result.diff for result in results if result.success]
+        if self.user_id and applied:
+            cart_state_store.mark_diffs_applied(self.user_id, self.platform_name, applied)
+        logger.info(f"[{self.platform_name}] Applied {len(applied)}/{len(diffs)} diffs successfully")
+        return results
+    
+    def _record_outcome(self, outcome: Dict[int, DiffResult], change: NetChange, error: Optional[str]):
+        for diff in change.diffs:
+            outcome[id(diff)] = DiffResult(diff=diff, success=error is None, net_action=change.action, error=error)
     
-    def _build_remove_instruction(self, diff: CartDiff) -> str:
-        """Build instruction to remove an item from cart"""
-        item_name = diff.item.product_name
+    def _apply_pass(self, flow, changes: List[NetChange], build_instruction) -> List[Tuple[NetChange, Optional[str]]]:
+        """
+        Apply changes with the scripted flow, then the rest with one Nova Act call.
         
-        instruction = (
-            "Go to the cart page. "
-            f"Find the item named '{item_name}'. "
-            "Remove it from the cart. "
-            "Confirm the removal if prompted. "
-            "Return the updated cart total."
-        )
+        Returns:
+            (change, error or None) for every change
+        """
+        done = []
+        remaining = []
+        for change in changes:
+            logger.info(f"[{self.platform_name}] Applying {change.action} x{change.quantity} - {change.item.product_name}")
+            left = self._apply_scripted(flow, change) if flow is not None else change
+            if left is None:
+                done.append((change, None))
+            else:
+                remaining.append(left)
         
-        return instruction
+        if not remaining:
+            return done
+        
+        try:
+            result = self.nova.act(
+                build_instruction(remaining),
+                max_steps=20 + 15 * len(remaining),
+                schema=EDIT_RESULT_SCHEMA
+            )
+            logger.info(f"[{self.platform_name}] Edit pass result: {result}")
+        except Exception as e:
+            logger.error(f"[{self.platform_name}] Edit pass failed: {e}")
+            return done + [(change, str(e)) for change in remaining]
+        
+        reported = self._reported_results(result)
+        if reported is None:
+            # Steps ran but nothing says which: leave the diffs pending for the next run
+            return done + [(change, "No result reported by the agent") for change in remaining]
+        confirmed = self._reported_done(reported, [change.item.product_name for change in remaining])
+        for change, ok in zip(remaining, confirmed):
+            if ok:
+                done.append((change, None))
+            else:
+                done.append((change, "Not confirmed by the agent"))
+        return done
+    
+    def _reported_results(self, result) -> Optional[List[Tuple[str, bool]]]:
+        """[(name, done)] from the act's schema answer, or None if there is none"""
+        parsed = getattr(result, "parsed_response", None)
+        if not isinstance(parsed, dict) or not isinstance(parsed.get("results"), list):
+            return None
+        return [
+            (str(entry.get("name", "")), bool(entry.get("done")))
+            for entry in parsed["results"]
+            if isinstance(entry, dict)
+        ]
+    
+    def _reported_done(self, reported: List[Tuple[str, bool]], product_names: List[str]) -> List[bool]:
+        """
+        Whether the agent reported each product as done. An entry matches a
+        product with the same item_key, or else one whose name tokens it all
+        contains (the agent often adds brands or sizes). Each entry is used
+        for one product at most; products without a match count as not done.
+        """
+        results = [False] * len(product_names)
+        matched = set()
+        unused = list(range(len(reported)))
+        for index, product_name in enumerate(product_names):
+            key = item_key(product_name)
+            for entry in unused:
+                if item_key(reported[entry][0]) == key:
+                    results[index] = reported[entry][1]
+                    matched.add(index)
+                    unused.remove(entry)
+                    break
+        for index, product_name in enumerate(product_names):
+            if index in matched:
+                continue
+            wanted = set(name_tokens(product_name))
+            if not wanted:
+                continue
+            for entry in unused:
+                if wanted <= set(name_tokens(reported[entry][0])):
+                    results[index] = reported[entry][1]
+                    unused.remove(entry)
+                    break
+        return results
     
-    def _build_add_instruction(self, diff: CartDiff) -> str:
-        """Build instruction to add an item to cart"""
-        item_name = diff.item.product_name
-        quantity = diff.item.quantity
+    def _apply_scripted(self, flow, change: NetChange) -> Optional[NetChange]:
+        """
+        Apply a change with the scripted flow.
         
-        instruction = (
-            f"Search for '{item_name}'. "
-            f"Add {quantity} to cart. "
-            "Return the updated cart total."
+        Returns:
+            None if it was applied, else what is left for Nova Act: the change
+            itself, or after a partial add only the units still missing
+        """
+        name = change.item.product_name
+        try:
+            if change.action == "remove":
+                flow.remove_item(name)
+            elif change.action == "add":
+                flow.search_and_add({"query": name, "product_name": name, "quantity": change.quantity})
+            else:
+                return change
+        except PartialAddError as e:
+            missing = change.quantity - e.added
+            if missing <= 0:
+                logger.info(f"[{self.platform_name}] Applied by scripted flow (unconfirmed: {e}): add - {name}")
+                flow.record(change.action, True)
+                return None
+            flow.record(change.action, False)
+            logger.info(f"[{self.platform_name}] Scripted add stopped for {name} after {e.added} ({e}); Nova Act adds {missing}")
+            return NetChange(platform=change.platform, action="add", item=replace(change.item, quantity=missing), diffs=change.diffs)
+        except ScriptedFlowError as e:
+            logger.info(f"[{self.platform_name}] Scripted {change.action} failed for {name} ({e}); using Nova Act")
+            flow.record(change.action, False)
+            return change
+        logger.info(f"[{self.platform_name}] Applied by scripted flow: {change.action} - {name}")
+        flow.record(change.action, True)
+        return None
+    
+    def _build_cart_pass_instruction(self, changes: List[NetChange]) -> str:
+        """Build one instruction for all removals and quantity changes on the cart page"""
+        instruction = "Go to the cart page. "
+        for change in changes:
+            item_name = change.item.product_name
+            if change.action == "remove":
+                instruction += (
+                    f"Find the item named '{item_name}' and remove it from the cart. "
+                    "Confirm the removal if prompted. "
+                )
+            else:
+                instruction += f"Find the item named '{item_name}' and set its quantity to {change.quantity}. "
+        instruction += (
+            "Stay on the cart page for all of these. "
+            "Return, for each item named above, its name and whether the change was made."
         )
         
         return instruction
-
+    
+    def _build_add_pass_instruction(self, changes: List[NetChange]) -> str:
+        """Build one instruction that searches for and adds every item"""
+        instruction = ""
+        for change in changes:
+            instruction += f"Search for '{change.item.product_name}'. Add {change.quantity} to cart. "
+        instruction += "Return, for each item named above, its name and whether it was added to the cart."
+        
+        return instruction
 
 def main():
     """
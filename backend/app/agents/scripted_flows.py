@@ -0,0 +1,322 @@
+"""
+Scripted Playwright flows for the common page flows: store search,
+add-to-cart, cart scraping and cart line removal.
+
+Each step drives the NovaAct browser's Playwright page directly with the
+platform's CSS selectors (PLATFORM_CONFIGS[...]["selectors"]) and takes well
+under a second, where the same step as a nova.act() prompt takes several
+model round trips. A step that can't find its selector, or can't confirm its
+effect, raises ScriptedFlowError; callers catch it and hand that step to
+Nova Act, so the scripted path only ever makes runs faster. Once an add has
+put units in the cart, a later failure raises PartialAddError with the
+units added, and the fallback only adds the rest.
+
+Uses the Playwright sync API through nova.page, so flows must run on the
+thread that started the NovaAct.
+"""
+import logging
+import re
+import time
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.agents import cart_extraction
+from app.services.product_catalog import name_tokens
+from config.platforms import PLATFORM_CONFIGS
+
+logger = logging.getLogger(__name__)
+
+# Returns one {name, price, quantity, size, product_url} per cart line
+_SCRAPE_ROWS_JS = """
+(rows, sel) => rows.map(row => {
+    const read = (selector) => {
+        if (!selector) return "";
+        const el = row.querySelector(selector);
+        if (!el) return "";
+        return ((el.value !== undefined && el.value !== "") ? String(el.value) : el.innerText || "").trim();
+    };
+    const link = row.querySelector("a[href]");
+    return {
+        name: read(sel.name),
+        price: read(sel.price),
+        quantity: read(sel.quantity),
+        size: read(sel.size),
+        product_url: link ? link.href : ""
+    };
+})
+"""
+
+
+class ScriptedFlowError(Exception):
+    """A scripted step could not run or confirm its effect; fall back to Nova Act"""
+
+
+class PartialAddError(ScriptedFlowError):
+    """An add failed after some units reached the cart; the fallback must not add them again"""
+
+    def __init__(self, message: str, added: int, product_name: str = ""):
+        super().__init__(message)
+        self.added = added
+        self.product_name = product_name
+
+
+class ScriptedFlow:
+    """Selector-driven steps on one platform's page, with hit/fallback counters"""
+
+    def __init__(self, platform: str, page, timeout_ms: int = 8000):
+        self.platform = platform
+        self.page = page
+        self.timeout_ms = timeout_ms
+        self.config = PLATFORM_CONFIGS[platform]
+        self.selectors: Dict[str, str] = self.config.get("selectors", {})
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    # ==================== COUNTERS ====================
+
+    def record(self, step: str, scripted: bool):
+        """Count a step as done by the script or handed to Nova Act"""
+        counts = self.stats.setdefault(step, {"scripted": 0, "fallback": 0})
+        counts["scripted" if scripted else "fallback"] += 1
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{step} {counts['scripted']}/{counts['scripted'] + counts['fallback']}"
+            for step, counts in self.stats.items()
+        ) or "no steps"
+
+    # ==================== SEARCH AND ADD ====================
+
+    def search_and_add(self, task: Dict) -> None:
+        """
+        Add one item task to the cart without the model.
+
+        Opens the task's known product_url, or searches the current store for
+        the task's query and picks the best-matching result, then clicks add
+        and the "+" stepper until the task quantity is in the cart.
+
+        Raises:
+            PartialAddError: If a step fails after units were added
+            ScriptedFlowError: If any other step fails or the add can't be confirmed
+        """
+        quantity = max(1, int(task.get("quantity") or 1))
+        count_before = self._cart_count()
+
+        if task.get("product_url"):
+            self._goto(task["product_url"])
+            scope = self.page
+            product_name = task.get("product_name") or ""
+        else:
+            self._search(task["query"])
+            scope, product_name = self._pick_card(task.get("product_name") or task["query"], exact=bool(task.get("product_name")))
+
+        self._click(scope.locator(self._selector("add_button")).first, "add button")
+        try:
+            self._confirm_added(scope, count_before)
+        except ScriptedFlowError as e:
+            # The click went through: count it as added unless the cart badge says otherwise
+            if self._cart_count() == count_before and count_before is not None:
+                raise
+            raise PartialAddError(str(e), added=1, product_name=product_name) from e
+        added = 1
+        for _ in range(quantity - 1):
+            try:
+                self._click(scope.locator(self._selector("increment_button")).first, "increment button")
+            except ScriptedFlowError as e:
+                raise PartialAddError(str(e), added=added, product_name=product_name) from e
+            added += 1
+            self.page.wait_for_timeout(250)
+
+    def _search(self, query: str):
+        box = self.page.locator(self._selector("search_input")).first
+        try:
+            box.wait_for(state="visible", timeout=self.timeout_ms)
+            box.fill(query, timeout=self.timeout_ms)
+            box.press("Enter")
+            self.page.locator(self._selector("product_card")).first.wait_for(state="visible", timeout=self.timeout_ms)
+        except Exception as e:
+            raise ScriptedFlowError(f"search for '{query}' failed: {e}") from e
+
+    def _pick_card(self, name: str, exact: bool):
+        """
+        (card, title) of the result titled exactly name (when exact), else the
+        first whose title has every query token. Anything looser picks a
+        different product too often ("almond milk" for "milk chocolate"), so
+        no such result is a ScriptedFlowError and the step goes to Nova Act.
+        """
+        cards = self.page.locator(self._selector("product_card"))
+        wanted = name_tokens(name)
+        if not wanted:
+            raise ScriptedFlowError(f"nothing to match in '{name}'")
+        best, best_title = None, None
+        for index in range(min(cards.count(), 30)):
+            card = cards.nth(index)
+            try:
+                title = card.locator(self._selector("product_name")).first.inner_text(timeout=1000)
+            except Exception:
+                continue
+            if exact and title.strip().lower() == name.strip().lower():
+                return card, title.strip()
+            if best is None and set(wanted) <= set(name_tokens(title)):
+                if not exact:
+                    return card, title.strip()
+                best, best_title = card, title.strip()
+        if best is None:
+            raise ScriptedFlowError(f"no search result matching '{name}'")
+        return best, best_title
+
+    def _confirm_added(self, scope, count_before: Optional[int]):
+        """The cart badge went up or the card now shows its "+" stepper"""
+        deadline = time.monotonic() + self.timeout_ms / 1000
+        stepper = scope.locator(self._selector("increment_button")).first if self.selectors.get("increment_button") else None
+        while time.monotonic() < deadline:
+            count = self._cart_count()
+            if count is not None and count_before is not None and count > count_before:
+                return
+            try:
+                if stepper is not None and stepper.is_visible():
+                    return
+            except Exception:
+                pass
+            self.page.wait_for_timeout(200)
+        raise ScriptedFlowError("add to cart was not confirmed")
+
+    # ==================== CART ====================
+
+    def scrape_cart(self) -> cart_extraction.CartExtraction:
+        """
+        Read the cart page's lines with selectors.
+
+        Raises:
+            ScriptedFlowError: If the page shows neither cart lines nor the empty-cart marker
+        """
+        self._goto(self.config["cart_url"], only_if_elsewhere=True)
+        rows_selector = self._selector("cart_item")
+        ready = self.page.locator(rows_selector)
+        if self.selectors.get("cart_empty"):
+            ready = ready.or_(self.page.locator(self.selectors["cart_empty"]))
+        try:
+            ready.first.wait_for(state="visible", timeout=self.timeout_ms)
+        except Exception:
+            if not self._is_visible("cart_empty"):
+                raise ScriptedFlowError("cart page did not show items or an empty cart")
+
+        fields = {
+            "name": self.selectors.get("cart_item_name"),
+            "price": self.selectors.get("cart_item_price"),
+            "quantity": self.selectors.get("cart_item_quantity"),
+            "size": self.selectors.get("cart_item_size"),
+        }
+        try:
+            rows = self.page.eval_on_selector_all(rows_selector, _SCRAPE_ROWS_JS, fields)
+        except Exception as e:
+            raise ScriptedFlowError(f"cart scrape failed: {e}") from e
+
+        if not rows:
+            if self._is_visible("cart_empty"):
+                return cart_extraction.CartExtraction(empty=True, method="selectors")
+            raise ScriptedFlowError("no cart lines found")
+
+        subtotal = None
+        if self.selectors.get("cart_subtotal"):
+            try:
+                subtotal = self.page.locator(self.selectors["cart_subtotal"]).first.inner_text(timeout=1000)
+            except Exception:
+                subtotal = None
+
+        extraction = cart_extraction.from_scraped_rows(rows, subtotal=subtotal)
+        # A line without a name or price means the selectors no longer fit the page
+        if len(extraction.items) < len(rows) or any(item.unit_price is None for item in extraction.items):
+            raise ScriptedFlowError("cart lines did not match the selectors")
+        return extraction
+
+    def remove_item(self, name: str) -> None:
+        """
+        Remove the cart line best matching name from the cart page.
+
+        Raises:
+            ScriptedFlowError: If no line matches or it is still there afterwards
+        """
+        self._goto(self.config["cart_url"], only_if_elsewhere=True)
+        rows = self.page.locator(self._selector("cart_item"))
+        try:
+            rows.first.wait_for(state="visible", timeout=self.timeout_ms)
+        except Exception as e:
+            raise ScriptedFlowError(f"cart page shows no items: {e}") from e
+
+        wanted = name.strip().lower()
+        match = None
+        for index in range(rows.count()):
+            row = rows.nth(index)
+            try:
+                title = row.locator(self._selector("cart_item_name")).first.inner_text(timeout=1000)
+            except Exception:
+                continue
+            if title.strip().lower() == wanted:
+                match = row
+                break
+        if match is None:
+            raise ScriptedFlowError(f"no cart line named '{name}'")
+
+        count_before = rows.count()
+        self._click(match.locator(self._selector("cart_item_remove")).first, "remove button")
+        deadline = time.monotonic() + self.timeout_ms / 1000
+        while time.monotonic() < deadline:
+            if rows.count() < count_before:
+                return
+            self.page.wait_for_timeout(200)
+        raise ScriptedFlowError(f"'{name}' is still in the cart")
+
+    # ==================== HELPERS ====================
+
+    def _selector(self, key: str) -> str:
+        selector = self.selectors.get(key)
+        if not selector:
+            raise ScriptedFlowError(f"no '{key}' selector for {self.platform}")
+        return selector
+
+    def _goto(self, url: str, only_if_elsewhere: bool = False):
+        if only_if_elsewhere and self.page.url.rstrip("/").startswith(url.rstrip("/")):
+            return
+        try:
+            self.page.goto(url, wait_until="domcontentloaded", timeout=self.timeout_ms * 2)
+        except Exception as e:
+            raise ScriptedFlowError(f"could not open {url}: {e}") from e
+
+    def _click(self, locator, what: str):
+        try:
+            locator.click(timeout=self.timeout_ms)
+        except Exception as e:
+            raise ScriptedFlowError(f"could not click {what}: {e}") from e
+
+    def _is_visible(self, key: str) -> bool:
+        selector = self.selectors.get(key)
+        if not selector:
+            return False
+        try:
+            return self.page.locator(selector).first.is_visible()
+        except Exception:
+            return False
+
+    def _cart_count(self) -> Optional[int]:
+        selector = self.selectors.get("cart_count")
+        if not selector:
+            return None
+        try:
+            text = self.page.locator(selector).first.inner_text(timeout=500)
+        except Exception:
+            return None
+        match = re.search(r"\d+", text)
+        return int(match.group(0)) if match else 0
+
+
+def scripted_flow(nova: Any, platform: str) -> Optional[ScriptedFlow]:
+    """A ScriptedFlow on the session's page, or None when disabled or unavailable"""
+    if not settings.scripted_flows_enabled or not PLATFORM_CONFIGS[platform].get("selectors"):
+        return None
+    try:
+        page = nova.page
+    except Exception as e:
+        logger.debug(f"[SCRIPTED] No Playwright page for {platform}: {e}")
+        return None
+    if page is None:
+        return None
+    return ScriptedFlow(platform, page, timeout_ms=settings.scripted_flow_timeout_ms)
@@ -0,0 +1,16 @@
+# Search-and-add agents: one module per platform
+import importlib
+
+# platform -> (module, class); modules are imported lazily so nova_act is only loaded when used
+AGENT_CLASSES = {
+    "instacart": ("app.agents.search_and_add_agents.instacart", "InstacartAgent"),
+    "ubereats": ("app.agents.search_and_add_agents.ubereats", "UberEatsAgent"),
+}
+
+
+def get_agent_class(platform: str):
+    """Resolve the SearchAndAddAgent subclass for a platform"""
+    if platform not in AGENT_CLASSES:
+        raise KeyError(f"No search-and-add agent for platform: {platform}")
+    module_name, class_name = AGENT_CLASSES[platform]
+    return getattr(importlib.import_module(module_name), class_name)
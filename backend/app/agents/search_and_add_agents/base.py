@@ -0,0 +1,573 @@
+"""
+Search-and-add agent base class.
+
+Builds one NovaAct instruction from the shopping list, runs it on a browser
+session, then extracts the resulting cart. Platform subclasses supply the
+starting page, the store-selection preamble and the cart extraction prompt.
+
+Agents can run standalone (own NovaAct, files relative to the working
+directory) or on a session lent by the browser session pool.
+
+Item names and weight estimates come from the job's shopping plan
+(shopping_plan.py), built once by the orchestrator for all platforms while
+the agents already start; an agent run without one builds its own, in the
+background. Either way the browser starts and the store is opened while
+the quantities are converted, and each item is searched for as soon as its
+conversion resolves.
+
+Items with a clear target (a count, one package, a known product) are first
+tried with the platform's scripted Playwright flow; only items it can't
+handle go to Nova Act. Cart extraction likewise scrapes the cart page before
+asking the model.
+
+With AGENT_TASK_MODE=per_item the list is split into one search-and-add task
+per item instead of one long instruction. Tasks are spread over up to
+max_parallel_item_tasks browsers: the caller's session plus clones of the
+platform's signed-in profile, which all share the account's cart.
+"""
+import json
+import queue
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from app.config import settings
+from app.agents import cart_extraction
+from app.agents.scripted_flows import PartialAddError, ScriptedFlowError, scripted_flow
+from app.agents.search_and_add_agents.shopping_plan import (
+    PLAN_FILE, PlannedItem, ShoppingPlan, follow_shopping_plan, stream_shopping_plan
+)
+from app.services.browser_allocator import browser_allocator, profile_dir
+from app.services.browser_profile import popup_report
+from app.services.product_catalog import match_requested_items, product_catalog
+from config.platforms import PLATFORM_CONFIGS
+
+ProgressCallback = Callable[..., None]
+
+
+def load_shopping_list(path="shopping_list.json"):
+    with open(path, "r") as f:
+        return json.load(f)["shopping_list"]
+
+
+class SearchAndAddAgent:
+    """
+    Search for every shopping list item on a platform, add it to the cart,
+    and return the extracted cart as a dict.
+
+    Subclasses set platform_name and override instruction_preamble /
+    cart_extraction_instruction (where the cart is; the JSON request itself
+    comes from cart_extraction).
+    """
+
+    platform_name: str = ""
+    instruction_preamble: str = ""
+    cart_extraction_instruction: str = ""
+
+    def __init__(
+        self,
+        on_progress: Optional[ProgressCallback] = None,
+        plan: Optional[ShoppingPlan] = None,
+        plan_path: Optional[Path] = None
+    ):
+        self.config = PLATFORM_CONFIGS[self.platform_name]
+        self.on_progress = on_progress
+        self.plan = plan
+        self.plan_path = plan_path  # Where the plan came from; followed while it is incomplete
+        self._products: Dict[str, object] = {}  # known_product per item, for the current run
+
+    @property
+    def cart_file(self) -> str:
+        return self.config["cart_file"]
+
+    def _progress(self, event_type: str, **data):
+        """Report progress to the in-process listener, if any"""
+        if self.on_progress:
+            try:
+                self.on_progress(event_type, platform=self.platform_name, **data)
+            except Exception as e:
+                print(f"⚠ Progress callback failed: {e}")
+
+    # ==================== STEP 1: SEARCH AND ADD ====================
+
+    def build_instruction(self, shopping_list: List[Dict]) -> str:
+        """Turn the shopping list into one NovaAct instruction"""
+        return self._instruction_for(self.build_item_tasks(shopping_list))
+
+    def _instruction_for(self, tasks: List[Dict], preamble: bool = True) -> str:
+        instruction = self.instruction_preamble if preamble else ""
+        for task in tasks:
+            instruction += task["instruction"]
+        instruction += "Return the total number of items in cart."
+        return instruction
+
+    def build_item_tasks(self, shopping_list: List[Dict], planned: Optional[List["Future[PlannedItem]"]] = None) -> List[Dict]:
+        """
+        One search-and-add step per shopping list entry:
+        {"item", "instruction"} for Nova Act plus "query", "quantity",
+        "product_name", "product_url" and "scriptable" for the scripted flow
+
+        Args:
+            planned: Plan futures from start_planning, if already started
+        """
+        if planned is None:
+            planned = self.start_planning(shopping_list)
+        return [self._task_for(future.result()) for future in planned]
+
+    def start_planning(self, shopping_list: List[Dict]) -> List["Future[PlannedItem]"]:
+        """
+        Start planning the list: one future per entry, in list order. The
+        job's shared plan resolves at once; otherwise the unit conversions
+        run in the background, so the browser can start meanwhile.
+        """
+        self._products = {}
+        if self.plan is not None and self.plan.matches(shopping_list):
+            print(f"✓ Using the job's shopping plan ({len(self.plan.items)} items)")
+            if not self.plan.complete and self.plan_path is not None:
+                # The orchestrator is still converting; take each entry as it lands
+                return follow_shopping_plan(self.plan, self.plan_path, timeout=settings.shopping_plan_wait_seconds)
+            futures = []
+            for planned in self.plan.items:
+                future: "Future[PlannedItem]" = Future()
+                future.set_result(planned)
+                futures.append(future)
+            return futures
+        # Known products need no weight estimate
+        return stream_shopping_plan(
+            shopping_list,
+            skip_item=lambda item: self._known(item) is not None,
+            on_converting=lambda item, qty: self._progress("item_converting", item=item, quantity=str(qty))
+        )
+
+    def _known(self, item: str):
+        """known_product, looked up once per run"""
+        if item not in self._products:
+            self._products[item] = self.known_product(item)
+        return self._products[item]
+
+    def _task_for(self, planned: PlannedItem) -> Dict:
+        item = planned.item
+        product = self._known(item)
+        task = {"item": item, "query": item, "quantity": 1, "product_name": "", "product_url": "", "scriptable": True}
+
+        if product is not None:
+            # Bought here before: go straight to that product instead of browsing results
+            if product.product_url:
+                locate = f"Go to {product.product_url}. "
+            else:
+                locate = f"Search for '{product.name}' and open the item named '{product.name}'. "
+            amount = planned.count if planned.is_count else 1
+            instruction = f"{locate}Add {amount} to cart. "
+            task.update(query=product.name, quantity=amount, product_name=product.name, product_url=product.product_url)
+        elif planned.is_count:
+            # Countable: add exactly that many (e.g., 2 bananas)
+            instruction = (
+                f"Search for '{item}' and add {planned.count} to cart. "
+            )
+            task["quantity"] = planned.count
+        else:
+            weight_info = planned.weight
+
+            if weight_info and weight_info.get("weight_grams"):
+                # SIMPLIFIED INSTRUCTION
+                instruction = (
+                    f"Search for '{item}'. "
+                    f"look for item in the list"
+                    f"Add ONLY 1 package to cart. "
+                    f"Do not add multiple packages. "
+                )
+            else:
+                # Fallback to smallest pack if weight estimation fails
+                instruction = (
+                    f"Search for '{item}'. "
+                    f"Add 1 of the smallest available package to cart. "
+                )
+                # Comparing package sizes needs the model
+                task["scriptable"] = False
+        task["instruction"] = instruction
+        return task
+
+    def known_product(self, item: str):
+        """Fresh product catalog entry for an item at this platform's store, if any"""
+        if not settings.product_catalog_enabled:
+            return None
+        try:
+            product = product_catalog.lookup(self.platform_name, self.config.get("store_name"), item)
+        except Exception as e:
+            print(f"⚠ Product catalog lookup failed for {item}: {e}")
+            return None
+        if product is not None:
+            print(f"  ✓ Known product for {item}: {product.name}")
+        return product
+
+    def record_products(self, cart_data: Dict, requested: Optional[List[str]] = None):
+        """
+        Remember the extracted products for later runs; lines matched to a
+        requested item are what known_product finds for that item next time
+        """
+        if not settings.product_catalog_enabled or not cart_data.get("cart_items"):
+            return
+        try:
+            lines = match_requested_items(requested or [], cart_data["cart_items"], product_catalog.min_match)
+            product_catalog.record_products(self.platform_name, self.config.get("store_name"), lines)
+        except Exception as e:
+            print(f"⚠ Could not update product catalog: {e}")
+
+    def search_and_add_streamed(self, nova, planned: List["Future[PlannedItem]"]):
+        """
+        Search and add every item, starting while the conversions still run.
+
+        The store is opened (the preamble) first; then each item is handled
+        as soon as its plan resolves: scriptable items go through the
+        platform's scripted flow, the rest are collected and sent to Nova Act
+        whenever the next conversions are still pending, and once at the end.
+        With every item already planned and no scripted flow this is the
+        single combined instruction as before.
+
+        Returns:
+            The last Nova Act result, or the item count if none was needed
+        """
+        flow = scripted_flow(nova, self.platform_name)
+        if flow is None and all(future.done() for future in planned):
+            return nova.act(self._instruction_for([self._task_for(future.result()) for future in planned]), max_steps=99)
+
+        try:
+            nova.act(self.instruction_preamble, max_steps=settings.agent_item_max_steps)
+            opened = True
+        except Exception as e:
+            print(f"⚠ Could not open the store: {e}")
+            opened = False
+
+        result = len(planned)  # All added by the scripted flow
+        waiting = list(planned)
+        remaining: List[Dict] = []
+        while waiting:
+            ready = [future for future in waiting if future.done()]
+            if not ready:
+                if remaining:
+                    # Work through what's ready while the rest converts
+                    result = nova.act(self._instruction_for(remaining, preamble=not opened), max_steps=99)
+                    opened, remaining = True, []
+                    continue
+                wait(waiting, return_when=FIRST_COMPLETED)
+                continue
+            for future in ready:
+                waiting.remove(future)
+                task = self._task_for(future.result())
+                if opened and flow is not None and task["scriptable"] and self._try_scripted_add(flow, task):
+                    continue
+                remaining.append(task)
+
+        if remaining:
+            result = nova.act(self._instruction_for(remaining, preamble=not opened), max_steps=99)
+        if flow is not None:
+            print(f"Scripted steps: {flow.summary()}")
+        return result
+
+    def _try_scripted_add(self, flow, task: Dict) -> bool:
+        """
+        Add a task with the scripted flow. False hands it to Nova Act; after a
+        partial add the task is first narrowed to the units still missing.
+        """
+        try:
+            flow.search_and_add(task)
+        except PartialAddError as e:
+            wanted = task["quantity"]
+            missing = wanted - e.added
+            if missing <= 0:
+                # Only the confirmation failed, and one unit was all it needed
+                print(f"  ✓ Scripted add: {task['item']} x{wanted} (unconfirmed: {e})")
+                flow.record("search_and_add", True)
+                return True
+            print(f"  ⚠ Scripted add stopped for {task['item']} after {e.added} ({e}); Nova Act adds the other {missing}")
+            flow.record("search_and_add", False)
+            name = e.product_name or task["product_name"] or task["query"]
+            task.update(
+                quantity=missing,
+                scriptable=False,
+                instruction=f"Search for '{name}'. It is already in the cart; add {missing} more so the cart has {wanted} of it. "
+            )
+            return False
+        except ScriptedFlowError as e:
+            print(f"  ⚠ Scripted add failed for {task['item']} ({e}); using Nova Act")
+            flow.record("search_and_add", False)
+            return False
+        print(f"  ✓ Scripted add: {task['item']} x{task['quantity']}")
+        flow.record("search_and_add", True)
+        return True
+
+    # ==================== STEP 1 (PER-ITEM MODE) ====================
+
+    @property
+    def profile_dir(self) -> Path:
+        return profile_dir(self.platform_name)
+
+    @property
+    def max_parallel_tasks(self) -> int:
+        return max(1, self.config.get("max_parallel_item_tasks", 1))
+
+    def can_run_per_item(self) -> bool:
+        """Per-item tasks need a signed-in profile so every browser adds to the same cart"""
+        return settings.agent_task_mode == "per_item" and (self.profile_dir / "Default").exists()
+
+    def search_and_add_per_item(
+        self, nova, shopping_list: List[Dict], planned: Optional[List["Future[PlannedItem]"]] = None
+    ) -> List[Dict]:
+        """
+        Run one search-and-add task per item across parallel browsers.
+
+        `nova` works through the queue on the calling thread; extra workers
+        each start their own NovaAct on a clone of the platform profile, with
+        a debugging port from the browser allocator (a Playwright session is
+        bound to the thread that started it). In "shared" execution mode they
+        open tabs in the worker's shared browser instead.
+
+        Returns:
+            [{"item", "success", "error"}] in shopping list order
+        """
+        tasks = self.build_item_tasks(shopping_list, planned)
+        pending: "queue.Queue" = queue.Queue()
+        for index, task in enumerate(tasks):
+            pending.put((index, task))
+        results: List[Optional[Dict]] = [None] * len(tasks)
+        workers = min(self.max_parallel_tasks, len(tasks))
+        print(f"Running {len(tasks)} item tasks on {workers} browser(s)")
+        self._progress("agent_stage", stage="searching", item_count=len(tasks), workers=workers)
+
+        def work(session, worker_id: int):
+            try:
+                # Each browser picks the store before taking items
+                session.act(self.instruction_preamble, max_steps=settings.agent_item_max_steps)
+            except Exception as e:
+                print(f"⚠ Worker {worker_id} could not open the store: {e}")
+                return
+            # Bound to this worker's thread and page
+            flow = scripted_flow(session, self.platform_name)
+            while True:
+                try:
+                    index, task = pending.get_nowait()
+                except queue.Empty:
+                    break
+                if flow is not None and task["scriptable"] and self._try_scripted_add(flow, task):
+                    results[index] = self._item_result(task["item"], True, None)
+                else:
+                    results[index] = self._run_item_task(session, task)
+            if flow is not None:
+                print(f"Worker {worker_id} scripted steps: {flow.summary()}")
+
+        def extra_worker(worker_id: int):
+            if settings.agent_execution_mode == "shared":
+                shared_worker(worker_id)
+                return
+            try:
+                lease = browser_allocator.lease(self.platform_name, clone=True)
+            except Exception as e:
+                print(f"⚠ Worker {worker_id} could not get a browser lease: {e}")
+                return
+            try:
+                session = browser_allocator.start_nova(lease, starting_page=self.config["home_url"])
+            except Exception as e:
+                print(f"⚠ Worker {worker_id} browser failed to start: {e}")
+                lease.release()
+                return
+            try:
+                work(session, worker_id)
+            finally:
+                session.stop()
+                lease.release()
+
+        def shared_worker(worker_id: int):
+            # Another tab of the worker's shared browser instead of another browser
+            from app.services.shared_browser import shared_browser
+            try:
+                shared_browser.run(self.platform_name, work, worker_id)
+            except Exception as e:
+                print(f"⚠ Worker {worker_id} could not open a shared browser tab: {e}")
+
+        with ThreadPoolExecutor(max_workers=max(1, workers - 1), thread_name_prefix=f"{self.platform_name}-item") as executor:
+            futures = [executor.submit(extra_worker, worker_id) for worker_id in range(1, workers)]
+            work(nova, 0)
+            for future in futures:
+                future.result()
+
+        # Items no live browser got to
+        for index, task in enumerate(tasks):
+            if results[index] is None:
+                results[index] = self._item_result(task["item"], False, "No browser available")
+        return results
+
+    def _run_item_task(self, session, task: Dict) -> Dict:
+        instruction = (
+            "If any popup appears, close it. "
+            + task["instruction"]
+            + "Return true if the item was added to the cart, otherwise false."
+        )
+        try:
+            result = session.act(instruction, max_steps=settings.agent_item_max_steps, schema={"type": "boolean"})
+        except Exception as e:
+            return self._item_result(task["item"], False, str(e))
+        answer = getattr(result, "parsed_response", None)
+        if answer is True:
+            return self._item_result(task["item"], True, None)
+        # Steps ran but nothing says the item is in the cart: report it for a retry
+        return self._item_result(task["item"], False, "Item not added" if answer is False else "No result reported by the agent")
+
+    def _item_result(self, item: str, success: bool, error: Optional[str]) -> Dict:
+        print(f"Item task: {item} - {'added' if success else 'failed'}")
+        self._progress("item_result", item=item, success=success, error=error)
+        return {"item": item, "success": success, "error": error}
+
+    # ==================== STEP 2: CART EXTRACTION ====================
+
+    def extract_cart(self, nova) -> Dict:
+        """Ask the agent for the cart contents as JSON and convert them to cart JSON"""
+        print("\n" + "="*50)
+        print("STEP 2: Extracting cart details...")
+        print("="*50)
+        self._progress("agent_stage", stage="extracting_cart")
+
+        extraction = self._scrape_cart(nova)
+        if extraction is None:
+            extraction = cart_extraction.extract_cart(nova, self.cart_extraction_instruction, max_steps=20)
+
+        print("\n" + "="*50)
+        print(f"CART CONTENTS ({extraction.method}, confidence {extraction.confidence:.2f}):")
+        print("="*50)
+        for item in extraction.items:
+            print(f"{item.name} | Qty: {item.quantity} | Price: ${item.price:.2f} | Size: {item.size}")
+        print("="*50)
+
+        return cart_extraction.to_cart_json(extraction)
+
+    def _scrape_cart(self, nova) -> Optional[cart_extraction.CartExtraction]:
+        """Cart read off the page by the scripted flow, or None to ask Nova Act"""
+        flow = scripted_flow(nova, self.platform_name)
+        if flow is None:
+            return None
+        try:
+            return flow.scrape_cart()
+        except ScriptedFlowError as e:
+            print(f"⚠ Scripted cart scrape failed ({e}); using Nova Act")
+            return None
+
+    def parse_cart_text(self, cart_text: str) -> Dict:
+        """Parse a recorded cart response (JSON or legacy item lines) into cart JSON"""
+        return cart_extraction.to_cart_json(cart_extraction.parse_cart_response(cart_text))
+
+    # ==================== RUN ====================
+
+    def run_on_session(
+        self, nova, shopping_list: List[Dict], planned: Optional[List["Future[PlannedItem]"]] = None
+    ) -> Optional[Dict]:
+        """
+        Run search-and-add plus cart extraction on an already started NovaAct.
+
+        Args:
+            planned: Plan futures from start_planning, if started before the browser
+
+        Returns:
+            Cart JSON dict, or None if cart extraction failed
+        """
+        if planned is None:
+            planned = self.start_planning(shopping_list)
+        item_results = None
+        if self.can_run_per_item():
+            item_results = self.search_and_add_per_item(nova, shopping_list, planned)
+            added = sum(1 for r in item_results if r["success"])
+
+            print("\n" + "="*50)
+            print("STEP 1: Shopping completed!")
+            print(f"Added {added}/{len(item_results)} items")
+            print("="*50)
+
+            # Other browsers filled the cart; reload it here before extracting
+            nova.go_to_url(self.config["cart_url"])
+        else:
+            self._progress("agent_stage", stage="searching", item_count=len(shopping_list))
+            result = self.search_and_add_streamed(nova, planned)
+
+            print("\n" + "="*50)
+            print("STEP 1: Shopping completed!")
+            print(f"Result: {result}")
+            print("="*50)
+
+            # Extract item count
+            try:
+                if hasattr(result, 'response'):
+                    item_count = str(result.response).strip()
+                else:
+                    item_count = str(result).strip()
+
+                print(f"\n✓ Added {item_count} items to cart")
+            except Exception as e:
+                print(f"⚠ Could not extract item count: {e}")
+
+        try:
+            cart_data = self.extract_cart(nova)
+        except Exception as e:
+            print(f"\n⚠ Error extracting cart details: {e}")
+            print("Cart details could not be extracted automatically.")
+            return None
+
+        if cart_data["cart_items"]:
+            print(f"\nParsed {len(cart_data['cart_items'])} items:")
+            for item in cart_data["cart_items"]:
+                print(f"  - {item['name']} (Qty: {item['quantity']}, Size: {item['size']}) = ${item['price']}")
+        self._progress("agent_stage", stage="cart_parsed", item_count=len(cart_data["cart_items"]))
+        self.record_products(
+            cart_data, [future.result().item for future in planned if future.done() and future.exception() is None]
+        )
+
+        popups = popup_report(nova)
+        if popups:
+            print(f"✓ Auto-dismissed {len(popups)} popup(s): {', '.join(p.get('popup', '?') for p in popups)}")
+        cart_data["popups_dismissed"] = popups
+
+        if item_results is not None:
+            cart_data["item_results"] = item_results
+        return cart_data
+
+    def write_cart_json(self, cart_data: Dict, cart_dir: Path = Path("cart_jsons")) -> Path:
+        """Save cart JSON where build_knot_jsons picks it up"""
+        output_path = Path(cart_dir) / self.cart_file
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, "w") as f:
+            json.dump(cart_data, f, indent=2)
+        print(f"✓ Structured data saved to {self.cart_file}")
+        return output_path
+
+    def main(self):
+        """
+        Script entry point: read shopping_list.json (and the job's
+        shopping_plan.json, if the orchestrator wrote one) from the working
+        directory, run on a fresh browser and write cart_jsons/<cart_file>.
+        """
+        shopping_list = load_shopping_list()
+        if self.plan is None:
+            self.plan_path = self.plan_path or Path(PLAN_FILE)
+            self.plan = ShoppingPlan.load(self.plan_path)
+        # Quantity conversions run while the browser starts and the store opens
+        planned = self.start_planning(shopping_list)
+
+        if self.can_run_per_item():
+            # Same signed-in cart as the item workers, without locking the profile
+            lease = browser_allocator.lease(self.platform_name, clone=True)
+        else:
+            lease = browser_allocator.lease()
+        try:
+            nova = browser_allocator.start_nova(
+                lease, platform=self.platform_name, starting_page=self.config["home_url"]
+            )
+        except Exception:
+            lease.release()
+            raise
+        try:
+            cart_data = self.run_on_session(nova, shopping_list, planned)
+            if cart_data is not None:
+                self.write_cart_json(cart_data)
+        finally:
+            nova.stop()
+            lease.release()
+
+        print("\n" + "="*50)
+        print("COMPLETE!")
+        print("="*50)
@@ -0,0 +1,39 @@
+"""
+Shopping list item name helpers shared by the agents and the product catalog.
+"""
+import re
+
+# remove descriptors that don't help store search
+DESCRIPTORS = {
+    "medium", "large", "small", "melted", "ripe", "unsalted"
+}
+
+def normalize_item_name(name: str) -> str:
+    # if there are alternatives like "unsalted butter or vegetable oil" → pick the first option
+    if " or " in name.lower():
+        name = re.split(r"\s+or\s+", name, flags=re.IGNORECASE)[0]
+
+    # drop common descriptors at word boundaries
+    words = []
+    for w in re.split(r"\s+", name.strip()):
+        w_clean = re.sub(r"[^\w\-]", "", w).lower()
+        if w_clean not in DESCRIPTORS:
+            words.append(w)
+    cleaned = " ".join(words).strip()
+
+    # some slight tweaks: "Medium ripe bananas" → "bananas"
+    cleaned = re.sub(r"\brip[e]?\b", "", cleaned, flags=re.IGNORECASE).strip()
+    cleaned = re.sub(r"\s{2,}", " ", cleaned)
+    return cleaned
+
+def is_count_quantity(q):
+    # countable if a plain int/float, or a numeric string with no unit words
+    if isinstance(q, (int, float)):
+        return True
+    if isinstance(q, str):
+        # if string has any letters, assume it's unit-based (cups, tbsp, tsp, etc.)
+        if re.search(r"[A-Za-z]", q):
+            return False
+        # numeric-only string -> treat as count
+        return bool(re.fullmatch(r"\d+(\.\d+)?", q.strip()))
+    return False
@@ -0,0 +1,226 @@
+"""
+Shopping plan: the platform-independent part of turning a shopping list into
+search-and-add tasks, computed once per job and shared by every platform agent.
+
+For each list entry it holds the normalized item name, whether the quantity
+is a count, and the gram estimate for unit-based quantities (the LLM step).
+Agents only add what depends on the platform: known catalog products and the
+instructions themselves.
+
+The orchestrator writes the plan into the job workspace as
+shopping_plan.json, next to shopping_list.json, before the LLM answers:
+entries still being converted are marked pending (complete=False), and the
+file is rewritten as they resolve, so agents start their browsers at once.
+Subprocess agents read it from their working directory, pooled agents from
+the workspace, and wait for pending entries with follow_shopping_plan. A
+plan is only used for the exact list it was built from (list_hash); without
+one, agents build their own as before, streaming it (stream_shopping_plan)
+so the LLM conversions run while their browser starts.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.agents.search_and_add_agents.item_names import is_count_quantity, normalize_item_name
+from app.agents.search_and_add_agents.weight_estimation import estimate_weights_with_grok, lookup_known_weight
+
+PLAN_FILE = "shopping_plan.json"
+
+
+def shopping_list_hash(shopping_list: List[Dict]) -> str:
+    return hashlib.sha1(json.dumps(shopping_list, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@dataclass(slots=True)
+class PlannedItem:
+    """One shopping list entry, normalized and weight-annotated"""
+    raw_item: str
+    item: str  # normalize_item_name(raw_item)
+    quantity: Any  # As given in the list
+    is_count: bool
+    count: int = 1  # Units to add when is_count
+    weight: Optional[Dict] = None  # estimate_weights_with_grok result for unit quantities
+    pending: bool = False  # Weight still being estimated by the plan's builder
+
+
+@dataclass(slots=True)
+class ShoppingPlan:
+    list_hash: str
+    items: List[PlannedItem]
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    @property
+    def complete(self) -> bool:
+        return not any(item.pending for item in self.items)
+
+    def matches(self, shopping_list: List[Dict]) -> bool:
+        return self.list_hash == shopping_list_hash(shopping_list) and len(self.items) == len(shopping_list)
+
+    def to_dict(self) -> Dict:
+        return {
+            "list_hash": self.list_hash,
+            "created_at": self.created_at,
+            "complete": self.complete,
+            "items": [asdict(item) for item in self.items]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ShoppingPlan":
+        return cls(
+            list_hash=data["list_hash"],
+            items=[PlannedItem(**item) for item in data["items"]],
+            created_at=data.get("created_at", "")
+        )
+
+    def save(self, path: Path = Path(PLAN_FILE)):
+        """Write atomically, so agents never read a half-written plan"""
+        path = Path(path)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path = Path(PLAN_FILE)) -> Optional["ShoppingPlan"]:
+        """The plan at path, or None if there is none or it can't be read"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+def build_shopping_plan(
+    shopping_list: List[Dict],
+    skip_item: Optional[Callable[[str], bool]] = None,
+    on_converting: Optional[Callable[[str, Any], None]] = None
+) -> ShoppingPlan:
+    """
+    Normalize every entry and convert every unit-based quantity to grams in one batch.
+
+    Args:
+        skip_item: Items (normalized names) that need no weight estimate, e.g. known products
+        on_converting: Called with (item, quantity) for each quantity sent for conversion
+    """
+    futures = stream_shopping_plan(shopping_list, skip_item=skip_item, on_converting=on_converting)
+    return ShoppingPlan(shopping_list_hash(shopping_list), [future.result() for future in futures])
+
+
+def stream_shopping_plan(
+    shopping_list: List[Dict],
+    skip_item: Optional[Callable[[str], bool]] = None,
+    on_converting: Optional[Callable[[str, Any], None]] = None
+) -> List["Future[PlannedItem]"]:
+    """
+    Like build_shopping_plan, but returns at once with one future per entry,
+    in list order. Entries that need no LLM (counts, skipped items, local or
+    cached conversions) are already resolved; the rest resolve together when
+    the batched estimate, run on a background thread, answers.
+    """
+    return start_shopping_plan(shopping_list, skip_item=skip_item, on_converting=on_converting)[1]
+
+
+def start_shopping_plan(
+    shopping_list: List[Dict],
+    skip_item: Optional[Callable[[str], bool]] = None,
+    on_converting: Optional[Callable[[str, Any], None]] = None
+) -> Tuple[ShoppingPlan, List["Future[PlannedItem]"]]:
+    """
+    stream_shopping_plan plus the plan itself, whose entries awaiting the
+    LLM are marked pending until their futures resolve
+    """
+    items = []
+    futures = []
+    pending = []
+    for entry in shopping_list:
+        raw_item = entry.get("item", "").strip()
+        qty = entry.get("quantity", 1)
+        item = normalize_item_name(raw_item)
+        counted = is_count_quantity(qty)
+        planned = PlannedItem(raw_item, item, qty, counted, int(float(qty)) if counted else 1)
+        items.append(planned)
+        future: "Future[PlannedItem]" = Future()
+        futures.append(future)
+        if counted or (skip_item is not None and skip_item(item)):
+            future.set_result(planned)
+            continue
+        # Unit-based measurements - use Grok to estimate weight
+        print(f"Converting measurement for: {item} - {qty}")
+        if on_converting:
+            on_converting(item, qty)
+        known = lookup_known_weight(item, qty)
+        if known is not None:
+            planned.weight = known
+            future.set_result(planned)
+            continue
+        planned.pending = True
+        pending.append((planned, future))
+
+    if pending:
+        threading.Thread(target=_convert, args=(pending,), name="weight-estimates", daemon=True).start()
+    return ShoppingPlan(shopping_list_hash(shopping_list), items), futures
+
+
+def follow_shopping_plan(
+    plan: ShoppingPlan,
+    path: Path,
+    timeout: float,
+    interval: float = 0.2
+) -> List["Future[PlannedItem]"]:
+    """
+    Futures for a plan that its builder (the orchestrator) is still
+    completing: pending entries resolve as path is rewritten with their
+    weights. Whatever is still pending after timeout, or once the builder
+    removes the file (it gave up), is converted here instead.
+    """
+    futures = []
+    waiting: Dict[int, "Future[PlannedItem]"] = {}
+    for index, planned in enumerate(plan.items):
+        future: "Future[PlannedItem]" = Future()
+        futures.append(future)
+        if planned.pending:
+            waiting[index] = future
+        else:
+            future.set_result(planned)
+    if not waiting:
+        return futures
+
+    def watch():
+        deadline = time.monotonic() + timeout
+        while waiting and time.monotonic() < deadline:
+            time.sleep(interval)
+            current = ShoppingPlan.load(path)
+            if current is None or current.list_hash != plan.list_hash:
+                break
+            for index in [index for index in waiting if not current.items[index].pending]:
+                waiting.pop(index).set_result(current.items[index])
+        if waiting:
+            print(f"⚠ Shopping plan still missing {len(waiting)} weight estimate(s); converting them here")
+            leftovers = []
+            for index, future in waiting.items():
+                plan.items[index].pending = True
+                leftovers.append((plan.items[index], future))
+            _convert(leftovers)
+
+    threading.Thread(target=watch, name="shopping-plan-follower", daemon=True).start()
+    return futures
+
+
+def _convert(pending: List[tuple]):
+    """Estimate weights for [(PlannedItem, Future)] in one batch and resolve the futures"""
+    try:
+        estimates = estimate_weights_with_grok([(planned.item, planned.quantity) for planned, _ in pending])
+    except Exception as e:
+        for _, future in pending:
+            future.set_exception(e)
+        return
+    for (planned, future), estimate in zip(pending, estimates):
+        planned.weight = estimate
+        planned.pending = False
+        future.set_result(planned)
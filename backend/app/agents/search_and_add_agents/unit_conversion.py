@@ -0,0 +1,189 @@
+"""
+Local unit-to-gram conversion.
+
+Parses quantities like "1 1/2 cups", "½ tsp" or "8 oz" and converts them to
+grams with a unit table plus an ingredient density table, so common recipe
+conversions need no LLM call. Anything it can't resolve confidently returns
+None and is left to the LLM.
+"""
+import re
+from typing import Any, Optional, Tuple
+
+# Volume units in millilitres (US customary)
+VOLUME_ML = {
+    "ml": 1.0, "milliliter": 1.0, "millilitre": 1.0,
+    "l": 1000.0, "liter": 1000.0, "litre": 1000.0,
+    "tsp": 4.929, "teaspoon": 4.929,
+    "tbsp": 14.787, "tablespoon": 14.787,
+    "fl oz": 29.574, "fluid ounce": 29.574,
+    "cup": 236.588, "c": 236.588,
+    "pint": 473.176, "pt": 473.176,
+    "quart": 946.353, "qt": 946.353,
+    "gallon": 3785.41, "gal": 3785.41,
+}
+
+# Mass units in grams
+MASS_G = {
+    "g": 1.0, "gram": 1.0, "gramme": 1.0,
+    "kg": 1000.0, "kilogram": 1000.0,
+    "mg": 0.001, "milligram": 0.001,
+    "oz": 28.3495, "ounce": 28.3495,
+    "lb": 453.592, "lbs": 453.592, "pound": 453.592,
+}
+
+UNIT_ALIASES = {
+    "ts": "tsp", "tsps": "tsp",
+    "tbs": "tbsp", "tbl": "tbsp", "tbsps": "tbsp", "tblsp": "tbsp", "tb": "tbsp",
+    "fluid oz": "fl oz", "fl. oz": "fl oz", "floz": "fl oz",
+    "cups": "cup",
+}
+
+# Ingredient densities in g/ml, matched on the longest key contained in the
+# ingredient name ("brown sugar" wins over "sugar")
+DENSITY_G_PER_ML = {
+    "water": 1.0,
+    "milk": 1.03,
+    "buttermilk": 1.03,
+    "heavy cream": 1.0,
+    "cream": 1.0,
+    "sour cream": 1.01,
+    "yogurt": 1.03,
+    "oil": 0.92,
+    "olive oil": 0.92,
+    "vegetable oil": 0.92,
+    "butter": 0.959,
+    "honey": 1.42,
+    "maple syrup": 1.32,
+    "molasses": 1.4,
+    "vinegar": 1.01,
+    "soy sauce": 1.2,
+    "lemon juice": 1.03,
+    "lime juice": 1.03,
+    "orange juice": 1.04,
+    "broth": 1.0,
+    "stock": 1.0,
+    "vanilla extract": 0.88,
+    "vanilla": 0.88,
+    "flour": 0.507,
+    "all-purpose flour": 0.507,
+    "bread flour": 0.539,
+    "whole wheat flour": 0.507,
+    "cornstarch": 0.541,
+    "sugar": 0.845,
+    "granulated sugar": 0.845,
+    "brown sugar": 0.93,
+    "powdered sugar": 0.507,
+    "confectioners sugar": 0.507,
+    "salt": 1.217,
+    "kosher salt": 0.608,
+    "baking soda": 0.933,
+    "baking powder": 0.811,
+    "cocoa powder": 0.359,
+    "cocoa": 0.359,
+    "rice": 0.845,
+    "oats": 0.38,
+    "rolled oats": 0.38,
+    "chocolate chips": 0.72,
+    "peanut butter": 1.08,
+    "cheese": 0.47,
+    "cream cheese": 0.96,
+    "shredded cheese": 0.47,
+    "parmesan": 0.42,
+    "ground cinnamon": 0.56,
+    "cinnamon": 0.56,
+    "black pepper": 0.49,
+    "ground pepper": 0.49,
+    "yeast": 0.6,
+}
+
+_UNICODE_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4",
+    "⅛": "1/8", "⅜": "3/8", "⅝": "5/8", "⅞": "7/8",
+}
+
+_AMOUNT = r"(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?|\.\d+)"
+_QUANTITY = re.compile(rf"^\s*({_AMOUNT})(?:\s*(?:-|to)\s*({_AMOUNT}))?\s*(.*?)\s*$", re.IGNORECASE)
+
+
+def _parse_amount(text: str) -> float:
+    text = text.strip()
+    if " " in text:
+        whole, fraction = text.split(None, 1)
+        return float(whole) + _parse_amount(fraction)
+    if "/" in text:
+        numerator, denominator = text.split("/")
+        return float(numerator) / float(denominator)
+    return float(text)
+
+
+def normalize_unit(unit: str) -> str:
+    unit = re.sub(r"\s+", " ", unit.strip().lower().rstrip("."))
+    unit = UNIT_ALIASES.get(unit, unit)
+    if unit in VOLUME_ML or unit in MASS_G:
+        return unit
+    # Plurals: "cups", "tablespoons", "ounces", "grams"
+    if unit.endswith("es") and unit[:-2] in VOLUME_ML | MASS_G:
+        return unit[:-2]
+    if unit.endswith("s") and unit[:-1] in VOLUME_ML | MASS_G:
+        return unit[:-1]
+    return unit
+
+
+def parse_quantity(quantity: Any) -> Optional[Tuple[float, str]]:
+    """
+    Split a quantity into (amount, unit).
+
+    Ranges ("2-3 tbsp") use the upper bound. Returns None if there is no
+    leading number.
+    """
+    if isinstance(quantity, (int, float)):
+        return float(quantity), ""
+    text = str(quantity)
+    for symbol, fraction in _UNICODE_FRACTIONS.items():
+        text = re.sub(rf"(\d)\s*{symbol}", rf"\1 {fraction}", text).replace(symbol, fraction)
+
+    match = _QUANTITY.match(text)
+    if not match:
+        return None
+    amount = _parse_amount(match.group(2) or match.group(1))
+    # Drop trailing words after the unit ("cup, packed", "tbsp melted")
+    unit = re.split(r"[,(]", match.group(3))[0]
+    unit_words = unit.split()
+    if len(unit_words) >= 2 and normalize_unit(" ".join(unit_words[:2])) in VOLUME_ML:
+        unit = " ".join(unit_words[:2])
+    elif unit_words:
+        unit = unit_words[0]
+    return amount, normalize_unit(unit)
+
+
+def lookup_density(ingredient: str) -> Optional[float]:
+    name = re.sub(r"\s+", " ", ingredient.strip().lower())
+    matches = [key for key in DENSITY_G_PER_ML if re.search(rf"\b{re.escape(key)}\b", name)]
+    if not matches:
+        return None
+    return DENSITY_G_PER_ML[max(matches, key=len)]
+
+
+def convert_to_grams(ingredient: str, quantity: Any) -> Optional[float]:
+    """Grams for a quantity of an ingredient, or None if it can't be done locally"""
+    parsed = parse_quantity(quantity)
+    if parsed is None:
+        return None
+    amount, unit = parsed
+
+    if unit in MASS_G:
+        return amount * MASS_G[unit]
+    if unit in VOLUME_ML:
+        density = lookup_density(ingredient)
+        if density is None:
+            return None
+        return amount * VOLUME_ML[unit] * density
+    return None
+
+
+def estimate_weight_locally(item_name: str, quantity: Any) -> Optional[dict]:
+    """Local estimate in the same shape as the LLM helpers, or None on a miss"""
+    grams = convert_to_grams(item_name, quantity)
+    if grams is None or grams <= 0:
+        return None
+    return {"weight_grams": max(1, round(grams)), "unit": "g", "confidence": "high", "source": "local"}
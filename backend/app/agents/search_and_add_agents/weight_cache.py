@@ -0,0 +1,129 @@
+"""
+Persistent cache of unit-to-gram conversions.
+
+LLM conversions are deterministic at temperature 0, so each
+(ingredient, quantity) answer is stored in SQLite and reused by every later
+run, with a small in-memory LRU in front. Agent subprocesses of concurrent
+jobs share the same database file.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple
+from app.config import settings
+
+
+def conversion_key(item_name: str, quantity: Any) -> Tuple[str, str]:
+    """Case/whitespace-insensitive key; 2, 2.0 and "2" are the same quantity"""
+    item = re.sub(r"\s+", " ", str(item_name).strip().lower())
+    if isinstance(quantity, (int, float)):
+        return item, f"{float(quantity):g}"
+    return item, re.sub(r"\s+", " ", str(quantity).strip().lower())
+
+
+class WeightConversionCache:
+    """SQLite-backed conversion cache with an in-memory LRU in front"""
+
+    def __init__(self, db_path: Optional[Path], memory_entries: int = 1024):
+        self.db_path = db_path
+        self.memory_entries = max(1, memory_entries)
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Open the database on first use; the cache stays memory-only if it can't"""
+        if self._conn is None and self.db_path is not None:
+            try:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None, timeout=5)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS weight_conversions (
+                        item TEXT NOT NULL,
+                        quantity TEXT NOT NULL,
+                        result TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        PRIMARY KEY (item, quantity)
+                    )
+                """)
+                self._conn = conn
+            except sqlite3.Error as e:
+                print(f"  ⚠ Weight cache unavailable ({e}); using memory only")
+                self.db_path = None
+        return self._conn
+
+    def _remember_locked(self, key: Tuple[str, str], result: dict):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, item_name: str, quantity: Any) -> Optional[dict]:
+        key = conversion_key(item_name, quantity)
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return dict(result)
+
+            conn = self._connection()
+            row = None
+            if conn is not None:
+                try:
+                    row = conn.execute(
+                        "SELECT result FROM weight_conversions WHERE item = ? AND quantity = ?", key
+                    ).fetchone()
+                except sqlite3.Error:
+                    row = None
+            if row is None:
+                self.misses += 1
+                return None
+
+            result = json.loads(row[0])
+            self._remember_locked(key, result)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, item_name: str, quantity: Any, result: dict):
+        """Store a successful conversion (failed ones are retried next time)"""
+        if not result or not result.get("weight_grams"):
+            return
+        key = conversion_key(item_name, quantity)
+        with self._lock:
+            self._remember_locked(key, dict(result))
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO weight_conversions (item, quantity, result, created_at) VALUES (?, ?, ?, ?)",
+                    (*key, json.dumps(result), time.time())
+                )
+            except sqlite3.Error as e:
+                print(f"  ⚠ Could not persist weight conversion: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+
+# Singleton
+weight_cache = WeightConversionCache(
+    db_path=settings.weight_cache_db_path if settings.weight_cache_enabled else None,
+    memory_entries=settings.weight_cache_memory_entries
+)
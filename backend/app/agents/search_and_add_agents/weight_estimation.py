@@ -0,0 +1,268 @@
+"""
+Weight estimation helpers shared by the search-and-add agents.
+Converts unit-based quantities ("1 cup", "2 tbsp") to grams using an LLM.
+
+Common conversions are answered by the local unit/density tables
+(unit_conversion) or the persistent conversion cache (weight_cache); the LLM
+is only asked on a miss, and its answer is cached.
+
+A shopping list is converted with one batched request (estimate_weights_with_grok).
+If the batch answer can't be used, the affected items fall back to concurrent
+single-item requests. All requests share one pooled HTTP session.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Sequence, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from app.agents.search_and_add_agents.unit_conversion import estimate_weight_locally
+from app.agents.search_and_add_agents.weight_cache import weight_cache
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Base endpoint (example — check docs for current URL)
+GROK_API_URL = "https://api.x.ai/v1/chat/completions"
+
+# (connect, read) seconds; batched answers for long lists take a while to generate
+GROK_TIMEOUT = (5, 60)
+
+# Upper bound on parallel single-item requests in the fallback path
+MAX_FALLBACK_WORKERS = 8
+
+# One keep-alive connection pool for every Grok request in the process
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_FALLBACK_WORKERS))
+
+CONVERSION_RULES = """
+Rules:
+- Be as accurate as possible using standard cooking conversions
+- For liquids, use density (water = 1g/ml, oil = 0.92g/ml, milk = 1.03g/ml, etc.)
+- For dry ingredients, use standard conversions (1 cup flour = 120g, 1 tbsp sugar = 12.5g, etc.)
+- Round to nearest gram
+- If you cannot determine, set weight_grams to null
+
+Example conversions:
+- 2 tbsp sugar → 25g
+- 1 cup flour → 120g
+- 1/2 cup milk → 120g
+- 1 tsp salt → 6g
+"""
+
+_gemini_model = None
+
+
+def _grok_api_key() -> str:
+    api_key = os.getenv("GROK_API_KEY")
+    if not api_key:
+        raise ValueError("GROK_API_KEY not found in .env file. Please get your key from xAI API console.")
+    return api_key
+
+
+def call_grok(prompt: str, model: str="grok-4-fast-reasoning", max_tokens: int=512, temperature: float=0.0):
+    headers = {
+        "Authorization": f"Bearer {_grok_api_key()}",
+        "Content-Type": "application/json"
+    }
+    body = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "You are a precise cooking measurement converter."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    resp = _http.post(GROK_API_URL, headers=headers, json=body, timeout=GROK_TIMEOUT)
+    resp.raise_for_status()
+    data = resp.json()
+    # The structure of response depends on version; assume something like:
+    return data["choices"][0]["message"]["content"]
+
+
+def _strip_code_fence(response_text: str) -> str:
+    """Extract JSON from markdown code blocks if present"""
+    if "```json" in response_text:
+        return response_text.split("```json")[1].split("```")[0].strip()
+    if "```" in response_text:
+        return response_text.split("```")[1].split("```")[0].strip()
+    return response_text.strip()
+
+
+def _accept_estimate(result: dict, item_name: str, quantity: str):
+    if result.get("weight_grams") and result["weight_grams"] > 0:
+        print(f"  ✓ Estimated {quantity} {item_name} = {result['weight_grams']}g (confidence: {result.get('confidence','unknown')})")
+        return result
+    print(f"  ⚠ Could not estimate weight for {quantity} {item_name}")
+    return None
+
+
+def lookup_known_weight(item_name: str, quantity: str) -> Optional[dict]:
+    """Answer from the local tables or the conversion cache, without a network call"""
+    result = estimate_weight_locally(item_name, quantity) or weight_cache.get(item_name, quantity)
+    if result:
+        print(f"  ✓ Estimated {quantity} {item_name} = {result['weight_grams']}g ({result.get('source', 'cached')})")
+    return result
+
+
+def _accept_and_cache(result: dict, item_name: str, quantity: str):
+    accepted = _accept_estimate(result, item_name, quantity)
+    if accepted:
+        weight_cache.put(item_name, quantity, accepted)
+    return accepted
+
+
+def estimate_weight_with_grok(item_name: str, quantity: str) -> dict:
+    known = lookup_known_weight(item_name, quantity)
+    if known:
+        return known
+
+    prompt = f"""
+Convert the following ingredient quantity to grams.
+Ingredient: {item_name}
+Quantity: {quantity}
+Provide ONLY a JSON response in this exact format:
+{{
+    "weight_grams": <number_or_null>,
+    "unit": "g",
+    "confidence": "high/medium/low"
+}}
+Make your best estimate.
+{CONVERSION_RULES}"""
+    try:
+        result = json.loads(_strip_code_fence(call_grok(prompt)))
+        return _accept_and_cache(result, item_name, quantity)
+    except Exception as e:
+        print(f"  ✗ Error estimating weight for {item_name}: {e}")
+        return None
+
+
+def _batch_prompt(items: Sequence[Tuple[str, Any]]) -> str:
+    lines = "\n".join(
+        f"{index}. Ingredient: {name} | Quantity: {quantity}"
+        for index, (name, quantity) in enumerate(items)
+    )
+    return f"""
+Convert each of the following ingredient quantities to grams.
+{lines}
+Provide ONLY a JSON array with one object per ingredient, in this exact format:
+[
+    {{"index": <ingredient number>, "weight_grams": <number_or_null>, "unit": "g", "confidence": "high/medium/low"}}
+]
+Make your best estimate for every ingredient.
+{CONVERSION_RULES}"""
+
+
+def _parse_batch_response(response_text: str, count: int) -> List[Optional[dict]]:
+    """
+    Map a batched JSON array back onto the input order.
+
+    Raises ValueError if the response is not a JSON array of objects; entries
+    with a missing or out-of-range index are left as None.
+    """
+    results = json.loads(_strip_code_fence(response_text))
+    if not isinstance(results, list):
+        raise ValueError("Batch response is not a JSON array")
+
+    by_index: List[Optional[dict]] = [None] * count
+    for position, result in enumerate(results):
+        if not isinstance(result, dict):
+            raise ValueError("Batch response entries must be objects")
+        index = result.get("index", position)
+        if isinstance(index, int) and 0 <= index < count:
+            by_index[index] = result
+    return by_index
+
+
+def estimate_weights_with_grok(items: Sequence[Tuple[str, Any]]) -> List[Optional[dict]]:
+    """
+    Estimate grams for many (item_name, quantity) pairs. Known conversions are
+    answered locally; the rest go to the LLM in one call.
+
+    Returns one result per input, in order: the estimate dict, or None if the
+    weight could not be determined. Items the batch answer doesn't cover are
+    retried with concurrent single-item requests.
+    """
+    results: List[Optional[dict]] = [lookup_known_weight(name, quantity) for name, quantity in items]
+    misses = [index for index, result in enumerate(results) if result is None]
+    if not misses:
+        return results
+
+    # Only the misses go to the LLM; batch positions map back through `misses`
+    batch = [items[index] for index in misses]
+    retry = []
+    try:
+        parsed = _parse_batch_response(call_grok(_batch_prompt(batch), max_tokens=64 * len(batch) + 256), len(batch))
+        for position, result in enumerate(parsed):
+            index = misses[position]
+            if result is None:
+                retry.append(index)
+                continue
+            result.pop("index", None)
+            name, quantity = items[index]
+            try:
+                # One malformed entry ("250g", a list, ...) only costs that item a single request
+                if result.get("weight_grams") is not None:
+                    result["weight_grams"] = float(result["weight_grams"])
+                results[index] = _accept_and_cache(result, name, quantity)
+            except (TypeError, ValueError) as e:
+                print(f"  ⚠ Unusable batch answer for {quantity} {name} ({e})")
+                retry.append(index)
+    except Exception as e:
+        print(f"  ⚠ Batched weight estimation failed ({e}); converting items individually")
+        retry = [index for index in misses if results[index] is None]
+
+    if retry:
+        workers = min(MAX_FALLBACK_WORKERS, len(retry))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            singles = executor.map(lambda i: estimate_weight_with_grok(*items[i]), retry)
+            for index, result in zip(retry, singles):
+                results[index] = result
+    return results
+
+
+def _get_gemini_model():
+    """Configure Gemini on first use"""
+    global _gemini_model
+    if _gemini_model is None:
+        import google.generativeai as genai
+
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in .env file. Get your key from: https://aistudio.google.com/app/apikey")
+        genai.configure(api_key=api_key)
+        _gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+    return _gemini_model
+
+
+def estimate_weight_with_gemini(item_name: str, quantity: str) -> dict:
+    """
+    Use Gemini to estimate the weight needed for a given quantity.
+    Returns dict with 'weight_grams' and 'unit' or None if can't estimate.
+    """
+    known = lookup_known_weight(item_name, quantity)
+    if known:
+        return known
+
+    prompt = f"""
+You are a precise cooking measurement converter. Convert the following ingredient quantity to grams.
+
+Ingredient: {item_name}
+Quantity: {quantity}
+
+Provide ONLY a JSON response in this exact format:
+{{
+    "weight_grams": <number>,
+    "unit": "g",
+    "confidence": "high/medium/low"
+}}
+{CONVERSION_RULES}"""
+    try:
+        response = _get_gemini_model().generate_content(prompt)
+        result = json.loads(_strip_code_fence(response.text))
+        return _accept_and_cache(result, item_name, quantity)
+    except Exception as e:
+        print(f"  ✗ Error estimating weight for {item_name}: {e}")
+        return None
@@ -4,8 +4,11 @@ Sign-in agent using Amazon Nova Act
 Handles manual authentication with persistent session management
 """
 
-from nova_act import NovaAct
 from config.platforms import PLATFORM_CONFIGS
+from app.services.browser_allocator import browser_allocator
+from app.services.profile_snapshots import profile_snapshots
+from app.services.session_preflight import session_preflight
+from app.config import settings
 import logging
 import os
 from dotenv import load_dotenv
@@ -20,9 +23,6 @@ if not nova_key:
     raise ValueError("NOVA_ACT_API_KEY environment variable not set")
 os.environ["NOVA_ACT_API_KEY"] = nova_key
 
-# Browser debugging port
-os.environ["NOVA_ACT_BROWSER_ARGS"] = "--remote-debugging-port=9222"
-
 
 class SignInAgentNova:
     """
@@ -36,6 +36,7 @@ class SignInAgentNova:
         self.platform_name = platform_name
         self.config = PLATFORM_CONFIGS[platform_name]
         self.nova = None
+        self.lease = None
     
     def signin(self, wait_time: int = 120):
         """
@@ -47,19 +48,19 @@ class SignInAgentNova:
         logger.info(f"[{self.platform_name}] Starting sign-in process...")
         
         try:
-            # Convert relative path to absolute path for Windows compatibility
-            user_data_path = os.path.abspath(self.config["user_data_dir"])
-            
-            # Create directory if it doesn't exist
-            os.makedirs(user_data_path, exist_ok=True)
-            logger.info(f"[{self.platform_name}] User data directory: {user_data_path}")
+            # Sign in on the real profile, never a clone, so the session is kept
+            self.lease = browser_allocator.lease(self.platform_name, clone=False)
+            logger.info(f"[{self.platform_name}] User data directory: {self.lease.user_data_dir}")
             
-            # Start Nova Act with persistent user data directory
-            self.nova = NovaAct(
+            # Start Nova Act with persistent user data directory. The user signs in by
+            # hand, so the window is always visible and nothing is blocked or dismissed
+            self.nova = browser_allocator.start_nova(
+                self.lease,
+                block_requests=False,
+                dismiss_popups=False,
                 starting_page=self.config["login_url"],
-                user_data_dir=user_data_path
+                headless=False
             )
-            self.nova.start()
             
             logger.info(f"[{self.platform_name}] Browser opened at login page")
             logger.info(f"[{self.platform_name}] Please sign in manually in the browser window")
@@ -98,29 +99,39 @@ class SignInAgentNova:
             if self.nova:
                 self.nova.stop()
                 self.nova = None
+            if self.lease:
+                self.lease.release()
+                self.lease = None
+        
+        self._snapshot_profile()
+        session_preflight.invalidate(self.platform_name)
         
         print(f"\n[{self.platform_name}] Sign-in process completed!")
         print(f"Session saved. Future operations will use this authenticated session.\n")
     
+    def _snapshot_profile(self):
+        """Snapshot the freshly signed-in profile, so parallel sessions clone this one"""
+        if not settings.profile_snapshots_enabled:
+            return
+        try:
+            snapshot = profile_snapshots.snapshot(self.platform_name)
+            logger.info(f"[{self.platform_name}] Profile snapshot saved to: {snapshot}")
+        except Exception as e:
+            logger.warning(f"[{self.platform_name}] Could not snapshot profile (clones will take one later): {e}")
+    
     def check_session_exists(self) -> bool:
         """
-        Check if a session already exists for this platform
+        Check if a usable session already exists for this platform
         
         Returns:
-            True if user_data_dir exists with session data
+            True if the profile exists and the session preflight finds its login valid
         """
-        user_data_dir = self.config["user_data_dir"]
-        
-        # Check if the directory exists and has content
-        if os.path.exists(user_data_dir):
-            # Check for Default directory (Chrome profile indicator)
-            default_dir = os.path.join(user_data_dir, "Default")
-            if os.path.exists(default_dir):
-                logger.info(f"[{self.platform_name}] Existing session found at: {user_data_dir}")
-                return True
-        
-        logger.info(f"[{self.platform_name}] No existing session found")
-        return False
+        check = session_preflight.check(self.platform_name, force=True)
+        if check.valid:
+            logger.info(f"[{self.platform_name}] Existing session found ({check.reason})")
+        else:
+            logger.info(f"[{self.platform_name}] No usable session: {check.reason}")
+        return check.valid
 
 
 def main():
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -37,6 +37,78 @@ class Settings(BaseSettings):
     max_job_runtime_seconds: int = 600
     poll_interval_seconds: int = 2
     
+    # Agents
+    agent_timeout_seconds: int = 600  # Per-platform agent timeout
+    run_agents_concurrently: bool = True
+    driver_platforms: str = "instacart,ubereats"
+    agent_execution_mode: str = "subprocess"  # "subprocess" (fresh browser per run), "pooled" (warm sessions) or "shared" (one browser per worker, a tab per platform)
+    agent_task_mode: str = "single"  # "single" (one instruction for the list) or "per_item" (parallel item tasks)
+    agent_item_max_steps: int = 30  # Step budget per item task in per_item mode
+    shopping_plan_wait_seconds: float = 60  # How long agents wait for the job plan's weights before converting themselves
+    scripted_flows_enabled: bool = True  # Try Playwright selector flows before falling back to Nova Act
+    scripted_flow_timeout_ms: int = 8000  # Per selector step
+    memory_sample_interval_seconds: float = 1.0  # Browser memory sampling per job (0 disables)
+    
+    # Session preflight (login check before any browser starts)
+    session_preflight_mode: str = "skip"  # "skip" platforms that need sign-in, "fail" the job, or "off"
+    session_preflight_ttl_seconds: float = 60  # Cache per platform (also dropped when cookies change)
+    session_preflight_fetch: bool = True  # Fetch the cart page if the cookies are inconclusive
+    session_preflight_timeout_seconds: float = 5
+    
+    # Browser profile overrides (per-platform defaults live in config/platforms.py)
+    browser_headless: Optional[bool] = None  # None: use each platform's "headless"
+    browser_block_requests: bool = True  # Abort blocked resource types / tracker domains
+    browser_auto_dismiss_popups: bool = True  # Install the popup auto-dismiss observer
+    
+    # Browser debugging ports (one per running browser, leased by the browser allocator)
+    browser_debug_port_start: int = 9222
+    browser_debug_port_count: int = 200
+    
+    # Profile snapshots (copy-on-write profile clones for parallel browsers on one account)
+    profile_snapshots_enabled: bool = True  # False: NovaAct copies the whole profile per clone
+    profile_snapshot_max_age_seconds: float = 3600  # Re-snapshot the signed-in profile after this long
+    
+    # Browser session pool (agent_execution_mode = "pooled")
+    browser_pool_size: int = 1  # Sessions per platform
+    browser_pool_max_uses: int = 20  # Recycle a session after this many jobs
+    browser_pool_prewarm: bool = False  # Start sessions at app startup
+    browser_pool_acquire_timeout_seconds: int = 600
+    
+    # Shared cart detail / edit session per platform
+    platform_session_idle_timeout_seconds: float = 120  # Stop the browser after this long unused
+    
+    # Driver job scheduler
+    max_concurrent_driver_jobs: int = 2
+    max_concurrent_browsers: int = 4
+    max_queued_driver_jobs: int = 20  # 0: unbounded
+    max_driver_job_priority: int = 10  # ?priority= is clamped to 0..this
+    driver_job_estimate_seconds: int = 300  # Seed for queue ETAs until real durations come in
+    
+    # Pipeline result cache
+    pipeline_cache_enabled: bool = True
+    pipeline_cache_ttl_seconds: int = 600
+    pipeline_cache_max_entries: int = 256
+    
+    # Weight conversion cache (shared by agent runs)
+    weight_cache_enabled: bool = True  # Persist LLM unit conversions in SQLite
+    weight_cache_memory_entries: int = 1024
+    
+    # Product catalog (products seen in cart extractions, per platform and store)
+    product_catalog_enabled: bool = True  # Let agents go straight to known products
+    product_catalog_ttl_hours: float = 72  # Older entries are stale and not used
+    product_catalog_min_match: float = 1.0  # Share of a requested item's tokens a cart line must cover to be recorded for it
+    
+    # Per-user cart states (cart detail / edit agents)
+    cart_state_store_max_users: int = 1000  # States kept in memory (LRU)
+    cart_state_store_max_weight: int = 200000  # Cart items + diffs kept in memory
+    cart_state_flush_interval_seconds: float = 2.0  # Batched write-behind of edited states
+    
+    # Job store
+    job_store_backend: str = "sqlite"  # "sqlite" (cached, write-behind) or "memory"
+    job_store_flush_interval_seconds: float = 1.0
+    job_ttl_hours: float = 24
+    job_gc_interval_seconds: int = 600
+    
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -71,9 +143,33 @@ class Settings(BaseSettings):
     def jobs_dir(self) -> Path:
         return self.runtime_dir / "jobs"
     
+    @property
+    def job_db_path(self) -> Path:
+        return self.runtime_dir / "jobs.db"
+    
+    @property
+    def cart_states_dir(self) -> Path:
+        return self.runtime_dir / "cart_states"
+    
+    @property
+    def profile_snapshots_dir(self) -> Path:
+        return self.runtime_dir / "profile_snapshots"
+    
+    @property
+    def weight_cache_db_path(self) -> Path:
+        return self.runtime_dir / "weight_cache.db"
+    
+    @property
+    def product_catalog_db_path(self) -> Path:
+        return self.runtime_dir / "product_catalog.db"
+    
     @property
     def allowed_origins_list(self) -> List[str]:
         return [o.strip() for o in self.allowed_origins.split(",")]
+    
+    @property
+    def driver_platforms_list(self) -> List[str]:
+        return [p.strip() for p in self.driver_platforms.split(",") if p.strip()]
 
 
 settings = Settings()
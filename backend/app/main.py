@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.routes import recipes, shopping, driver, comparison
+from app.routes import recipes, shopping, driver, comparison, cart
 from app.routes import orders, receipts, profiling  # Phase 3
 import logging
 import sys
@@ -43,6 +43,7 @@ app.include_router(recipes.router)
 app.include_router(shopping.router)
 app.include_router(driver.router)
 app.include_router(comparison.router)
+app.include_router(cart.router)
 
 # Phase 3 Routes
 app.include_router(orders.router)
@@ -50,6 +51,43 @@ app.include_router(receipts.router)
 app.include_router(profiling.router)
 
 
+@app.on_event("startup")
+async def prewarm_browser_pool():
+    if settings.agent_execution_mode == "pooled" and settings.browser_pool_prewarm:
+        import asyncio
+        from app.services.browser_session_pool import browser_session_pool
+        logger.info(f"Prewarming browser sessions for: {settings.driver_platforms_list}")
+        # Browser startup blocks; keep it off the event loop
+        asyncio.get_running_loop().run_in_executor(
+            None, browser_session_pool.prewarm, settings.driver_platforms_list
+        )
+
+
+@app.on_event("shutdown")
+async def shutdown_browser_pool():
+    from app.services.browser_session_pool import browser_session_pool
+    browser_session_pool.shutdown()
+
+
+@app.on_event("shutdown")
+async def shutdown_shared_browser():
+    if settings.agent_execution_mode == "shared":
+        from app.services.shared_browser import shared_browser
+        shared_browser.shutdown()
+
+
+@app.on_event("shutdown")
+async def flush_cart_states():
+    from app.services.cart_state_store import cart_state_store
+    cart_state_store.close()
+
+
+@app.on_event("shutdown")
+async def shutdown_platform_sessions():
+    from app.services.platform_session_manager import platform_session_manager
+    platform_session_manager.shutdown()
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok", "phase": "1-3"}
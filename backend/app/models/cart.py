@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+from typing import Literal
+
+
+class CartDiffRequest(BaseModel):
+    """A user's edit to one platform cart, applied on the next /apply"""
+    action: Literal["add", "remove", "update_quantity"]
+    product_name: str
+    ingredient_requested: str = ""
+    product_url: str = ""
+    price: float = 0.0
+    quantity: int = Field(1, ge=0)
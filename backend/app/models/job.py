@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Literal
+from typing import Optional, Literal, List
 from datetime import datetime
 
 JobStatus = Literal["pending", "running", "success", "error"]
@@ -18,6 +18,7 @@ class JobState(BaseModel):
 class DriverJobResponse(BaseModel):
     """Response when starting driver job"""
     job_id: str
+    queue_position: Optional[int] = None
 
 
 class DriverStatusResponse(BaseModel):
@@ -27,4 +28,14 @@ class DriverStatusResponse(BaseModel):
     cart_count: int = 0
     knot_api_count: int = 0
     message: Optional[str] = None
+    queue_position: Optional[int] = None  # 1-based, only while waiting
+    eta_seconds: Optional[int] = None  # Estimated seconds until completion
 
+
+
+class DriverJobListResponse(BaseModel):
+    """Page of driver jobs, newest first"""
+    jobs: List[JobState]
+    count: int
+    limit: int
+    offset: int
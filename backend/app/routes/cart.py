@@ -0,0 +1,86 @@
+"""
+Cart API Routes
+A user's cart state (last extracted carts and pending edits, kept in the
+cart state store under their user id) and the live platform carts. Every
+operation on a platform runs on its shared warm browser session (see
+platform_session_manager), so reading the cart after an edit does not start
+a second browser.
+"""
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from app.models.cart import CartDiffRequest
+from app.security.jwt import get_current_user_id
+from app.services.cart_state_store import cart_state_store
+from app.services.platform_session_manager import platform_session_manager
+from config.platforms import PLATFORM_CONFIGS
+from models.cart_models import CartItem
+import logging
+
+router = APIRouter(prefix="/api/cart", tags=["Cart"])
+logger = logging.getLogger(__name__)
+
+
+def _check_platform(platform: str):
+    if platform not in PLATFORM_CONFIGS:
+        raise HTTPException(status_code=404, detail=f"Unknown platform: {platform}")
+
+
+@router.get("")
+async def get_cart_state(user_id: str = Depends(get_current_user_id)):
+    """
+    The user's stored carts and pending diffs.
+    """
+    # First access loads the state file
+    state = await asyncio.to_thread(cart_state_store.get, user_id)
+    return state.to_dict()
+
+
+@router.post("/{platform}/diffs")
+async def record_diff(platform: str, request: CartDiffRequest, user_id: str = Depends(get_current_user_id)):
+    """
+    Record an edit to the platform cart; it is applied by /{platform}/apply.
+    """
+    _check_platform(platform)
+    item = CartItem(
+        ingredient_requested=request.ingredient_requested,
+        product_name=request.product_name,
+        product_url=request.product_url,
+        price=request.price,
+        quantity=request.quantity
+    )
+    diff = await asyncio.to_thread(cart_state_store.record_diff, user_id, platform, request.action, item)
+    return diff.to_dict()
+
+
+@router.post("/{platform}/extract")
+async def extract_cart(platform: str, user_id: str = Depends(get_current_user_id)):
+    """
+    Read the platform cart and store it in the user's cart state.
+    """
+    _check_platform(platform)
+    try:
+        cart = await platform_session_manager.extract_cart(platform, user_id=user_id)
+    except Exception as e:
+        logger.exception(f"[CART] {platform} cart extraction failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Cart extraction failed: {e}")
+    return cart.to_dict()
+
+
+@router.post("/{platform}/apply")
+async def apply_pending_diffs(platform: str, user_id: str = Depends(get_current_user_id)):
+    """
+    Apply the user's pending diffs for the platform, then read back the cart.
+
+    Returns the updated cart and one result per pending diff.
+    """
+    _check_platform(platform)
+    try:
+        results, cart = await platform_session_manager.edit_then_extract(platform, user_id=user_id)
+    except Exception as e:
+        logger.exception(f"[CART] Applying {platform} diffs failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Applying diffs failed: {e}")
+    return {
+        "cart": cart.to_dict(),
+        "results": [result.to_dict() for result in results],
+        "applied_count": sum(1 for result in results if result.success)
+    }
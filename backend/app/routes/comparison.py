@@ -10,7 +10,7 @@ async def get_comparison(job_id: str):
     """
     Get platform comparison results after driver completes
     """
-    platforms = parse_knot_api_jsons()
+    platforms = parse_knot_api_jsons(job_id)
     
     if not platforms:
         raise HTTPException(
@@ -1,8 +1,24 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from app.models.job import DriverJobResponse, DriverStatusResponse
+from fastapi import APIRouter, HTTPException, Query, Request, Header
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from datetime import datetime
+import asyncio
+import json
+from app.config import settings
+from app.models.job import DriverJobResponse, DriverStatusResponse, DriverJobListResponse, JobStatus
 from app.services.driver_runner import driver_runner
+from app.services.job_scheduler import driver_scheduler, QueueFullError
 from app.services.agent_orchestrator import agent_orchestrator
 from app.services.artifact_scanner import get_artifact_counts
+from app.services.job_workspace import JobWorkspace
+from app.services.job_events import job_events, is_terminal_event
+from app.services.pipeline_cache import pipeline_cache
+from app.services.product_catalog import product_catalog
+from app.services.cart_state_store import cart_state_store
+from app.services.platform_session_manager import platform_session_manager
+from app.services.browser_allocator import browser_allocator
+from app.services.shared_browser import shared_browser
+from app.services.session_preflight import session_preflight
 import psutil
 import logging
 
@@ -10,18 +26,40 @@ router = APIRouter(prefix="/run-driver", tags=["driver"])
 logger = logging.getLogger(__name__)
 
 
-def execute_agents_task(job_id: str):
-    """Background task to execute agents directly"""
-    logger.info(f"[DRIVER] Starting background task for job_id: {job_id}")
+def execute_agents_task(job_id: str, platforms: List[str]):
+    """Scheduler task to execute agents directly"""
+    logger.info(f"[DRIVER] Starting scheduled task for job_id: {job_id}")
+    _run_pipeline(job_id, platforms)
+
+
+def execute_cached_job(job_id: str, platforms: List[str]) -> bool:
+    """
+    Finish a job whose platforms are all in the pipeline cache, without queueing it.
+    Returns False (job untouched, still pending) if an entry expired meanwhile.
+    """
+    logger.info(f"[DRIVER] Job {job_id} is fully cached, completing it inline")
+    return _run_pipeline(job_id, platforms, cached_only=True)
+
+
+def _run_pipeline(job_id: str, platforms: List[str], cached_only: bool = False) -> bool:
     try:
-        # Update status to running
-        driver_runner.update_status(job_id, "running")
-        logger.info(f"[DRIVER] Job {job_id} status updated to 'running'")
+        if not cached_only:
+            # Update status to running
+            driver_runner.update_status(job_id, "running")
+            logger.info(f"[DRIVER] Job {job_id} status updated to 'running'")
         
         # Execute the full pipeline (agents + knot generation)
-        platforms = ["instacart", "ubereats"]  # Could be made configurable
         logger.info(f"[DRIVER] Executing full pipeline for platforms: {platforms}")
-        result = agent_orchestrator.execute_full_pipeline(platforms)
+        workspace = JobWorkspace.for_job(job_id)
+        result = agent_orchestrator.execute_full_pipeline(
+            platforms,
+            workspace,
+            cached_only=cached_only,
+            # Queued jobs reserved a browser per platform; give back the ones cache hits and skips don't need
+            on_to_run=lambda to_run: driver_scheduler.release_browsers(job_id, len(to_run))
+        )
+        if result.get("cache_miss"):
+            return False
         
         if result.get("success"):
             knot_count = result.get("knot_results", {}).get("generated_count", 0)
@@ -40,21 +78,55 @@ def execute_agents_task(job_id: str):
     except Exception as e:
         driver_runner.update_status(job_id, "error", str(e))
         logger.exception(f"[DRIVER] Job {job_id} failed with exception: {str(e)}")
+    return True
 
 
 @router.post("", response_model=DriverJobResponse)
-async def start_driver(background_tasks: BackgroundTasks):
+async def start_driver(priority: int = 0):
     """
-    Start background execution of agent pipeline
-    Returns job_id for tracking
+    Queue the agent pipeline on the driver scheduler
+    Returns job_id for tracking, or 429 with Retry-After when the queue is full
     """
     logger.info("[DRIVER] Received request to start driver")
+    platforms = settings.driver_platforms_list
+    # Unauthenticated input: keep it to a small range so no client can jump every queue
+    priority = min(max(priority, 0), settings.max_driver_job_priority)
     try:
         job_id = driver_runner.create_job()  # Create job without starting subprocess
         logger.info(f"[DRIVER] Created job with ID: {job_id}")
-        background_tasks.add_task(execute_agents_task, job_id)
-        logger.info(f"[DRIVER] Added background task for job: {job_id}")
-        return DriverJobResponse(job_id=job_id)
+        
+        # Cache hits need no browser: a fully cached job completes right here
+        cached = await asyncio.to_thread(agent_orchestrator.cached_platforms, platforms, JobWorkspace.for_job(job_id))
+        if platforms and len(cached) == len(platforms):
+            if await asyncio.to_thread(execute_cached_job, job_id, platforms):
+                return DriverJobResponse(job_id=job_id)
+        
+        # Hits may expire while the job waits, so reserve for a full run;
+        # the job releases what it doesn't need once dispatched
+        position = driver_scheduler.submit(
+            job_id,
+            execute_agents_task,
+            platforms,
+            priority=priority,
+            browsers=len(platforms),
+            # Published before a free worker can publish "running"
+            on_queued=lambda position: job_events.publish(
+                job_id,
+                "queued",
+                queue_position=position,
+                eta_seconds=driver_scheduler.estimate_seconds(job_id)
+            )
+        )
+        logger.info(f"[DRIVER] Queued job {job_id} at position {position}")
+        return DriverJobResponse(job_id=job_id, queue_position=position)
+    except QueueFullError as e:
+        driver_runner.update_status(job_id, "error", "Driver queue is full")
+        logger.warning(f"[DRIVER] Rejected job {job_id}: queue full, retry after {e.retry_after}s")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many driver jobs queued. Please retry later.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logger.exception(f"[DRIVER] Failed to start driver: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to start driver: {e}")
@@ -72,7 +144,7 @@ async def get_driver_status(job_id: str):
         logger.warning(f"[DRIVER] Job not found: {job_id}")
         raise HTTPException(status_code=404, detail="Job not found")
     
-    counts = get_artifact_counts()
+    counts = get_artifact_counts(job_id)
     
     message = None
     if state.status == "error":
@@ -82,11 +154,133 @@ async def get_driver_status(job_id: str):
         message = f"Completed successfully. Generated {counts['knot_api_count']} platform summaries."
         logger.info(f"[DRIVER] Job {job_id} completed successfully")
     
+    queue_position = None
+    eta_seconds = None
+    if state.status == "pending":
+        queue_position = driver_scheduler.queue_position(job_id)
+        eta_seconds = driver_scheduler.estimate_seconds(job_id)
+        if queue_position:
+            message = f"Waiting in queue (position {queue_position})"
+    elif state.status == "running":
+        eta_seconds = driver_scheduler.estimate_seconds(job_id)
+    
     return DriverStatusResponse(
         job_id=job_id,
         status=state.status,
         cart_count=counts["cart_count"],
         knot_api_count=counts["knot_api_count"],
-        message=message
+        message=message,
+        queue_position=queue_position,
+        eta_seconds=eta_seconds
     )
 
+
+
+@router.get("/jobs", response_model=DriverJobListResponse)
+async def list_driver_jobs(
+    status: Optional[JobStatus] = None,
+    since: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+):
+    """
+    List driver jobs, newest first
+    
+    Query params:
+    - status: Only jobs in this state
+    - since: Only jobs started at or after this ISO timestamp (UTC)
+    - limit / offset: Pagination
+    """
+    jobs = driver_runner.list_jobs(status=status, since=since, limit=limit, offset=offset)
+    return DriverJobListResponse(jobs=jobs, count=len(jobs), limit=limit, offset=offset)
+
+
+@router.get("/metrics")
+async def driver_metrics():
+    """Cache, catalog, cart state, browser and shared session metrics for the driver pipeline"""
+    return {
+        "pipeline_cache": pipeline_cache.stats(),
+        "product_catalog": await asyncio.to_thread(product_catalog.stats),
+        "scheduler": driver_scheduler.stats(),
+        "cart_states": cart_state_store.stats(),
+        "platform_sessions": platform_session_manager.stats(),
+        "browsers": browser_allocator.stats(),
+        "shared_browser": shared_browser.stats()
+    }
+
+
+@router.get("/sessions")
+async def driver_sessions(refresh: bool = Query(False, description="Ignore cached preflight results")):
+    """Login preflight for every driver platform (cached for SESSION_PREFLIGHT_TTL_SECONDS)"""
+    platforms = settings.driver_platforms_list
+    if refresh:
+        for platform in platforms:
+            session_preflight.invalidate(platform)
+    checks = await asyncio.to_thread(session_preflight.check_many, platforms)
+    return {platform: check.to_dict() for platform, check in checks.items()}
+
+
+def _format_sse(event: dict) -> str:
+    """Serialize one job event as a Server-Sent Events frame"""
+    return f"id: {event['id']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@router.get("/{job_id}/events")
+async def stream_driver_events(
+    job_id: str,
+    request: Request,
+    last_event_id: Optional[int] = Header(None)
+):
+    """
+    Server-Sent Events stream of a driver job's progress
+    
+    Each message is a JSON event with a "type" of:
+    queued, status, stage, agent_started, agent_finished, item_converting,
+    item_searching, agent_stage, artifacts.
+    The stream closes after the terminal status event (success/error).
+    Reconnects with Last-Event-ID only replay newer events.
+    """
+    state = driver_runner.get_status(job_id)
+    if not state:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    queue, replay = job_events.subscribe(job_id, after_id=last_event_id or 0)
+    
+    async def event_stream():
+        try:
+            for event in replay:
+                yield _format_sse(event)
+                if is_terminal_event(event):
+                    return
+            
+            # Finished before we had any history (e.g. after a restart): send a final snapshot
+            if state.status in ("success", "error") and not replay:
+                counts = get_artifact_counts(job_id)
+                yield _format_sse({
+                    "id": 0,
+                    "job_id": job_id,
+                    "type": "status",
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "data": {"status": state.status, "message": state.error_message, **counts}
+                })
+                return
+            
+            while True:
+                if await request.is_disconnected():
+                    return
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_sse(event)
+                if is_terminal_event(event):
+                    return
+        finally:
+            job_events.unsubscribe(job_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -3,7 +3,7 @@ Orders API Routes
 Endpoints for managing orders and importing Knot JSONs
 """
 from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
-from typing import List
+from typing import List, Optional
 from app.security.jwt import get_current_user_id
 from app.services.supabase_service import supabase_service
 from app.services.knot_importer import import_knot_jsons
@@ -23,10 +23,12 @@ router = APIRouter(prefix="/api/orders", tags=["Orders"])
 @router.post("/import-knot", response_model=ImportKnotResponse)
 async def import_knot(
     background_tasks: BackgroundTasks,
+    job_id: Optional[str] = None,
     user_id: str = Depends(get_current_user_id)
 ):
     """
-    Import Knot JSONs from current_code/knot_api_jsons/.
+    Import Knot JSONs from a driver job's knot_api_jsons/
+    (or the shared current_code/knot_api_jsons/ when job_id is omitted).
     
     Triggers background tasks for:
     - Receipt generation (Gemini)
@@ -35,7 +37,7 @@ async def import_knot(
     Returns list of created order IDs.
     """
     try:
-        order_ids = import_knot_jsons(user_id)
+        order_ids = import_knot_jsons(user_id, job_id=job_id)
         
         # Enqueue background tasks for each order
         for order_id in order_ids:
@@ -49,6 +51,8 @@ async def import_knot(
         )
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job_id")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
 
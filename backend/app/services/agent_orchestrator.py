@@ -7,13 +7,32 @@ import json
 import subprocess
 import logging
 import os
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 from app.config import settings
+from app.services.job_workspace import JobWorkspace
+from app.services.job_events import job_events
+from app.services.agent_progress import AgentProgressParser
+from app.services.pipeline_cache import pipeline_cache, cache_key, CachedResult
+from app.services.browser_session_pool import browser_session_pool, PoolTimeoutError
+from app.services.memory_usage import MemorySampler, child_process_tree
+from app.services.session_preflight import SessionCheck, session_preflight
+from app.agents.search_and_add_agents import get_agent_class
+from app.agents.search_and_add_agents.shopping_plan import PLAN_FILE, ShoppingPlan, start_shopping_plan
+from app.services.product_catalog import product_catalog
+from config.platforms import PLATFORM_CONFIGS
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
+# StreamReader line limit; NovaAct log lines (screenshots, page text) can be long
+AGENT_STDOUT_LINE_LIMIT = 1024 * 1024
+
 
 class AgentOrchestrator:
     """Orchestrates agent execution (instacart, ubereats) and knot generation"""
@@ -24,8 +43,6 @@ class AgentOrchestrator:
         from pathlib import Path
         backend_root = Path(__file__).parent.parent.parent
         self.agents_dir = backend_root / "app" / "agents" / "search_and_add_agents"
-        self.cart_dir = self.base_dir / "cart_jsons"
-        self.knot_dir = self.base_dir / "knot_api_jsons"
         
         # Load environment variables from backend/.env for agent subprocesses
         backend_env_file = backend_root / ".env"
@@ -35,100 +52,394 @@ class AgentOrchestrator:
         else:
             logger.warning(f"[ORCHESTRATOR] .env file not found at {backend_env_file}")
         
-        # Prepare environment for subprocesses (includes current env + loaded .env vars)
+        # Prepare environment for subprocesses (includes current env + loaded .env vars).
+        # Agents run as modules from the job workspace, so backend/ must be importable
         self.subprocess_env = os.environ.copy()
+        python_path = self.subprocess_env.get("PYTHONPATH")
+        self.subprocess_env["PYTHONPATH"] = (
+            f"{backend_root}{os.pathsep}{python_path}" if python_path else str(backend_root)
+        )
+        
+        # Jobs currently running agents in this process (pooled / shared browsers)
+        self._in_process_jobs = 0
+        self._jobs_lock = threading.Lock()
         
-    def run_agents(self, platforms: List[str]) -> Dict[str, any]:
+    def run_agents(
+        self,
+        platforms: List[str],
+        concurrent: Optional[bool] = None,
+        workspace: Optional[JobWorkspace] = None
+    ) -> Dict[str, any]:
         """
         Run browser agents for specified platforms
         
         Args:
             platforms: List of platform names (e.g., ['instacart', 'ubereats'])
+            concurrent: Run all platforms at once (defaults to settings.run_agents_concurrently).
+                When False, agents run one after the other.
+            workspace: Directory the agents run in (defaults to the shared data_dir)
             
         Returns:
-            Dict with success status and results
+            Dict with success status, results and the job's browser memory use
         """
         if not platforms:
             logger.error("[ORCHESTRATOR] No platforms specified")
             return {"success": False, "error": "No platforms specified"}
         
-        logger.info(f"[ORCHESTRATOR] Running agents for platforms: {platforms}")
-        results = {}
-        python_exe = sys.executable
+        if concurrent is None:
+            concurrent = settings.run_agents_concurrently
+        workspace = workspace or JobWorkspace.shared()
         
-        for platform in platforms:
-            agent_script = self.agents_dir / f"{platform}.py"
-            
-            if not agent_script.exists():
-                logger.error(f"[ORCHESTRATOR] Agent script not found for {platform}: {agent_script}")
-                results[platform] = {"success": False, "error": f"Agent script not found: {agent_script}"}
-                continue
-            
-            logger.info(f"[ORCHESTRATOR] Running {platform} agent from {agent_script}")
-            
+        mode = "concurrently" if concurrent else "sequentially"
+        logger.info(f"[ORCHESTRATOR] Running agents {mode} for platforms: {platforms}")
+        started = time.monotonic()
+        
+        sampler = self._memory_sampler(workspace)
+        sampler.start()
+        in_process = sampler.mode != "subprocess"
+        if in_process:
+            with self._jobs_lock:
+                self._in_process_jobs += 1
+        try:
+            if concurrent:
+                # Called from a worker thread (no running loop), so we own the event loop here
+                results = asyncio.run(self._run_agents_concurrently(platforms, workspace))
+            else:
+                results = {}
+                for platform in platforms:
+                    self._emit(workspace, "agent_started", platform=platform)
+                    results[platform] = self._run_agent_sync(platform, workspace)
+                    self._emit_agent_finished(workspace, platform, results[platform])
+        finally:
+            memory = sampler.stop()
+            if in_process:
+                with self._jobs_lock:
+                    self._in_process_jobs -= 1
+        
+        elapsed = time.monotonic() - started
+        logger.info(f"[ORCHESTRATOR] All agents finished in {elapsed:.1f}s")
+        logger.info(
+            f"[ORCHESTRATOR] Browser memory ({memory['mode']}): peak {memory['peak_rss_mb']} MB, "
+            f"avg {memory['avg_rss_mb']} MB per job"
+        )
+        self._emit(workspace, "memory", **memory)
+        
+        return {
+            "success": True,
+            "platform_results": results,
+            "duration_seconds": round(elapsed, 2),
+            "memory": memory
+        }
+    
+    def _memory_sampler(self, workspace: JobWorkspace) -> MemorySampler:
+        """
+        Sampler for this job's browser memory. Subprocess agents are told apart
+        by their working directory (the job workspace); in-process browsers are
+        shared by all jobs running at the time.
+        """
+        mode = settings.agent_execution_mode
+        interval = settings.memory_sample_interval_seconds
+        if mode not in ("pooled", "shared"):
+            return MemorySampler("subprocess", lambda: child_process_tree(workspace.root), interval=interval)
+        
+        if mode == "shared":
+            from app.services.shared_browser import shared_browser
+            pids = shared_browser.pids
+        else:
+            pids = child_process_tree
+        return MemorySampler(mode, pids, shared_by=lambda: self._in_process_jobs, interval=interval)
+    
+    async def _run_agents_concurrently(self, platforms: List[str], workspace: JobWorkspace) -> Dict[str, Dict]:
+        """Launch every platform agent at once and wait for all of them"""
+        async def run_tracked(platform: str) -> Dict[str, any]:
+            self._emit(workspace, "agent_started", platform=platform)
             try:
-                # Run agent script
-                # Working directory is backend/data so agents can find shopping_list.json
-                # Pass environment variables so agents can access .env vars
-                result = subprocess.run(
-                    [python_exe, str(agent_script)],
-                    cwd=str(self.base_dir),  # backend/data
-                    env=self.subprocess_env,  # Pass environment with .env vars loaded
-                    capture_output=True,
-                    text=True,
-                    timeout=600  # 10 minute timeout per agent
-                )
-                
-                if result.returncode == 0:
-                    results[platform] = {
-                        "success": True,
-                        "stdout": result.stdout[-500:] if result.stdout else "",  # Last 500 chars
-                        "stderr": result.stderr[-500:] if result.stderr else ""
-                    }
-                    logger.info(f"[ORCHESTRATOR] ✓ {platform} agent completed successfully")
-                else:
-                    results[platform] = {
-                        "success": False,
-                        "error": f"Agent exited with code {result.returncode}",
-                        "stdout": result.stdout[-500:] if result.stdout else "",
-                        "stderr": result.stderr[-500:] if result.stderr else ""
-                    }
-                    logger.error(f"[ORCHESTRATOR] ✗ {platform} agent failed with code {result.returncode}")
-                    if result.stderr:
-                        logger.error(f"[ORCHESTRATOR] {platform} stderr: {result.stderr[-200:]}")
-                    
-            except subprocess.TimeoutExpired:
-                results[platform] = {"success": False, "error": "Agent timed out"}
-                logger.error(f"[ORCHESTRATOR] ✗ {platform} agent timed out after 600s")
+                result = await self._run_agent_async(platform, workspace)
             except Exception as e:
-                results[platform] = {"success": False, "error": str(e)}
-                logger.exception(f"[ORCHESTRATOR] ✗ {platform} agent failed with exception: {e}")
+                logger.error(f"[ORCHESTRATOR] ✗ {platform} agent failed with exception: {e}")
+                result = {"success": False, "error": str(e)}
+            self._emit_agent_finished(workspace, platform, result)
+            return result
+        
+        outcomes = await asyncio.gather(*(run_tracked(platform) for platform in platforms))
+        return dict(zip(platforms, outcomes))
+    
+    async def _run_agent_async(self, platform: str, workspace: JobWorkspace) -> Dict[str, any]:
+        """Run one agent script as an asyncio subprocess with a per-platform timeout"""
+        if settings.agent_execution_mode in ("pooled", "shared"):
+            return await self._run_agent_pooled_async(platform, workspace)
+        
+        agent_script = self._agent_script(platform)
+        if agent_script is None:
+            return {"success": False, "error": f"Agent script not found: {self.agents_dir / f'{platform}.py'}"}
+        
+        timeout = settings.agent_timeout_seconds
+        logger.info(f"[ORCHESTRATOR] Starting {platform} agent from {agent_script}")
+        started = time.monotonic()
+        
+        # Working directory is the job workspace so agents find its shopping_list.json
+        # and write into its cart_jsons/. Pass environment so agents can access .env vars
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", self._agent_module(platform),
+            cwd=str(workspace.root),
+            env=self.subprocess_env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=AGENT_STDOUT_LINE_LIMIT
+        )
+        
+        # Read stdout line by line so progress events go out while the agent runs
+        parser = AgentProgressParser(platform, self._shopping_list_items(workspace))
+        stdout_tail: deque = deque(maxlen=200)
+        stderr_tail: deque = deque(maxlen=200)
+        
+        def on_stdout_line(line: str):
+            event = parser.parse_line(line)
+            if event:
+                self._emit(workspace, event.pop("type"), **event)
+        
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(
+                    self._pump_lines(process.stdout, stdout_tail, on_stdout_line),
+                    self._pump_lines(process.stderr, stderr_tail),
+                    process.wait()
+                ),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            logger.error(f"[ORCHESTRATOR] ✗ {platform} agent timed out after {timeout}s")
+            return {
+                "success": False,
+                "error": "Agent timed out",
+                "duration_seconds": round(time.monotonic() - started, 2)
+            }
+        
+        return self._build_agent_result(
+            platform,
+            process.returncode,
+            "".join(stdout_tail),
+            "".join(stderr_tail),
+            time.monotonic() - started
+        )
+    
+    async def _pump_lines(self, stream: asyncio.StreamReader, tail: deque, on_line=None):
+        """Drain a subprocess pipe line by line, keeping the last lines for the result"""
+        while True:
+            try:
+                raw = await stream.readline()
+            except ValueError:
+                # Line longer than the limit: take what is buffered and keep going
+                raw = await stream.read(AGENT_STDOUT_LINE_LIMIT)
+            if not raw:
+                break
+            line = raw.decode("utf-8", errors="replace")
+            tail.append(line)
+            if on_line:
+                try:
+                    on_line(line)
+                except Exception as e:
+                    logger.debug(f"[ORCHESTRATOR] Progress parse error: {e}")
+    
+    def _run_agent_sync(self, platform: str, workspace: JobWorkspace) -> Dict[str, any]:
+        """Run one agent script with a blocking subprocess call"""
+        if settings.agent_execution_mode in ("pooled", "shared"):
+            return self._run_agent_pooled(platform, workspace)
+        
+        agent_script = self._agent_script(platform)
+        if agent_script is None:
+            return {"success": False, "error": f"Agent script not found: {self.agents_dir / f'{platform}.py'}"}
+        
+        timeout = settings.agent_timeout_seconds
+        logger.info(f"[ORCHESTRATOR] Running {platform} agent from {agent_script}")
+        started = time.monotonic()
+        
+        try:
+            result = subprocess.run(
+                [sys.executable, "-m", self._agent_module(platform)],
+                cwd=str(workspace.root),
+                env=self.subprocess_env,
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            logger.error(f"[ORCHESTRATOR] ✗ {platform} agent timed out after {timeout}s")
+            return {"success": False, "error": "Agent timed out"}
+        except Exception as e:
+            logger.exception(f"[ORCHESTRATOR] ✗ {platform} agent failed with exception: {e}")
+            return {"success": False, "error": str(e)}
+        
+        return self._build_agent_result(
+            platform, result.returncode, result.stdout, result.stderr, time.monotonic() - started
+        )
+    
+    async def _run_agent_pooled_async(self, platform: str, workspace: JobWorkspace) -> Dict[str, any]:
+        """Run a pooled agent off the event loop with the per-platform timeout"""
+        timeout = settings.agent_timeout_seconds
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(self._run_agent_pooled, platform, workspace), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            # The run can't be interrupted mid-act; it finishes on the session thread
+            # and the session goes back to the pool afterwards
+            logger.error(f"[ORCHESTRATOR] ✗ {platform} agent timed out after {timeout}s")
+            return {
+                "success": False,
+                "error": "Agent timed out",
+                "duration_seconds": round(time.monotonic() - started, 2)
+            }
+    
+    def _run_agent_pooled(self, platform: str, workspace: JobWorkspace) -> Dict[str, any]:
+        """
+        Run an agent in-process, on a warm browser session from the pool or
+        (agent_execution_mode = "shared") on a tab of this worker's shared browser
+        """
+        try:
+            agent_class = get_agent_class(platform)
+        except KeyError as e:
+            logger.error(f"[ORCHESTRATOR] {e}")
+            return {"success": False, "error": str(e)}
+        
+        shopping_list = self._load_shopping_list(workspace)
+        plan_path = workspace.root / PLAN_FILE
+        agent = agent_class(
+            on_progress=lambda event_type, **data: self._emit(workspace, event_type, **data),
+            plan=ShoppingPlan.load(plan_path),
+            plan_path=plan_path
+        )
+        shared = settings.agent_execution_mode == "shared"
+        logger.info(f"[ORCHESTRATOR] Running {platform} agent on a {'shared browser tab' if shared else 'pooled browser session'}")
+        started = time.monotonic()
+        
+        try:
+            if shared:
+                from app.services.shared_browser import shared_browser
+                cart_data = shared_browser.run(platform, agent.run_on_session, shopping_list)
+            else:
+                with browser_session_pool.session(
+                    platform, timeout=settings.browser_pool_acquire_timeout_seconds
+                ) as session:
+                    cart_data = session.call(agent.run_on_session, shopping_list)
+        except PoolTimeoutError as e:
+            logger.error(f"[ORCHESTRATOR] ✗ {platform}: {e}")
+            return {"success": False, "error": str(e)}
+        except Exception as e:
+            logger.exception(f"[ORCHESTRATOR] ✗ {platform} agent failed with exception: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "duration_seconds": round(time.monotonic() - started, 2)
+            }
+        
+        duration = time.monotonic() - started
+        if cart_data is None:
+            logger.error(f"[ORCHESTRATOR] ✗ {platform} agent could not extract the cart")
+            return {"success": False, "error": "Cart extraction failed", "duration_seconds": round(duration, 2)}
+        
+        agent.write_cart_json(cart_data, workspace.cart_dir)
+        logger.info(f"[ORCHESTRATOR] ✓ {platform} agent completed in {duration:.1f}s")
+        return {"success": True, "duration_seconds": round(duration, 2)}
+    
+    def _emit(self, workspace: JobWorkspace, event_type: str, **data):
+        """Publish a progress event for the workspace's job (no-op for the shared workspace)"""
+        job_events.publish(workspace.job_id, event_type, **data)
+    
+    def _emit_agent_finished(self, workspace: JobWorkspace, platform: str, result: Dict[str, any]):
+        self._emit(
+            workspace,
+            "agent_finished",
+            platform=platform,
+            success=result.get("success", False),
+            error=result.get("error"),
+            duration_seconds=result.get("duration_seconds")
+        )
+    
+    def _load_shopping_list(self, workspace: JobWorkspace) -> List[Dict]:
+        """Entries of the workspace shopping list, or [] if it can't be read"""
+        try:
+            with open(workspace.shopping_list_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("shopping_list", [])
+        except Exception:
+            return []
+    
+    def _shopping_list_items(self, workspace: JobWorkspace) -> List[str]:
+        """Item names from the workspace shopping list, used to recognize searches in agent output"""
+        return [entry.get("item", "") for entry in self._load_shopping_list(workspace)]
+    
+    def _agent_script(self, platform: str) -> Optional[Path]:
+        """Resolve the agent script for a platform, or None if it is missing"""
+        agent_script = self.agents_dir / f"{platform}.py"
+        if not agent_script.exists():
+            logger.error(f"[ORCHESTRATOR] Agent script not found for {platform}: {agent_script}")
+            return None
+        return agent_script
+    
+    def _agent_module(self, platform: str) -> str:
+        return f"app.agents.search_and_add_agents.{platform}"
+    
+    def _build_agent_result(
+        self, platform: str, returncode: int, stdout: str, stderr: str, duration: float
+    ) -> Dict[str, any]:
+        """Shape captured subprocess output into a per-platform result"""
+        result = {
+            "success": returncode == 0,
+            "stdout": stdout[-500:] if stdout else "",  # Last 500 chars
+            "stderr": stderr[-500:] if stderr else "",
+            "duration_seconds": round(duration, 2)
+        }
         
-        return {"success": True, "platform_results": results}
+        if returncode == 0:
+            logger.info(f"[ORCHESTRATOR] ✓ {platform} agent completed successfully in {duration:.1f}s")
+        else:
+            result["error"] = f"Agent exited with code {returncode}"
+            logger.error(f"[ORCHESTRATOR] ✗ {platform} agent failed with code {returncode}")
+            if stderr:
+                logger.error(f"[ORCHESTRATOR] {platform} stderr: {stderr[-200:]}")
+        
+        return result
     
-    def build_knot_jsons(self) -> Dict[str, any]:
+    def build_knot_jsons(
+        self,
+        workspace: Optional[JobWorkspace] = None,
+        cart_files: Optional[List[str]] = None
+    ) -> Dict[str, any]:
         """
         Build Knot-style JSONs from cart_jsons using mock_response
         This is Step 3 from main.py
         
+        Args:
+            workspace: Workspace whose cart_jsons/ is read (defaults to the shared data_dir)
+            cart_files: Only convert these cart file names (default: every file in cart_jsons/)
+        
         Returns:
             Dict with success status and count of generated files
         """
         logger.info("[ORCHESTRATOR] Building Knot JSONs from cart files")
+        workspace = workspace or JobWorkspace.shared()
+        cart_dir = workspace.cart_dir
+        knot_dir = workspace.knot_dir
         try:
             # Import the build function from app/knot_api
             from app.knot_api.mock_response import build_knot_like_from_cart
             
             # Create output directory
-            self.knot_dir.mkdir(parents=True, exist_ok=True)
+            knot_dir.mkdir(parents=True, exist_ok=True)
             
             generated_count = 0
             
-            if self.cart_dir.exists():
-                cart_files = list(self.cart_dir.glob("*.json"))
-                logger.info(f"[ORCHESTRATOR] Found {len(cart_files)} cart file(s) to process")
+            if cart_dir.exists():
+                to_process = [
+                    f for f in cart_dir.glob("*.json")
+                    if cart_files is None or f.name in cart_files
+                ]
+                logger.info(f"[ORCHESTRATOR] Found {len(to_process)} cart file(s) to process")
                 
-                for cart_file in cart_files:
+                for cart_file in to_process:
                     logger.info(f"[ORCHESTRATOR] Processing {cart_file.name}...")
                     knot_obj = build_knot_like_from_cart(str(cart_file))
                     
@@ -136,41 +447,43 @@ class AgentOrchestrator:
                         logger.warning(f"[ORCHESTRATOR] Failed to build Knot JSON from {cart_file.name}")
                         continue
                     
-                    out_path = self.knot_dir / cart_file.name
+                    out_path = knot_dir / cart_file.name
                     with open(out_path, "w", encoding="utf-8") as f:
                         json.dump(knot_obj, f, ensure_ascii=False, indent=2)
                     
                     generated_count += 1
                     logger.info(f"[ORCHESTRATOR] ✓ Generated {out_path.name}")
             else:
-                logger.warning(f"[ORCHESTRATOR] Cart directory does not exist: {self.cart_dir}")
+                logger.warning(f"[ORCHESTRATOR] Cart directory does not exist: {cart_dir}")
             
             logger.info(f"[ORCHESTRATOR] Knot JSON generation complete. Generated {generated_count} file(s)")
             return {
                 "success": True,
                 "generated_count": generated_count,
-                "output_dir": str(self.knot_dir)
+                "output_dir": str(knot_dir)
             }
             
         except Exception as e:
             logger.exception(f"[ORCHESTRATOR] Failed to build Knot JSONs: {e}")
             return {"success": False, "error": str(e)}
     
-    def _clear_old_outputs(self):
+    def _clear_old_outputs(self, workspace: JobWorkspace):
         """Clear old cart and knot JSON files before new run"""
-        logger.info("[ORCHESTRATOR] Clearing old output files")
+        logger.info(f"[ORCHESTRATOR] Clearing old output files in {workspace.root}")
+        cart_dir = workspace.cart_dir
+        knot_dir = workspace.knot_dir
         try:
             # Clear cart_jsons directory
-            if self.cart_dir.exists():
-                cart_files = list(self.cart_dir.glob("*.json"))
+            if cart_dir.exists():
+                cart_files = list(cart_dir.glob("*.json"))
                 for json_file in cart_files:
                     json_file.unlink()
                     logger.debug(f"[ORCHESTRATOR] Deleted old cart file: {json_file.name}")
                 logger.info(f"[ORCHESTRATOR] Cleared {len(cart_files)} cart file(s)")
             
             # Clear knot_api_jsons directory
-            if self.knot_dir.exists():
-                knot_files = list(self.knot_dir.glob("*.json"))
+            if knot_dir.exists():
+                knot_files = list(knot_dir.glob("*.json"))
                 for json_file in knot_files:
                     json_file.unlink()
                     logger.debug(f"[ORCHESTRATOR] Deleted old knot file: {json_file.name}")
@@ -181,12 +494,102 @@ class AgentOrchestrator:
         except Exception as e:
             logger.warning(f"[ORCHESTRATOR] Could not clear old outputs: {e}")
     
-    def execute_full_pipeline(self, platforms: List[str]) -> Dict[str, any]:
+    def cached_platforms(self, platforms: List[str], workspace: JobWorkspace) -> List[str]:
+        """Platforms with a fresh pipeline cache entry for the workspace's list (no hit/miss counted)"""
+        if not settings.pipeline_cache_enabled:
+            return []
+        keys = self._cache_keys(platforms, workspace)
+        return [p for p in platforms if pipeline_cache.peek(keys[p])]
+    
+    def _cache_keys(self, platforms: List[str], workspace: JobWorkspace) -> Dict[str, str]:
+        entries = self._load_shopping_list(workspace)
+        return {
+            p: cache_key(entries, p, PLATFORM_CONFIGS.get(p, {}).get("store_name"))
+            for p in platforms
+        }
+    
+    def _restore_cached_results(
+        self, platforms: List[str], workspace: JobWorkspace, keys: Dict[str, str]
+    ) -> List[str]:
+        """
+        Copy cached cart + Knot JSONs into the workspace for every platform with a fresh hit.
+        
+        Returns:
+            Platforms served from cache
+        """
+        hits = []
+        for platform in platforms:
+            cached = pipeline_cache.get(keys[platform])
+            if not cached:
+                continue
+            
+            workspace.cart_dir.mkdir(parents=True, exist_ok=True)
+            workspace.knot_dir.mkdir(parents=True, exist_ok=True)
+            with open(workspace.cart_dir / cached.cart_file, "w", encoding="utf-8") as f:
+                json.dump(cached.cart_json, f, indent=2)
+            with open(workspace.knot_dir / cached.cart_file, "w", encoding="utf-8") as f:
+                json.dump(cached.knot_json, f, ensure_ascii=False, indent=2)
+            
+            hits.append(platform)
+            logger.info(f"[ORCHESTRATOR] ✓ {platform} served from result cache")
+            self._emit(workspace, "cache_hit", platform=platform)
+        return hits
+    
+    def _cache_new_results(self, platforms: List[str], workspace: JobWorkspace, keys: Dict[str, str]):
+        """Cache the artifacts of platforms whose agent produced a usable cart"""
+        for platform in platforms:
+            cart_file = PLATFORM_CONFIGS.get(platform, {}).get("cart_file")
+            if not cart_file:
+                continue
+            cart_path = workspace.cart_dir / cart_file
+            knot_path = workspace.knot_dir / cart_file
+            if not (cart_path.exists() and knot_path.exists()):
+                continue
+            try:
+                with open(cart_path, "r", encoding="utf-8") as f:
+                    cart_json = json.load(f)
+                with open(knot_path, "r", encoding="utf-8") as f:
+                    knot_json = json.load(f)
+            except Exception as e:
+                logger.warning(f"[ORCHESTRATOR] Not caching {platform} result: {e}")
+                continue
+            
+            # Only cache runs where the agent actually extracted a cart
+            if not cart_json.get("extraction_successful"):
+                continue
+            
+            pipeline_cache.put(keys[platform], CachedResult(
+                platform=platform,
+                cart_file=cart_file,
+                cart_json=cart_json,
+                knot_json=knot_json
+            ))
+    
+    def execute_full_pipeline(
+        self,
+        platforms: List[str],
+        workspace: Optional[JobWorkspace] = None,
+        use_cache: Optional[bool] = None,
+        cached_only: bool = False,
+        on_to_run: Optional[Callable[[List[str]], None]] = None
+    ) -> Dict[str, any]:
         """
         Execute the complete pipeline:
-        1. Clear old cache files
-        2. Run agents for specified platforms
-        3. Build Knot JSONs from cart data
+        1. Clear old cache files in the workspace
+        2. Restore cached results for platforms that ran this list recently
+        3. Check the remaining platforms' logins (skip or fail those that need sign-in)
+        4. Start the job's shopping plan (names, weight estimates) once for all agents
+        5. Run agents for the remaining platforms while the plan's weights come in
+        6. Build Knot JSONs from their cart data
+        
+        Args:
+            platforms: Platform names to run
+            workspace: Per-job workspace (defaults to the shared data_dir)
+            use_cache: Consult the pipeline result cache (defaults to settings.pipeline_cache_enabled)
+            cached_only: Stop before any agent runs if a platform misses the cache;
+                the result then has "cache_miss" with those platforms
+            on_to_run: Called with the platforms agents will run for, once cache
+                hits and sign-in skips are known (e.g. to release unneeded browsers)
         
         Returns:
             Dict with success status and results from each step
@@ -195,12 +598,60 @@ class AgentOrchestrator:
         logger.info(f"[ORCHESTRATOR] Starting full pipeline for platforms: {platforms}")
         logger.info(f"[ORCHESTRATOR] ═══════════════════════════════════════")
         
+        workspace = workspace or JobWorkspace.shared()
+        logger.info(f"[ORCHESTRATOR] Workspace: {workspace.root}")
+        
         # Clear old output files before running
-        self._clear_old_outputs()
+        self._clear_old_outputs(workspace)
+        
+        if use_cache is None:
+            use_cache = settings.pipeline_cache_enabled
+        
+        cache_hits: List[str] = []
+        keys: Dict[str, str] = {}
+        if use_cache:
+            keys = self._cache_keys(platforms, workspace)
+            cache_hits = self._restore_cached_results(platforms, workspace, keys)
+        to_run = [p for p in platforms if p not in cache_hits]
+        if cached_only and to_run:
+            logger.info(f"[ORCHESTRATOR] Not cached anymore: {to_run}")
+            return {"success": False, "error": "Not all platforms are cached", "cache_miss": to_run}
+        
+        # Expired logins fail here, before any browser is allocated
+        to_run, needs_login = self._preflight_sessions(to_run, workspace)
+        if needs_login and settings.session_preflight_mode == "fail":
+            logger.error(f"[ORCHESTRATOR] ✗ Sign-in needed for {list(needs_login)}, failing the job")
+            return {
+                "success": False,
+                "error": f"Sign-in needed for: {', '.join(needs_login)}",
+                "session_results": {p: check.to_dict() for p, check in needs_login.items()}
+            }
+        
+        if on_to_run is not None:
+            on_to_run(to_run)
+        
+        # Converts quantities in the background while the agents start
+        plan_build = self._prepare_shopping_plan(to_run, workspace) if to_run else None
         
         # Step 1: Run agents
         logger.info("[ORCHESTRATOR] Step 1/2: Running browser agents")
-        agent_results = self.run_agents(platforms)
+        self._emit(workspace, "stage", stage="agents", step=1, total_steps=2, platforms=to_run)
+        if to_run:
+            agent_results = self.run_agents(to_run, workspace=workspace)
+        else:
+            logger.info("[ORCHESTRATOR] No platforms left to run, skipping agents")
+            agent_results = {"success": True, "platform_results": {}}
+        if plan_build is not None:
+            plan_build.join()
+        for platform in cache_hits:
+            agent_results.setdefault("platform_results", {})[platform] = {"success": True, "cached": True}
+        for platform, check in needs_login.items():
+            agent_results.setdefault("platform_results", {})[platform] = {
+                "success": False,
+                "skipped": True,
+                "error": f"Sign-in needed: {check.reason}",
+                "session": check.to_dict()
+            }
         
         if not agent_results.get("success"):
             logger.error("[ORCHESTRATOR] ✗ Pipeline failed during agent execution")
@@ -212,7 +663,29 @@ class AgentOrchestrator:
         
         # Step 2: Build Knot JSONs
         logger.info("[ORCHESTRATOR] Step 2/2: Building Knot JSONs")
-        knot_results = self.build_knot_jsons()
+        self._emit(workspace, "stage", stage="knot", step=2, total_steps=2)
+        if to_run:
+            ran_files = [
+                f.name for f in workspace.cart_dir.glob("*.json")
+                if f.name not in {PLATFORM_CONFIGS.get(p, {}).get("cart_file") for p in cache_hits}
+            ] if workspace.cart_dir.exists() else []
+            knot_results = self.build_knot_jsons(workspace, cart_files=ran_files)
+        else:
+            knot_results = {"success": True, "generated_count": 0, "output_dir": str(workspace.knot_dir)}
+        
+        # Cached Knot JSONs count as outputs of this run
+        knot_results["cached_count"] = len(cache_hits)
+        knot_results["generated_count"] = knot_results.get("generated_count", 0) + len(cache_hits)
+        
+        if use_cache and to_run:
+            self._cache_new_results(to_run, workspace, keys)
+        
+        self._emit(
+            workspace,
+            "artifacts",
+            cart_count=len(list(workspace.cart_dir.glob("*.json"))) if workspace.cart_dir.exists() else 0,
+            knot_api_count=knot_results.get("generated_count", 0)
+        )
         
         # Overall success if we generated at least one Knot JSON
         success = knot_results.get("success") and knot_results.get("generated_count", 0) > 0
@@ -228,8 +701,104 @@ class AgentOrchestrator:
         return {
             "success": success,
             "agent_results": agent_results,
-            "knot_results": knot_results
+            "knot_results": knot_results,
+            "cache_results": {"hits": cache_hits, "misses": to_run if use_cache else []},
+            "session_results": {p: check.to_dict() for p, check in needs_login.items()}
         }
+    
+    def _prepare_shopping_plan(self, platforms: List[str], workspace: JobWorkspace) -> Optional[threading.Thread]:
+        """
+        Start the job's shopping plan and save it in the workspace, where
+        every agent picks it up. Entries waiting on the LLM are saved as
+        pending and the file is rewritten as their weights come in, so the
+        agents start their browsers and open their stores meanwhile. A
+        complete plan already there for the same list (a retried job) is reused.
+        
+        Weights are skipped for items every platform in this run has in its
+        product catalog, since no agent will need them.
+        
+        Returns:
+            The thread finishing the plan, or None if nothing is left to convert
+        """
+        shopping_list = self._load_shopping_list(workspace)
+        if not shopping_list:
+            return None
+        path = workspace.root / PLAN_FILE
+        plan = ShoppingPlan.load(path)
+        if plan is not None and plan.matches(shopping_list) and plan.complete:
+            logger.info(f"[ORCHESTRATOR] Reusing shopping plan from {path}")
+            return None
+        
+        def known_everywhere(item: str) -> bool:
+            if not settings.product_catalog_enabled:
+                return False
+            try:
+                return all(
+                    product_catalog.contains(p, PLATFORM_CONFIGS[p].get("store_name"), item)
+                    for p in platforms
+                )
+            except Exception:
+                return False
+        
+        started = time.monotonic()
+        try:
+            plan, futures = start_shopping_plan(
+                shopping_list,
+                skip_item=known_everywhere,
+                on_converting=lambda item, qty: self._emit(workspace, "item_converting", item=item, quantity=str(qty))
+            )
+            plan.save(path)
+        except Exception as e:
+            # Agents build their own plan without it
+            logger.warning(f"[ORCHESTRATOR] Could not build the shopping plan, agents will each build one: {e}")
+            return None
+        
+        def finish():
+            waiting = [future for future in futures if not future.done()]
+            try:
+                while waiting:
+                    done, waiting = wait(waiting, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future.exception() is not None:
+                            raise future.exception()
+                    plan.save(path)
+            except Exception as e:
+                # A missing plan tells waiting agents to convert the rest themselves
+                logger.warning(f"[ORCHESTRATOR] Shopping plan weights failed, agents will convert them: {e}")
+                path.unlink(missing_ok=True)
+                return
+            
+            estimated = sum(1 for item in plan.items if item.weight)
+            logger.info(
+                f"[ORCHESTRATOR] Shopping plan: {len(plan.items)} items, {estimated} weight estimates "
+                f"in {time.monotonic() - started:.1f}s (shared by {len(platforms)} agents)"
+            )
+            self._emit(workspace, "shopping_plan", item_count=len(plan.items), weight_estimates=estimated)
+        
+        if plan.complete:
+            finish()
+            return None
+        logger.info(f"[ORCHESTRATOR] Shopping plan saved with {sum(1 for item in plan.items if item.pending)} conversions pending")
+        thread = threading.Thread(target=finish, name=f"shopping-plan-{workspace.job_id or 'shared'}", daemon=True)
+        thread.start()
+        return thread
+    
+    def _preflight_sessions(self, platforms: List[str], workspace: JobWorkspace):
+        """
+        Split platforms into those whose login looks usable and those that need sign-in.
+        
+        Returns:
+            (platforms to run, {platform: SessionCheck} for platforms that need sign-in)
+        """
+        if not platforms or settings.session_preflight_mode == "off":
+            return platforms, {}
+        
+        checks = session_preflight.check_many(platforms)
+        needs_login: Dict[str, SessionCheck] = {p: c for p, c in checks.items() if not c.valid}
+        for platform, check in needs_login.items():
+            logger.warning(f"[ORCHESTRATOR] ⚠ {platform} needs sign-in ({check.reason}), not starting its agent")
+            self._emit(workspace, "session_invalid", platform=platform, reason=check.reason, method=check.method)
+        return [p for p in platforms if p not in needs_login], needs_login
 
 
 # Singleton
@@ -0,0 +1,77 @@
+"""
+Agent Progress Parser
+Turns search-and-add agent stdout, line by line, into structured progress events.
+
+Recognized lines:
+- "Converting measurement for: <item> - <qty>"   (agent script, before the browser starts)
+- agentType(..., "<text>") / type("<text>")       (NovaAct actuation log while searching)
+- "STEP 2: Extracting cart details..."             (agent script)
+- "Parsed <n> items:"                              (agent script)
+- "Item task: <item> - added|failed"               (agent script, per-item mode)
+"""
+import re
+from typing import Iterable, Optional
+
+_CONVERTING = re.compile(r"Converting measurement for:\s*(.+?)\s+-\s+(.+)$")
+_TYPED_TEXT = re.compile(r"\b(?:agentType|type)\(\s*(?:\"<box>[^\"]*</box>\"\s*,\s*)?\"([^\"<][^\"]*)\"")
+_EXTRACTING = re.compile(r"STEP 2: Extracting cart details", re.IGNORECASE)
+_PARSED = re.compile(r"Parsed\s+(\d+)\s+items", re.IGNORECASE)
+_ITEM_RESULT = re.compile(r"Item task:\s*(.+?)\s+-\s+(added|failed)\s*$")
+
+
+class AgentProgressParser:
+    """
+    Stateful per-agent parser.
+
+    Typed search text is matched against the job's shopping list so only real
+    item searches are reported (not store names or address fields), and the
+    same item is reported once per run of consecutive searches.
+    """
+
+    def __init__(self, platform: str, items: Iterable[str] = ()):
+        self.platform = platform
+        self._items = [i.lower() for i in items if i]
+        self._current_item: Optional[str] = None
+
+    def parse_line(self, line: str) -> Optional[dict]:
+        """Return an event dict ({"type": ..., **data}) or None"""
+        line = line.strip()
+        if not line:
+            return None
+
+        match = _CONVERTING.search(line)
+        if match:
+            return {"type": "item_converting", "platform": self.platform,
+                    "item": match.group(1), "quantity": match.group(2)}
+
+        match = _ITEM_RESULT.search(line)
+        if match:
+            return {"type": "item_result", "platform": self.platform,
+                    "item": match.group(1), "success": match.group(2) == "added"}
+
+        match = _TYPED_TEXT.search(line)
+        if match:
+            item = self._match_item(match.group(1))
+            if item and item != self._current_item:
+                self._current_item = item
+                return {"type": "item_searching", "platform": self.platform, "item": item}
+            return None
+
+        if _EXTRACTING.search(line):
+            return {"type": "agent_stage", "platform": self.platform, "stage": "extracting_cart"}
+
+        match = _PARSED.search(line)
+        if match:
+            return {"type": "agent_stage", "platform": self.platform,
+                    "stage": "cart_parsed", "item_count": int(match.group(1))}
+
+        return None
+
+    def _match_item(self, typed: str) -> Optional[str]:
+        typed_lower = typed.strip().lower()
+        if not self._items:
+            return typed.strip()
+        for item in self._items:
+            if item in typed_lower or typed_lower in item:
+                return item
+        return None
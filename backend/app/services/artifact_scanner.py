@@ -1,27 +1,26 @@
-from pathlib import Path
-from app.config import settings
+from typing import Optional
+from app.services.job_workspace import resolve_workspace
 
 
-def count_cart_artifacts() -> int:
-    """Count JSON files in cart_jsons/"""
-    cart_dir = settings.cart_jsons_dir
+def count_cart_artifacts(job_id: Optional[str] = None) -> int:
+    """Count JSON files in the job's cart_jsons/ (shared data_dir if no job_id)"""
+    cart_dir = resolve_workspace(job_id).cart_dir
     if not cart_dir.exists():
         return 0
     return len(list(cart_dir.glob("*.json")))
 
 
-def count_knot_api_artifacts() -> int:
-    """Count JSON files in knot_api_jsons/"""
-    knot_dir = settings.knot_api_jsons_dir
+def count_knot_api_artifacts(job_id: Optional[str] = None) -> int:
+    """Count JSON files in the job's knot_api_jsons/ (shared data_dir if no job_id)"""
+    knot_dir = resolve_workspace(job_id).knot_dir
     if not knot_dir.exists():
         return 0
     return len(list(knot_dir.glob("*.json")))
 
 
-def get_artifact_counts() -> dict:
+def get_artifact_counts(job_id: Optional[str] = None) -> dict:
     """Get counts for both directories"""
     return {
-        "cart_count": count_cart_artifacts(),
-        "knot_api_count": count_knot_api_artifacts()
+        "cart_count": count_cart_artifacts(job_id),
+        "knot_api_count": count_knot_api_artifacts(job_id)
     }
-
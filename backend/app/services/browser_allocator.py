@@ -0,0 +1,322 @@
+"""
+Browser Allocator
+Hands every browser session a lease on a free remote-debugging port and on a
+platform profile, so many browsers can run on one host at once.
+
+Ports come from BROWSER_DEBUG_PORT_START .. +BROWSER_DEBUG_PORT_COUNT. A port
+is leased by holding an exclusive lock file under runtime/browser_leases/,
+which also keeps agent subprocesses of other jobs off it; the lock is dropped
+when the lease is released or the process dies.
+
+Chrome locks a profile directory, so only one lease per platform gets the
+signed-in profile in place. Further leases run on a copy-on-write clone of
+a cache-stripped snapshot of it (app.services.profile_snapshots), deleted
+when the lease is released; with PROFILE_SNAPSHOTS_ENABLED=false (or if
+cloning fails) they get clone_user_data_dir=True and a NovaAct copy instead.
+"""
+import logging
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Set
+from app.config import settings
+from app.services.browser_profile import browser_profile, install_popup_dismissal, install_request_blocking, nova_options
+from app.services.profile_snapshots import ProfileClone, profile_snapshots
+from config.platforms import PLATFORM_CONFIGS
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process tracking plus a bind check
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BACKEND_ROOT = Path(__file__).parent.parent.parent
+
+# NovaAct reads extra Chrome flags from this variable when it launches the browser
+BROWSER_ARGS_ENV = "NOVA_ACT_BROWSER_ARGS"
+
+
+class NoFreePortError(Exception):
+    """Raised when every debugging port in the range is leased"""
+
+
+def profile_dir(platform: str) -> Path:
+    """Absolute path of a platform's persistent user_data_dir"""
+    path = Path(PLATFORM_CONFIGS[platform]["user_data_dir"])
+    return path if path.is_absolute() else (BACKEND_ROOT / path).resolve()
+
+
+@dataclass
+class BrowserLease:
+    """A debugging port plus the profile a single browser may use"""
+    platform: Optional[str]
+    port: int
+    user_data_dir: Optional[Path]
+    clone_user_data_dir: bool
+    _allocator: "BrowserAllocator" = field(repr=False, default=None)
+    _handles: list = field(repr=False, default_factory=list)
+    _clone: Optional[ProfileClone] = field(repr=False, default=None)
+    released: bool = False
+
+    @property
+    def browser_args(self) -> str:
+        return f"--remote-debugging-port={self.port}"
+
+    def nova_kwargs(self) -> Dict:
+        """Profile arguments for NovaAct(...)"""
+        if self.user_data_dir is None:
+            return {}
+        return {"user_data_dir": str(self.user_data_dir), "clone_user_data_dir": self.clone_user_data_dir}
+
+    def release(self):
+        if not self.released and self._allocator is not None:
+            self._allocator.release(self)
+
+
+class BrowserAllocator:
+    """Thread-safe, host-wide allocator of debugging ports and profile leases"""
+
+    def __init__(self, port_start: int, port_count: int, lock_dir: Path):
+        self.port_start = port_start
+        self.port_count = max(1, port_count)
+        self.lock_dir = lock_dir
+        self._lock = threading.Lock()
+        self._launch_lock = threading.Lock()
+        self._ports: Set[int] = set()
+        self._profiles: Set[str] = set()  # Platforms whose profile is leased in place
+        self._next = 0
+
+    def lease(self, platform: Optional[str] = None, clone: Optional[bool] = None) -> BrowserLease:
+        """
+        Lease a free port and, for a platform, its profile
+
+        Args:
+            platform: Platform whose user_data_dir the browser uses (None: throwaway profile)
+            clone: Force a profile clone (True) or in-place use (False).
+                None uses the profile in place when no other browser holds it.
+
+        Raises:
+            NoFreePortError: If the whole port range is taken
+        """
+        handles = []
+        port = self._lease_port(handles)
+
+        user_data_dir = None
+        clone_profile = False
+        if platform is not None:
+            user_data_dir = profile_dir(platform)
+            user_data_dir.mkdir(parents=True, exist_ok=True)
+            if clone is True:
+                clone_profile = True
+            else:
+                in_place = self._lease_profile(platform, handles)
+                if not in_place and clone is False:
+                    self._close(handles, port=port)
+                    raise RuntimeError(f"{platform} profile is in use by another browser")
+                clone_profile = not in_place
+
+        profile_clone = self._clone_profile(platform) if clone_profile else None
+        if profile_clone is not None:
+            user_data_dir = profile_clone.path
+
+        # A snapshot clone is already a private copy; NovaAct must not copy it again
+        nova_clone = clone_profile and profile_clone is None
+        lease = BrowserLease(platform, port, user_data_dir, nova_clone, self, handles, profile_clone)
+        logger.debug(f"[ALLOCATOR] Leased port {port} for {platform or 'browser'}"
+                     f"{' (profile clone)' if clone_profile else ''}")
+        return lease
+
+    def release(self, lease: BrowserLease):
+        with self._lock:
+            if lease.released:
+                return
+            lease.released = True
+            self._ports.discard(lease.port)
+            if lease.platform is not None and not lease.clone_user_data_dir and lease._clone is None:
+                self._profiles.discard(lease.platform)
+        self._close(lease._handles)
+        if lease._clone is not None:
+            lease._clone.release()
+        logger.debug(f"[ALLOCATOR] Released port {lease.port}")
+
+    @contextmanager
+    def leased(self, platform: Optional[str] = None, clone: Optional[bool] = None):
+        """Hold a lease for the duration of a with-block"""
+        lease = self.lease(platform, clone=clone)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    def start_nova(
+        self,
+        lease: BrowserLease,
+        platform: Optional[str] = None,
+        block_requests: bool = True,
+        dismiss_popups: bool = True,
+        **nova_kwargs
+    ):
+        """
+        Create and start a NovaAct on the lease's port and profile, with the
+        platform's browser profile (headless, viewport, request blocking,
+        popup auto-dismissal).
+
+        NovaAct only takes Chrome flags from NOVA_ACT_BROWSER_ARGS, so the
+        variable holds this lease's flags only until its Chrome is listening
+        on the leased port (see _launch); the rest of start() runs unlocked.
+
+        Args:
+            platform: Browser profile to use (defaults to the lease's platform)
+            block_requests: Install resource/domain blocking from the profile
+            dismiss_popups: Install the popup auto-dismiss observer if the profile enables it
+            nova_kwargs: Extra NovaAct arguments; these win over the profile
+        """
+        from nova_act import NovaAct
+
+        platform = platform or lease.platform
+        profile = browser_profile(platform)
+        kwargs = {**nova_options(profile), **lease.nova_kwargs(), **nova_kwargs}
+        if "cdp_endpoint_url" in kwargs:
+            # Attaching to a running browser launches nothing
+            nova = NovaAct(**kwargs)
+            nova.start()
+        else:
+            nova = self._launch(NovaAct, kwargs, lease)
+
+        if block_requests:
+            install_request_blocking(nova, profile, label=platform or "browser")
+        if dismiss_popups:
+            install_popup_dismissal(nova, profile, label=platform or "browser")
+        return nova
+
+    def _launch(self, nova_class, kwargs: Dict, lease: BrowserLease):
+        """
+        Construct and start a NovaAct with the lease's Chrome flags.
+
+        The flags go through the process environment, which Chrome reads once
+        when it is spawned. The launch lock covers construction and the spawn
+        only: a watcher restores the variable and releases the lock as soon
+        as the browser answers on its debugging port (or start() returns), so
+        concurrent starts overlap everything after the spawn.
+        """
+        self._launch_lock.acquire()
+        previous = os.environ.get(BROWSER_ARGS_ENV)
+        os.environ[BROWSER_ARGS_ENV] = lease.browser_args
+        started = threading.Event()
+
+        def hand_over():
+            while not started.wait(0.05) and not self._port_is_listening(lease.port):
+                pass
+            if previous is None:
+                os.environ.pop(BROWSER_ARGS_ENV, None)
+            else:
+                os.environ[BROWSER_ARGS_ENV] = previous
+            self._launch_lock.release()
+
+        watcher = threading.Thread(target=hand_over, name=f"browser-launch-{lease.port}", daemon=True)
+        watcher.start()
+        try:
+            nova = nova_class(**kwargs)
+            nova.start()
+        finally:
+            started.set()
+            watcher.join()
+        return nova
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "ports_leased": len(self._ports),
+                "port_range": [self.port_start, self.port_start + self.port_count - 1],
+                "profiles_in_use": sorted(self._profiles),
+                "profile_snapshots": profile_snapshots.stats()
+            }
+
+    def _clone_profile(self, platform: str) -> Optional[ProfileClone]:
+        """Copy-on-write clone of the platform's profile snapshot, None to let NovaAct copy it"""
+        if not settings.profile_snapshots_enabled:
+            return None
+        try:
+            return profile_snapshots.clone(platform)
+        except Exception as e:
+            logger.warning(f"[ALLOCATOR] Could not clone {platform} profile snapshot, NovaAct will copy the profile: {e}")
+            return None
+
+    def _lease_port(self, handles: list) -> int:
+        with self._lock:
+            for _ in range(self.port_count):
+                port = self.port_start + self._next
+                self._next = (self._next + 1) % self.port_count
+                if port in self._ports:
+                    continue
+                handle = self._try_lock(f"port-{port}")
+                if handle is False or not self._port_is_free(port):
+                    self._close([handle])
+                    continue
+                self._ports.add(port)
+                handles.append(handle)
+                return port
+        raise NoFreePortError(
+            f"No free debugging port in {self.port_start}-{self.port_start + self.port_count - 1}"
+        )
+
+    def _lease_profile(self, platform: str, handles: list) -> bool:
+        with self._lock:
+            if platform in self._profiles:
+                return False
+            handle = self._try_lock(f"profile-{platform}")
+            if handle is False:
+                return False
+            self._profiles.add(platform)
+            handles.append(handle)
+            return True
+
+    def _try_lock(self, name: str):
+        """Open file handle holding an exclusive lock, False if taken, None without fcntl"""
+        if fcntl is None:
+            return None
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        handle = open(self.lock_dir / f"{name}.lock", "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        return handle
+
+    def _close(self, handles: list, port: Optional[int] = None):
+        for handle in handles:
+            if handle:
+                handle.close()  # Closing the file drops its flock
+        if port is not None:
+            with self._lock:
+                self._ports.discard(port)
+
+    @staticmethod
+    def _port_is_listening(port: int) -> bool:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.05):
+                return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def _port_is_free(port: int) -> bool:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            try:
+                sock.bind(("127.0.0.1", port))
+            except OSError:
+                return False
+        return True
+
+
+# Singleton
+browser_allocator = BrowserAllocator(
+    port_start=settings.browser_debug_port_start,
+    port_count=settings.browser_debug_port_count,
+    lock_dir=settings.runtime_dir / "browser_leases"
+)
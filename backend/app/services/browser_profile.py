@@ -0,0 +1,119 @@
+"""
+Browser Profile
+Per-platform browser settings from PLATFORM_CONFIGS[...]["browser"]: headless,
+viewport, request blocking for tracker domains (and, opt-in, resource types),
+and the popup auto-dismiss observer.
+
+browser_allocator.start_nova() applies these to every agent's browser, so
+page loads skip analytics and ad requests. Tracker domains are blocked by
+Chrome itself (CDP Network.setBlockedURLs), so no request waits on Python.
+Resource types can only be blocked with a Playwright route, whose handler
+runs on the NovaAct's thread and stalls requests while that thread waits on
+the model; they are off unless a platform sets blocked_resource_types.
+"""
+import logging
+from typing import Dict, List, Optional
+from app.config import settings
+from config.platforms import DEFAULT_BROWSER_PROFILE, PLATFORM_CONFIGS
+
+logger = logging.getLogger(__name__)
+
+
+def browser_profile(platform: Optional[str]) -> Dict:
+    """Effective browser settings for a platform (defaults for None), with env overrides"""
+    profile = {**DEFAULT_BROWSER_PROFILE}
+    if platform is not None:
+        profile.update(PLATFORM_CONFIGS[platform].get("browser", {}))
+    if settings.browser_headless is not None:
+        profile["headless"] = settings.browser_headless
+    if not settings.browser_block_requests:
+        profile["blocked_resource_types"] = []
+        profile["blocked_domains"] = []
+    if not settings.browser_auto_dismiss_popups:
+        profile["auto_dismiss_popups"] = False
+    return profile
+
+
+def nova_options(profile: Dict) -> Dict:
+    """NovaAct constructor arguments for a profile"""
+    options = {"headless": bool(profile.get("headless", False))}
+    viewport = profile.get("viewport")
+    if viewport:
+        options["screen_width"] = viewport["width"]
+        options["screen_height"] = viewport["height"]
+    return options
+
+
+def blocked_url_patterns(domains) -> List[str]:
+    """Network.setBlockedURLs patterns for domains and their subdomains"""
+    patterns = []
+    for domain in domains:
+        patterns += [f"*://{domain}/*", f"*://*.{domain}/*"]
+    return patterns
+
+
+def install_request_blocking(nova, profile: Dict, label: str = "browser", page_only: bool = False) -> bool:
+    """
+    Block the profile's tracker domains in the NovaAct's page, and abort its
+    blocked resource types (if any) on the browser context, or only on the
+    page with page_only, for tabs of a shared browser.
+
+    Must run on the thread that started the NovaAct (Playwright sync API).
+    Returns False if the profile blocks nothing or blocking could not be set up.
+    """
+    blocked_types = set(profile.get("blocked_resource_types") or ())
+    blocked_domains = tuple(d.lower() for d in profile.get("blocked_domains") or ())
+    if not blocked_types and not blocked_domains:
+        return False
+
+    try:
+        if blocked_domains:
+            session = nova.page.context.new_cdp_session(nova.page)
+            session.send("Network.enable")
+            session.send("Network.setBlockedURLs", {"urls": blocked_url_patterns(blocked_domains)})
+
+        if blocked_types:
+            def handle(route):
+                if route.request.resource_type in blocked_types:
+                    route.abort()
+                else:
+                    route.continue_()
+
+            target = nova.page if page_only else nova.page.context
+            target.route("**/*", handle)
+    except Exception as e:
+        logger.warning(f"[BROWSER] Could not install request blocking for {label}: {e}")
+        return False
+
+    logger.debug(f"[BROWSER] Blocking {sorted(blocked_types)} and {len(blocked_domains)} domains for {label}")
+    return True
+
+
+def install_popup_dismissal(nova, profile: Dict, label: str = "browser") -> bool:
+    """
+    Install the popup auto-dismiss observer on the browser context, so modals
+    are closed as they appear instead of by agent steps.
+
+    Must run on the thread that started the NovaAct (Playwright sync API).
+    Returns False if the profile disables it or it could not be installed.
+    """
+    if not profile.get("auto_dismiss_popups"):
+        return False
+    try:
+        from utils.popup_handler import install_popup_dismisser_sync
+        install_popup_dismisser_sync(nova.page)
+    except Exception as e:
+        logger.warning(f"[BROWSER] Could not install popup dismisser for {label}: {e}")
+        return False
+
+    logger.debug(f"[BROWSER] Popup auto-dismiss observer installed for {label}")
+    return True
+
+
+def popup_report(nova) -> List[Dict]:
+    """What the popup observer dismissed on the session's current site ([] if unavailable)"""
+    try:
+        from utils.popup_handler import dismissed_popups_sync
+        return dismissed_popups_sync(nova.page)
+    except Exception:
+        return []
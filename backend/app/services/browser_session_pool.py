@@ -0,0 +1,260 @@
+"""
+Browser Session Pool
+Keeps pre-started NovaAct sessions per platform so driver jobs skip browser
+cold starts.
+
+NovaAct drives Playwright's sync API, which is bound to the thread that
+started it. Every pooled session therefore owns a single worker thread and
+all calls on that session run there.
+
+Sessions use the platform's persistent user_data_dir so logins survive
+between jobs. Each session holds a browser allocator lease for its debugging
+port and profile: the first session of a platform gets the profile in place,
+extra sessions a NovaAct clone of it.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set
+from app.config import settings
+from app.services.browser_allocator import browser_allocator
+from config.platforms import PLATFORM_CONFIGS
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no session frees up within the acquire timeout"""
+
+
+class PooledSession:
+    """One NovaAct browser plus the thread that owns it"""
+
+    def __init__(self, platform: str, slot: int):
+        self.platform = platform
+        self.slot = slot
+        self.config = PLATFORM_CONFIGS[platform]
+        self.uses = 0
+        self.created_at = time.monotonic()
+        self.nova = None
+        self.lease = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"nova-{platform}-{slot}")
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Schedule fn(nova, *args) on the session thread"""
+        return self._executor.submit(fn, self.nova, *args, **kwargs)
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Run fn(nova, *args) on the session thread and wait for the result"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def start(self):
+        self._executor.submit(self._start).result()
+
+    def _start(self):
+        # The first session of a platform keeps the signed-in profile; others work on a copy
+        self.lease = browser_allocator.lease(self.platform)
+        try:
+            self.nova = browser_allocator.start_nova(self.lease, starting_page=self.config["home_url"])
+        except Exception:
+            self.lease.release()
+            raise
+        logger.info(
+            f"[POOL] Started {self.platform} session #{self.slot} on port {self.lease.port} "
+            f"(profile {self.lease.user_data_dir}{', clone' if self.lease.clone_user_data_dir else ''})"
+        )
+
+    def health_check(self, timeout: float = 10) -> bool:
+        """True if the browser still answers and can be reset to the home page"""
+        def check(nova):
+            nova.page.evaluate("() => document.readyState")
+            nova.go_to_url(self.config["home_url"])
+            return True
+
+        try:
+            return bool(self.submit(check).result(timeout=timeout))
+        except Exception as e:
+            logger.warning(f"[POOL] {self.platform} session #{self.slot} failed health check: {e}")
+            return False
+
+    def stop(self, wait: bool = True):
+        """Stop the browser on its own thread, then retire the thread"""
+        def _stop(nova):
+            try:
+                if nova:
+                    nova.stop()
+            finally:
+                if self.lease:
+                    self.lease.release()
+
+        future = self.submit(_stop)
+        if wait:
+            try:
+                future.result(timeout=30)
+            except Exception as e:
+                logger.warning(f"[POOL] Error stopping {self.platform} session #{self.slot}: {e}")
+        self._executor.shutdown(wait=False)
+        self.nova = None
+
+
+class BrowserSessionPool:
+    """
+    Per-platform pool of warm NovaAct sessions.
+
+    acquire() hands out an idle session (health-checked first) or starts a new
+    one while the platform is below max_sessions. release() returns it, and
+    recycles sessions after max_uses jobs or when marked unhealthy.
+    """
+
+    def __init__(self, max_sessions: int, max_uses: int):
+        self.max_sessions = max(1, max_sessions)
+        self.max_uses = max(1, max_uses)
+        self._cond = threading.Condition()
+        self._idle: Dict[str, List[PooledSession]] = {}
+        self._busy: Dict[str, List[PooledSession]] = {}
+        self._reserved: Dict[str, Set[int]] = {}  # Slots whose browser is starting
+        self._closed = False
+
+    def acquire(self, platform: str, timeout: Optional[float] = None) -> PooledSession:
+        """
+        Borrow a healthy session for a platform
+
+        Raises:
+            PoolTimeoutError: If none becomes available within timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            slot = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Browser session pool is shut down")
+                    idle = self._idle.get(platform, [])
+                    if idle:
+                        session = idle.pop()
+                        # Mark busy right away so its slot can't be handed out again
+                        self._busy.setdefault(platform, []).append(session)
+                        break
+                    slot = self._reserve_slot_locked(platform)
+                    if slot is not None:
+                        session = None
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise PoolTimeoutError(f"No {platform} browser session available")
+                    self._cond.wait(remaining)
+
+            if session is None:
+                return self._start_session(platform, slot)
+
+            if session.uses > 0 and not session.health_check():
+                # Broken between jobs: drop it and try again
+                self._discard(session)
+                continue
+            return session
+
+    def _reserve_slot_locked(self, platform: str) -> Optional[int]:
+        taken = {s.slot for s in self._idle.get(platform, []) + self._busy.get(platform, [])}
+        taken |= self._reserved.setdefault(platform, set())
+        free = [i for i in range(self.max_sessions) if i not in taken]
+        if not free:
+            return None
+        self._reserved[platform].add(free[0])
+        return free[0]
+
+    def _start_session(self, platform: str, slot: int) -> PooledSession:
+        session = PooledSession(platform, slot)
+        try:
+            session.start()
+        except Exception:
+            session.stop(wait=False)
+            with self._cond:
+                self._reserved[platform].discard(slot)
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self._reserved[platform].discard(slot)
+            self._busy.setdefault(platform, []).append(session)
+        return session
+
+    def release(self, session: PooledSession, healthy: bool = True):
+        """Return a session; recycle it if it is unhealthy or has hit max_uses"""
+        session.uses += 1
+        with self._cond:
+            busy = self._busy.get(session.platform, [])
+            if session in busy:
+                busy.remove(session)
+            keep = healthy and session.uses < self.max_uses and not self._closed
+            if keep:
+                self._idle.setdefault(session.platform, []).append(session)
+            self._cond.notify_all()
+
+        if not keep:
+            reason = "unhealthy" if not healthy else f"recycled after {session.uses} uses"
+            logger.info(f"[POOL] Retiring {session.platform} session #{session.slot} ({reason})")
+            # An unhealthy session may still be busy on its thread; don't block on it
+            session.stop(wait=healthy)
+
+    def _discard(self, session: PooledSession):
+        session.stop(wait=False)
+        with self._cond:
+            busy = self._busy.get(session.platform, [])
+            if session in busy:
+                busy.remove(session)
+            self._cond.notify_all()
+
+    @contextmanager
+    def session(self, platform: str, timeout: Optional[float] = None):
+        """Borrow a session for the duration of a with-block"""
+        session = self.acquire(platform, timeout=timeout)
+        healthy = True
+        try:
+            yield session
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            self.release(session, healthy=healthy)
+
+    def prewarm(self, platforms: List[str]):
+        """Start one idle session per platform ahead of the first job"""
+        for platform in platforms:
+            try:
+                session = self.acquire(platform, timeout=0)
+            except PoolTimeoutError:
+                continue
+            except Exception as e:
+                logger.error(f"[POOL] Could not prewarm {platform}: {e}")
+                continue
+            # Not a real job, so don't count it as a use
+            session.uses -= 1
+            self.release(session)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._cond:
+            platforms = set(self._idle) | set(self._busy)
+            return {
+                p: {"idle": len(self._idle.get(p, [])), "busy": len(self._busy.get(p, []))}
+                for p in platforms
+            }
+
+    def shutdown(self):
+        """Stop every idle session; busy ones stop when released"""
+        with self._cond:
+            self._closed = True
+            idle = [s for sessions in self._idle.values() for s in sessions]
+            self._idle.clear()
+            self._cond.notify_all()
+        for session in idle:
+            session.stop()
+
+
+# Singleton
+browser_session_pool = BrowserSessionPool(
+    max_sessions=settings.browser_pool_size,
+    max_uses=settings.browser_pool_max_uses
+)
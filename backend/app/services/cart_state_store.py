@@ -0,0 +1,236 @@
+"""
+Cart State Store
+Per-user CartState instances held in memory, instead of one global
+data/cart_state.json per deployment.
+
+- Lazy load: a user's state is read from runtime/cart_states/<user>.json
+  (snapshot plus any journal) the first time it is needed, or starts empty.
+- LRU eviction: at most CART_STATE_STORE_MAX_USERS states and
+  CART_STATE_STORE_MAX_WEIGHT items + diffs stay in memory; the least
+  recently used idle states are flushed and dropped first.
+- Write-behind: edits mark a state dirty; dirty states are written in
+  batches every CART_STATE_FLUSH_INTERVAL_SECONDS (atomic snapshots), and
+  on eviction and shutdown.
+
+Each user has their own lock and file, so concurrent users never contend.
+"""
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from app.config import settings
+from models.cart_models import CartDiff, CartState, PlatformCart
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("state", "lock", "pins", "dirty")
+
+    def __init__(self, state: CartState):
+        self.state = state
+        self.lock = threading.RLock()  # Serializes one user's edits
+        self.pins = 0  # Callers inside edit(); pinned states are never evicted
+        self.dirty = False
+
+
+class CartStateStore:
+    """In-memory, LRU-bounded CartState per user with batched write-behind"""
+
+    def __init__(self, state_dir: Path, max_states: int = 1000, max_weight: int = 200_000, flush_interval: float = 2.0):
+        self.state_dir = state_dir
+        self.max_states = max(1, max_states)
+        self.max_weight = max_weight
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._loading: Dict[str, threading.Event] = {}
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, user_id: str) -> Path:
+        """State file for a user; ids are sanitized and suffixed with a hash to stay unique"""
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", user_id)[:64]
+        digest = hashlib.sha1(user_id.encode()).hexdigest()[:8]
+        return self.state_dir / f"{safe}-{digest}.json"
+
+    # ==================== ACCESS ====================
+
+    def get(self, user_id: str) -> CartState:
+        """A user's state (loaded on first use), for reading. Use edit() to change it."""
+        return self._entry(user_id).state
+
+    @contextmanager
+    def edit(self, user_id: str) -> Iterator[CartState]:
+        """Hold the user's lock, yield their state, and mark it dirty afterwards"""
+        entry = self._entry(user_id, pin=True)
+        try:
+            with entry.lock:
+                yield entry.state
+                entry.dirty = True
+        finally:
+            with self._lock:
+                entry.pins -= 1
+            self._start_flusher()
+            self._evict()
+
+    def update_cart(self, user_id: str, cart: PlatformCart):
+        """Store the latest extracted cart for a user's platform"""
+        with self.edit(user_id) as state:
+            state.add_platform_cart(cart)
+
+    def record_diff(self, user_id: str, platform: str, action: str, item) -> CartDiff:
+        with self.edit(user_id) as state:
+            return state.record_diff(platform, action, item)
+
+    def mark_diffs_applied(self, user_id: str, platform: str, diffs: Optional[List[CartDiff]] = None):
+        with self.edit(user_id) as state:
+            state.mark_diffs_applied(platform, diffs)
+
+    def _entry(self, user_id: str, pin: bool = False) -> _Entry:
+        while True:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    if pin:
+                        entry.pins += 1
+                    return entry
+                loading = self._loading.get(user_id)
+                if loading is None:
+                    loading = self._loading[user_id] = threading.Event()
+                    break
+            # Another thread is loading this user; wait for it and look again
+            loading.wait()
+
+        try:
+            state = self._load(user_id)
+        except Exception:
+            with self._lock:
+                self._loading.pop(user_id).set()
+            raise
+        with self._lock:
+            entry = _Entry(state)
+            if pin:
+                entry.pins += 1
+            self._entries[user_id] = entry
+            self.misses += 1
+            self._loading.pop(user_id).set()
+        self._evict()
+        return entry
+
+    def _load(self, user_id: str) -> CartState:
+        path = self.path_for(user_id)
+        if path.exists() or Path(CartState.journal_path(str(path))).exists():
+            try:
+                return CartState.load_from_file(str(path), journal=False)
+            except Exception as e:
+                logger.error(f"[CART STORE] Could not load state for {user_id}, starting empty: {e}")
+        return CartState()
+
+    # ==================== EVICTION ====================
+
+    def _evict(self):
+        """Drop least recently used idle states while over either bound (dirty ones are written first)"""
+        while True:
+            with self._lock:
+                total = sum(entry.state.weight for entry in self._entries.values())
+                if len(self._entries) <= self.max_states and total <= self.max_weight:
+                    return
+                victim = next(
+                    ((user_id, entry) for user_id, entry in self._entries.items() if entry.pins == 0),
+                    None
+                )
+                if victim is None:
+                    return  # Everything is in use
+                user_id, entry = victim
+                del self._entries[user_id]
+                self.evictions += 1
+                if not entry.dirty:
+                    continue
+                # Readers of this user wait until the file is current
+                writing = self._loading[user_id] = threading.Event()
+            try:
+                self._write(user_id, entry)
+            finally:
+                with self._lock:
+                    self._loading.pop(user_id, None)
+                    if entry.dirty:
+                        # Couldn't write it; keep it in memory rather than lose the edits
+                        self._entries.setdefault(user_id, entry)
+                writing.set()
+            if entry.dirty:
+                return
+
+    # ==================== FLUSH ====================
+
+    def flush(self) -> int:
+        """Write every dirty state; returns how many were written"""
+        with self._lock:
+            batch = [(user_id, entry) for user_id, entry in self._entries.items() if entry.dirty]
+        written = 0
+        for user_id, entry in batch:
+            if self._write(user_id, entry):
+                written += 1
+        if written:
+            logger.debug(f"[CART STORE] Flushed {written} cart states")
+        return written
+
+    def _write(self, user_id: str, entry: _Entry) -> bool:
+        with entry.lock:
+            if not entry.dirty:
+                return False
+            entry.dirty = False
+            try:
+                entry.state.save_to_file(str(self.path_for(user_id)), journal=False)
+            except Exception as e:
+                entry.dirty = True
+                logger.error(f"[CART STORE] Flush failed for {user_id}, will retry: {e}")
+                return False
+        return True
+
+    def _start_flusher(self):
+        if self._flusher is not None or self._stop.is_set():
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="cart-state-flusher", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "states": len(self._entries),
+                "weight": sum(entry.state.weight for entry in self._entries.values()),
+                "dirty": sum(1 for entry in self._entries.values() if entry.dirty),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+
+# Singleton
+cart_state_store = CartStateStore(
+    state_dir=settings.cart_states_dir,
+    max_states=settings.cart_state_store_max_users,
+    max_weight=settings.cart_state_store_max_weight,
+    flush_interval=settings.cart_state_flush_interval_seconds
+)
@@ -1,16 +1,21 @@
 import json
 from pathlib import Path
-from typing import List
-from app.config import settings
+from typing import List, Optional
 from app.models.comparison import PlatformSummary, ItemSummary
+from app.services.job_workspace import resolve_workspace
 
 
-def parse_knot_api_jsons() -> List[PlatformSummary]:
+def parse_knot_api_jsons(job_id: Optional[str] = None) -> List[PlatformSummary]:
     """
     Parse all knot_api_jsons/*.json files and return platform summaries.
     Each file represents one platform's order.
+    
+    Reads the job's own workspace when job_id is given, otherwise the shared data_dir.
     """
-    knot_dir = settings.knot_api_jsons_dir
+    try:
+        knot_dir = resolve_workspace(job_id).knot_dir
+    except ValueError:
+        return []
     if not knot_dir.exists():
         return []
     
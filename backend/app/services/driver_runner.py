@@ -1,34 +1,57 @@
 import sys
 import subprocess
 import uuid
-import json
+import shutil
+import logging
 import platform
-from pathlib import Path
-from datetime import datetime
-from typing import Optional
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List
 from app.config import settings
 from app.models.job import JobState, JobStatus
+from app.services.job_store import JobStore, MemoryJobStore, SQLiteJobStore, CachedJobStore
+from app.services.job_workspace import JobWorkspace
+from app.services.job_events import job_events
+from app.services.product_catalog import product_catalog
+
+logger = logging.getLogger(__name__)
+
+
+def create_job_store() -> JobStore:
+    """Build the job store selected by settings.job_store_backend"""
+    backend = settings.job_store_backend.lower()
+    if backend == "memory":
+        return MemoryJobStore()
+    if backend == "sqlite":
+        return CachedJobStore(
+            SQLiteJobStore(settings.job_db_path),
+            flush_interval=settings.job_store_flush_interval_seconds
+        )
+    raise ValueError(f"Unknown job store backend: {settings.job_store_backend}")
 
 
 class DriverJobRunner:
     """Manages background execution of agent pipeline"""
     
-    def __init__(self):
+    def __init__(self, store: Optional[JobStore] = None):
         self.jobs_dir = settings.jobs_dir
         self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.store = store or create_job_store()
+        self._janitor: Optional[threading.Thread] = None
+        self._janitor_lock = threading.Lock()
     
     def create_job(self) -> str:
         """
         Create a new job without starting a subprocess.
         Used for in-process agent execution.
+        Snapshots the current shopping list into the job's own workspace.
         Returns job_id.
         """
-        job_id = str(uuid.uuid4())
-        job_dir = self.jobs_dir / job_id
-        job_dir.mkdir(parents=True, exist_ok=True)
+        self._ensure_janitor()
         
-        # State file
-        state_path = job_dir / "state.json"
+        job_id = str(uuid.uuid4())
+        JobWorkspace.for_job(job_id).prepare()
         
         # Save initial state
         state = JobState(
@@ -37,7 +60,7 @@ class DriverJobRunner:
             pid=None,  # No subprocess
             started_at=datetime.utcnow()
         )
-        self._save_state(state_path, state)
+        self.store.put(state)
         
         return job_id
     
@@ -50,8 +73,6 @@ class DriverJobRunner:
         job_dir = self.jobs_dir / job_id
         job_dir.mkdir(parents=True, exist_ok=True)
         
-        # State file
-        state_path = job_dir / "state.json"
         stdout_path = job_dir / "stdout.log"
         stderr_path = job_dir / "stderr.log"
         
@@ -98,43 +119,93 @@ class DriverJobRunner:
             pid=process.pid,
             started_at=datetime.utcnow()
         )
-        self._save_state(state_path, state)
+        self.store.put(state)
         
         return job_id
     
     def get_status(self, job_id: str) -> Optional[JobState]:
-        """Retrieve job state from disk"""
-        state_path = self.jobs_dir / job_id / "state.json"
-        if not state_path.exists():
-            return None
-        
+        """Retrieve job state (served from the store's in-memory cache when warm)"""
         try:
-            with open(state_path, "r") as f:
-                data = json.load(f)
-            return JobState(**data)
+            return self.store.get(job_id)
         except Exception as e:
-            print(f"[ERROR] get_status: {e}")
+            logger.error(f"[JOBS] get_status failed for {job_id}: {e}")
             return None
     
     def update_status(self, job_id: str, status: JobStatus, error_message: Optional[str] = None):
-        """Update job status"""
-        state_path = self.jobs_dir / job_id / "state.json"
-        state = self.get_status(job_id)
-        if not state:
-            return
-        
-        state.status = status
+        """Atomically update job status and publish it to event subscribers"""
+        changes = {"status": status}
         if status in ("success", "error"):
-            state.ended_at = datetime.utcnow()
+            changes["ended_at"] = datetime.utcnow()
         if error_message:
-            state.error_message = error_message
+            changes["error_message"] = error_message
+        
+        if self.store.update(job_id, **changes):
+            job_events.publish(job_id, "status", status=status, message=error_message)
+    
+    def list_jobs(
+        self,
+        status: Optional[JobStatus] = None,
+        since: Optional[datetime] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[JobState]:
+        """List jobs newest first (since: naive UTC, like started_at, or timezone-aware)"""
+        if since is not None and since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return self.store.list(status=status, since=since, limit=limit, offset=offset)
+    
+    def cleanup_expired(self, ttl_hours: Optional[float] = None) -> int:
+        """
+        Delete finished jobs older than the TTL along with their job directories.
+        Also removes stale job directories the store no longer knows about.
         
-        self._save_state(state_path, state)
+        Returns:
+            Number of jobs removed
+        """
+        ttl_hours = settings.job_ttl_hours if ttl_hours is None else ttl_hours
+        cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+        
+        expired = self.store.expired(cutoff)
+        for job_id in expired:
+            shutil.rmtree(self.jobs_dir / job_id, ignore_errors=True)
+            job_events.discard(job_id)
+        removed = self.store.delete(expired)
+        
+        # Orphaned directories (e.g. from before the store existed)
+        cutoff_ts = time.time() - ttl_hours * 3600
+        for job_dir in self.jobs_dir.iterdir():
+            if not job_dir.is_dir() or job_dir.stat().st_mtime >= cutoff_ts:
+                continue
+            if self.store.get(job_dir.name) is None:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                removed += 1
+        
+        if removed:
+            logger.info(f"[JOBS] Garbage-collected {removed} job(s) older than {ttl_hours}h")
+        return removed
+    
+    def _ensure_janitor(self):
+        """Start the periodic TTL cleanup thread on first use"""
+        with self._janitor_lock:
+            if self._janitor:
+                return
+            self._janitor = threading.Thread(target=self._janitor_loop, name="job-janitor", daemon=True)
+            self._janitor.start()
     
-    def _save_state(self, path: Path, state: JobState):
-        """Save state to disk"""
-        with open(path, "w") as f:
-            json.dump(state.model_dump(mode="json"), f, indent=2, default=str)
+    def _janitor_loop(self):
+        while True:
+            try:
+                self.cleanup_expired()
+            except Exception as e:
+                logger.error(f"[JOBS] Cleanup failed: {e}")
+            if settings.product_catalog_enabled:
+                try:
+                    purged = product_catalog.purge_stale()
+                    if purged:
+                        logger.info(f"[JOBS] Purged {purged} stale product(s) from the catalog")
+                except Exception as e:
+                    logger.error(f"[JOBS] Product catalog purge failed: {e}")
+            time.sleep(settings.job_gc_interval_seconds)
 
 
 # Singleton
@@ -0,0 +1,100 @@
+"""
+Job Events
+In-process pub/sub for driver job progress, consumed by the SSE endpoint.
+
+Publishers run on scheduler worker threads; subscribers are asyncio queues
+owned by request handlers, so delivery hops threads via call_soon_threadsafe.
+Each job keeps a bounded history so late subscribers (or reconnects with
+Last-Event-ID) can replay what they missed.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("success", "error")
+
+
+def is_terminal_event(event: dict) -> bool:
+    """True for the status event that ends a job's stream"""
+    return event["type"] == "status" and event["data"].get("status") in TERMINAL_STATUSES
+
+
+class JobEventBus:
+    """Fan-out of structured job events to any number of subscribers"""
+
+    def __init__(self, history_limit: int = 500):
+        self.history_limit = history_limit
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history: Dict[str, List[dict]] = {}
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def publish(self, job_id: Optional[str], event_type: str, **data) -> Optional[dict]:
+        """
+        Record an event and push it to live subscribers.
+        No-op when job_id is None (pipeline running outside a job).
+        """
+        if job_id is None:
+            return None
+
+        event = {
+            "id": next(self._ids),
+            "job_id": job_id,
+            "type": event_type,
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": data
+        }
+
+        with self._lock:
+            history = self._history.setdefault(job_id, [])
+            history.append(event)
+            if len(history) > self.history_limit:
+                # Keep the first event (usually "queued") so replays still show where the job started
+                del history[1:len(history) - self.history_limit + 1]
+            subscribers = list(self._subscribers.get(job_id, []))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # Subscriber's loop already closed; it will be unsubscribed by its handler
+                pass
+
+        logger.debug(f"[EVENTS] {job_id} {event_type} {data}")
+        return event
+
+    def subscribe(self, job_id: str, after_id: int = 0) -> Tuple[asyncio.Queue, List[dict]]:
+        """
+        Register the calling event loop for a job's events.
+
+        Returns:
+            (queue of future events, replay of past events with id > after_id)
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            # Snapshot and register atomically so no event falls between them
+            replay = [e for e in self._history.get(job_id, []) if e["id"] > after_id]
+            self._subscribers.setdefault(job_id, []).append((loop, queue))
+        return queue, replay
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(job_id, [])
+            self._subscribers[job_id] = [(l, q) for l, q in subscribers if q is not queue]
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    def discard(self, job_id: str) -> None:
+        """Drop a job's history (called when the job is garbage-collected)"""
+        with self._lock:
+            self._history.pop(job_id, None)
+
+
+# Singleton
+job_events = JobEventBus()
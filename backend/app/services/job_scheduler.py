@@ -0,0 +1,263 @@
+"""
+Driver Job Scheduler
+Bounded worker pool with a priority queue and a cap on concurrent browsers.
+Replaces FastAPI BackgroundTasks for driver jobs so bursts of requests queue
+up instead of all launching browsers at once.
+"""
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the driver queue cannot accept another job"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Driver queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _QueuedJob:
+    """Heap entry: ordered by priority (higher first), then submission order"""
+    sort_key: Tuple[int, int]
+    job_id: str = field(compare=False)
+    func: Callable = field(compare=False)
+    args: tuple = field(compare=False)
+    browsers: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class DriverJobScheduler:
+    """
+    Runs driver jobs on a fixed pool of worker threads.
+
+    A job is dispatched only when a worker is idle AND enough browser slots
+    are free for all of its platforms. Waiting jobs are ordered by priority,
+    then FIFO.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue_size: int,
+        max_browsers: int,
+        initial_estimate_seconds: float
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_queue_size = max(0, max_queue_size)  # 0: unbounded
+        self.max_browsers = max(1, max_browsers)
+
+        self._cond = threading.Condition()
+        self._queue: List[_QueuedJob] = []
+        self._sequence = itertools.count()
+        self._running: Dict[str, Tuple[float, int]] = {}  # job_id -> (started_at, browsers)
+        self._browsers_in_use = 0
+        self._avg_duration = float(initial_estimate_seconds)
+        self._workers: List[threading.Thread] = []
+
+    # ==================== SUBMISSION ====================
+
+    def submit(
+        self,
+        job_id: str,
+        func: Callable,
+        *args,
+        priority: int = 0,
+        browsers: int = 1,
+        on_queued: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """
+        Enqueue a job. `func(job_id, *args)` runs on a worker thread.
+        `on_queued(position)` runs before any worker can pick the job up.
+
+        Returns:
+            1-based queue position
+
+        Raises:
+            QueueFullError: If max_queue_size jobs are already waiting
+        """
+        self._ensure_workers()
+
+        with self._cond:
+            if self.max_queue_size and len(self._queue) >= self.max_queue_size:
+                raise QueueFullError(self._retry_after_locked())
+
+            # A job never needs more slots than exist, otherwise it would wait forever
+            browsers = min(max(1, browsers), self.max_browsers)
+            entry = _QueuedJob(
+                sort_key=(-priority, next(self._sequence)),
+                job_id=job_id,
+                func=func,
+                args=args,
+                browsers=browsers,
+                enqueued_at=time.monotonic()
+            )
+            heapq.heappush(self._queue, entry)
+            position = self._position_locked(job_id)
+            if on_queued is not None:
+                on_queued(position)
+            self._cond.notify_all()
+
+        logger.info(f"[SCHEDULER] Queued job {job_id} (priority={priority}, browsers={browsers}, position={position})")
+        return position
+
+    def release_browsers(self, job_id: str, keep: int):
+        """
+        Shrink a running job's browser reservation to keep, e.g. once it knows
+        which platforms are cache hits. Reservations never grow once dispatched.
+        """
+        with self._cond:
+            if job_id not in self._running:
+                return
+            started_at, browsers = self._running[job_id]
+            keep = min(max(0, keep), browsers)
+            if keep == browsers:
+                return
+            self._running[job_id] = (started_at, keep)
+            self._browsers_in_use -= browsers - keep
+            self._cond.notify_all()
+        logger.info(f"[SCHEDULER] Job {job_id} released {browsers - keep} browser(s)")
+
+    # ==================== INTROSPECTION ====================
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based position among waiting jobs, or None if not queued"""
+        with self._cond:
+            return self._position_locked(job_id)
+
+    def estimate_seconds(self, job_id: str) -> Optional[int]:
+        """
+        Estimated seconds until the job finishes.
+        Based on a moving average of recent job durations.
+        """
+        with self._cond:
+            now = time.monotonic()
+
+            if job_id in self._running:
+                started_at, _ = self._running[job_id]
+                return max(0, int(self._avg_duration - (now - started_at)))
+
+            position = self._position_locked(job_id)
+            if position is None:
+                return None
+
+            # Jobs that can run side by side, given both caps
+            slots = max(1, min(self.max_workers, self.max_browsers // max(1, self._queue[0].browsers)))
+            free_slots = max(0, slots - len(self._running))
+
+            if position <= free_slots:
+                wait = 0.0
+            else:
+                remaining = sorted(
+                    max(0.0, self._avg_duration - (now - started))
+                    for started, _ in self._running.values()
+                )
+                first_free = remaining[0] if remaining else 0.0
+                waves = (position - free_slots - 1) // slots
+                wait = first_free + waves * self._avg_duration
+
+            return int(math.ceil(wait + self._avg_duration))
+
+    def stats(self) -> Dict[str, any]:
+        """Snapshot of scheduler load"""
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "running": len(self._running),
+                "browsers_in_use": self._browsers_in_use,
+                "max_workers": self.max_workers,
+                "max_browsers": self.max_browsers,
+                "max_queue_size": self.max_queue_size,
+                "avg_job_seconds": round(self._avg_duration, 1)
+            }
+
+    def _position_locked(self, job_id: str) -> Optional[int]:
+        for idx, entry in enumerate(sorted(self._queue)):
+            if entry.job_id == job_id:
+                return idx + 1
+        return None
+
+    def _retry_after_locked(self) -> int:
+        """Seconds until a running job is expected to free up capacity"""
+        now = time.monotonic()
+        remaining = [
+            max(0.0, self._avg_duration - (now - started))
+            for started, _ in self._running.values()
+        ]
+        return max(1, int(math.ceil(min(remaining)))) if remaining else 1
+
+    # ==================== WORKERS ====================
+
+    def _ensure_workers(self):
+        """Start worker threads on first use"""
+        with self._cond:
+            if self._workers:
+                return
+            for idx in range(self.max_workers):
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"driver-worker-{idx}",
+                    daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+        logger.info(
+            f"[SCHEDULER] Started {self.max_workers} worker(s), "
+            f"browser cap {self.max_browsers}, queue cap {self.max_queue_size or 'unbounded'}"
+        )
+
+    def _next_runnable_locked(self) -> Optional[_QueuedJob]:
+        """Pop the head of the queue if its browsers fit in the remaining budget"""
+        if not self._queue:
+            return None
+        head = self._queue[0]
+        if self._browsers_in_use + head.browsers > self.max_browsers:
+            return None
+        return heapq.heappop(self._queue)
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                entry = self._next_runnable_locked()
+                while entry is None:
+                    self._cond.wait()
+                    entry = self._next_runnable_locked()
+
+                started_at = time.monotonic()
+                self._running[entry.job_id] = (started_at, entry.browsers)
+                self._browsers_in_use += entry.browsers
+
+            waited = started_at - entry.enqueued_at
+            logger.info(f"[SCHEDULER] Dispatching job {entry.job_id} after {waited:.1f}s in queue")
+
+            try:
+                entry.func(entry.job_id, *entry.args)
+            except Exception as e:
+                logger.exception(f"[SCHEDULER] Job {entry.job_id} raised: {e}")
+            finally:
+                duration = time.monotonic() - started_at
+                with self._cond:
+                    _, browsers = self._running.pop(entry.job_id)
+                    self._browsers_in_use -= browsers
+                    # Exponential moving average keeps ETAs tracking recent load
+                    self._avg_duration = 0.7 * self._avg_duration + 0.3 * duration
+                    self._cond.notify_all()
+                logger.info(f"[SCHEDULER] Job {entry.job_id} finished in {duration:.1f}s")
+
+
+# Singleton
+driver_scheduler = DriverJobScheduler(
+    max_workers=settings.max_concurrent_driver_jobs,
+    max_queue_size=settings.max_queued_driver_jobs,
+    max_browsers=settings.max_concurrent_browsers,
+    initial_estimate_seconds=settings.driver_job_estimate_seconds
+)
@@ -0,0 +1,323 @@
+"""
+Job Store
+Pluggable persistence for driver job state.
+
+- MemoryJobStore: plain dict, lost on restart
+- SQLiteJobStore: durable table indexed on (status, started_at)
+- CachedJobStore: in-memory read cache with write-behind flushing to another store
+"""
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.models.job import JobState, JobStatus
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("success", "error")
+
+
+class JobStore(ABC):
+    """Interface every job store backend implements"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[JobState]:
+        """Fetch a job, or None if unknown"""
+
+    @abstractmethod
+    def put(self, state: JobState) -> None:
+        """Insert or replace a job"""
+
+    @abstractmethod
+    def update(self, job_id: str, **changes) -> Optional[JobState]:
+        """Atomically apply field changes; returns the new state or None if unknown"""
+
+    @abstractmethod
+    def list(
+        self,
+        status: Optional[JobStatus] = None,
+        since: Optional[datetime] = None,
+        limit: int = 50,
+        offset: int = 0
+    ) -> List[JobState]:
+        """List jobs newest first, optionally filtered by status and start time"""
+
+    @abstractmethod
+    def delete(self, job_ids: List[str]) -> int:
+        """Delete jobs; returns number removed"""
+
+    @abstractmethod
+    def expired(self, cutoff: datetime) -> List[str]:
+        """IDs of finished jobs that started before cutoff"""
+
+    def flush(self) -> None:
+        """Persist any buffered writes (no-op for unbuffered stores)"""
+
+    def close(self) -> None:
+        """Release resources"""
+
+
+class MemoryJobStore(JobStore):
+    """Dict-backed store guarded by a single lock"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, JobState] = {}
+
+    def get(self, job_id: str) -> Optional[JobState]:
+        with self._lock:
+            state = self._jobs.get(job_id)
+            return state.model_copy() if state else None
+
+    def put(self, state: JobState) -> None:
+        with self._lock:
+            self._jobs[state.job_id] = state.model_copy()
+
+    def update(self, job_id: str, **changes) -> Optional[JobState]:
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if not state:
+                return None
+            updated = state.model_copy(update=changes)
+            self._jobs[job_id] = updated
+            return updated.model_copy()
+
+    def list(self, status=None, since=None, limit=50, offset=0) -> List[JobState]:
+        with self._lock:
+            jobs = [
+                s for s in self._jobs.values()
+                if (status is None or s.status == status)
+                and (since is None or s.started_at >= since)
+            ]
+        jobs.sort(key=lambda s: s.started_at, reverse=True)
+        return [s.model_copy() for s in jobs[offset:offset + limit]]
+
+    def delete(self, job_ids: List[str]) -> int:
+        with self._lock:
+            return sum(1 for job_id in job_ids if self._jobs.pop(job_id, None) is not None)
+
+    def expired(self, cutoff: datetime) -> List[str]:
+        with self._lock:
+            return [
+                s.job_id for s in self._jobs.values()
+                if s.status in TERMINAL_STATUSES and s.started_at < cutoff
+            ]
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite-backed store; one shared connection serialized by a lock"""
+
+    _COLUMNS = ("job_id", "status", "pid", "started_at", "ended_at", "error_message")
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    pid INTEGER,
+                    started_at TEXT NOT NULL,
+                    ended_at TEXT,
+                    error_message TEXT
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_started ON jobs(status, started_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_started ON jobs(started_at)")
+
+    def _to_row(self, state: JobState) -> tuple:
+        data = state.model_dump(mode="json")
+        return tuple(data.get(col) for col in self._COLUMNS)
+
+    def _from_row(self, row: sqlite3.Row) -> JobState:
+        return JobState(**{col: row[col] for col in self._COLUMNS})
+
+    def get(self, job_id: str) -> Optional[JobState]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def put(self, state: JobState) -> None:
+        self.put_many([state])
+
+    def put_many(self, states: List[JobState]) -> None:
+        """Upsert a batch of jobs in one transaction"""
+        if not states:
+            return
+        placeholders = ", ".join("?" for _ in self._COLUMNS)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO jobs ({', '.join(self._COLUMNS)}) VALUES ({placeholders})",
+                    [self._to_row(s) for s in states]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def update(self, job_id: str, **changes) -> Optional[JobState]:
+        with self._lock:
+            # IMMEDIATE takes the write lock up front so the read-modify-write can't interleave
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if not row:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                updated = self._from_row(row).model_copy(update=changes)
+                placeholders = ", ".join("?" for _ in self._COLUMNS)
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO jobs ({', '.join(self._COLUMNS)}) VALUES ({placeholders})",
+                    self._to_row(updated)
+                )
+                self._conn.execute("COMMIT")
+                return updated
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list(self, status=None, since=None, limit=50, offset=0) -> List[JobState]:
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("started_at >= ?")
+            params.append(since.isoformat())
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.extend([limit, offset])
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs {where} ORDER BY started_at DESC LIMIT ? OFFSET ?",
+                params
+            ).fetchall()
+        return [self._from_row(r) for r in rows]
+
+    def delete(self, job_ids: List[str]) -> int:
+        if not job_ids:
+            return 0
+        with self._lock:
+            cursor = self._conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(j,) for j in job_ids])
+            return cursor.rowcount
+
+    def expired(self, cutoff: datetime) -> List[str]:
+        placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT job_id FROM jobs WHERE status IN ({placeholders}) AND started_at < ?",
+                (*TERMINAL_STATUSES, cutoff.isoformat())
+            ).fetchall()
+        return [r["job_id"] for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedJobStore(JobStore):
+    """
+    Write-behind cache in front of another store.
+
+    Reads are served from memory once a job has been seen. Writes land in
+    memory immediately and are flushed to the backing store in batches every
+    `flush_interval` seconds. Terminal status changes are flushed right away
+    so finished jobs survive a restart.
+    """
+
+    def __init__(self, backing: JobStore, flush_interval: float = 1.0):
+        self._backing = backing
+        self._flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._cache: Dict[str, JobState] = {}
+        self._dirty: Dict[str, JobState] = {}
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="job-store-flusher", daemon=True)
+        self._flusher.start()
+
+    def get(self, job_id: str) -> Optional[JobState]:
+        with self._lock:
+            state = self._cache.get(job_id)
+            if state:
+                return state.model_copy()
+        state = self._backing.get(job_id)
+        if state:
+            with self._lock:
+                # Don't clobber a newer in-memory write that raced the backing read
+                self._cache.setdefault(job_id, state)
+        return state
+
+    def put(self, state: JobState) -> None:
+        with self._lock:
+            self._cache[state.job_id] = state.model_copy()
+            self._dirty[state.job_id] = self._cache[state.job_id]
+        if state.status in TERMINAL_STATUSES:
+            self.flush()
+
+    def update(self, job_id: str, **changes) -> Optional[JobState]:
+        with self._lock:
+            state = self._cache.get(job_id)
+            if state is None:
+                state = self._backing.get(job_id)
+                if state is None:
+                    return None
+            updated = state.model_copy(update=changes)
+            self._cache[job_id] = updated
+            self._dirty[job_id] = updated
+        if updated.status in TERMINAL_STATUSES:
+            self.flush()
+        return updated.model_copy()
+
+    def list(self, status=None, since=None, limit=50, offset=0) -> List[JobState]:
+        # Flush first so the indexed backing query sees every write
+        self.flush()
+        return self._backing.list(status=status, since=since, limit=limit, offset=offset)
+
+    def delete(self, job_ids: List[str]) -> int:
+        with self._lock:
+            for job_id in job_ids:
+                self._cache.pop(job_id, None)
+                self._dirty.pop(job_id, None)
+        return self._backing.delete(job_ids)
+
+    def expired(self, cutoff: datetime) -> List[str]:
+        self.flush()
+        return self._backing.expired(cutoff)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            batch = list(self._dirty.values())
+            self._dirty.clear()
+        try:
+            if isinstance(self._backing, SQLiteJobStore):
+                self._backing.put_many(batch)
+            else:
+                for state in batch:
+                    self._backing.put(state)
+        except Exception as e:
+            logger.error(f"[JOB STORE] Flush failed, will retry: {e}")
+            with self._lock:
+                for state in batch:
+                    self._dirty.setdefault(state.job_id, state)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self._flush_interval):
+            self.flush()
+
+    def close(self) -> None:
+        self._stop.set()
+        self.flush()
+        self._backing.close()
@@ -0,0 +1,83 @@
+"""
+Job Workspace
+Per-job directory holding the job's own shopping list, cart JSONs and Knot JSONs,
+so overlapping driver jobs never read or delete each other's files.
+
+Layout:
+    runtime/jobs/<job_id>/workspace/
+        shopping_list.json
+        cart_jsons/
+        knot_api_jsons/
+"""
+import shutil
+import logging
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class JobWorkspace:
+    """Paths an agent pipeline reads from and writes to"""
+    root: Path
+    job_id: Optional[str] = None
+
+    @property
+    def shopping_list_path(self) -> Path:
+        return self.root / "shopping_list.json"
+
+    @property
+    def cart_dir(self) -> Path:
+        return self.root / "cart_jsons"
+
+    @property
+    def knot_dir(self) -> Path:
+        return self.root / "knot_api_jsons"
+
+    @property
+    def is_shared(self) -> bool:
+        return self.job_id is None
+
+    @classmethod
+    def for_job(cls, job_id: str) -> "JobWorkspace":
+        """
+        Workspace for one job
+
+        Raises:
+            ValueError: If job_id is not a UUID (guards against path traversal)
+        """
+        job_id = str(uuid.UUID(job_id))
+        return cls(root=settings.jobs_dir / job_id / "workspace", job_id=job_id)
+
+    @classmethod
+    def shared(cls) -> "JobWorkspace":
+        """Legacy single workspace under data_dir"""
+        return cls(root=settings.data_dir_path)
+
+    def prepare(self, shopping_list_source: Optional[Path] = None) -> "JobWorkspace":
+        """
+        Create the directory layout and snapshot the shopping list into it.
+        The snapshot pins the list the job was submitted with, even if the
+        shared list is overwritten while the job waits in the queue.
+        """
+        self.cart_dir.mkdir(parents=True, exist_ok=True)
+        self.knot_dir.mkdir(parents=True, exist_ok=True)
+
+        source = shopping_list_source or settings.shopping_list_path
+        if source.exists() and source.resolve() != self.shopping_list_path.resolve():
+            shutil.copyfile(source, self.shopping_list_path)
+        elif not source.exists():
+            logger.warning(f"[WORKSPACE] No shopping list at {source} to snapshot into {self.root}")
+
+        return self
+
+
+def resolve_workspace(job_id: Optional[str] = None) -> JobWorkspace:
+    """Workspace for job_id, or the shared legacy workspace when job_id is None"""
+    if job_id is None:
+        return JobWorkspace.shared()
+    return JobWorkspace.for_job(job_id)
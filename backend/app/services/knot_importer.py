@@ -4,10 +4,10 @@ Scans current_code/knot_api_jsons/ and imports orders into Supabase
 """
 import os
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from decimal import Decimal
 from app.services.supabase_service import supabase_service
-from app.config import settings
+from app.services.job_workspace import resolve_workspace
 
 
 def parse_knot_json(knot_data: Dict) -> Dict:
@@ -74,23 +74,25 @@ def parse_knot_json(knot_data: Dict) -> Dict:
     }
 
 
-def import_knot_jsons(user_id: str, directory: str = None) -> List[str]:
+def import_knot_jsons(user_id: str, directory: str = None, job_id: Optional[str] = None) -> List[str]:
     """
     Import all Knot JSONs from directory into Supabase.
     Returns list of created order IDs.
     
     Args:
         user_id: User who owns the orders
-        directory: Path to JSON directory (defaults to settings.knot_api_jsons_dir)
+        directory: Path to JSON directory (defaults to the job's knot_api_jsons/)
+        job_id: Driver job whose workspace to import (shared data_dir if None)
     
     Returns:
         List of order IDs (UUIDs)
     
     Raises:
         FileNotFoundError: If directory doesn't exist
+        ValueError: If job_id is not a valid job ID
     """
     if directory is None:
-        directory = str(settings.knot_api_jsons_dir)
+        directory = str(resolve_workspace(job_id).knot_dir)
     
     if not os.path.exists(directory):
         raise FileNotFoundError(f"Directory not found: {directory}")
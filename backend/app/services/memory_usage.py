@@ -0,0 +1,104 @@
+"""
+Memory Usage
+Samples the resident memory of the browsers behind a driver job while its
+agents run, so the execution modes can be compared by memory per job:
+
+- subprocess: the job's own agent processes (started in its workspace) and
+  their browsers
+- pooled / shared: every browser of this worker process, split evenly over
+  the jobs running agents in-process at the time of each sample
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import psutil
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def child_process_tree(cwd: Optional[Path] = None) -> List[int]:
+    """
+    Pids of this process's descendants. With cwd, only direct children
+    started in that directory, plus their descendants.
+    """
+    pids = []
+    for child in psutil.Process().children():
+        try:
+            if cwd is not None and Path(child.cwd()) != Path(cwd):
+                continue
+            pids.append(child.pid)
+            pids.extend(p.pid for p in child.children(recursive=True))
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return pids
+
+
+def rss_bytes(pids: List[int]) -> int:
+    total = 0
+    for pid in pids:
+        try:
+            total += psutil.Process(pid).memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total
+
+
+class MemorySampler:
+    """Background thread recording the RSS of a set of processes, divided by how many jobs share them"""
+
+    def __init__(self, mode: str, pids: Callable[[], List[int]], shared_by: Callable[[], int] = lambda: 1, interval: float = 1.0):
+        self.mode = mode
+        self.pids = pids
+        self.shared_by = shared_by
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.samples = 0
+        self.peak = 0.0
+        self.total = 0.0
+        self.peak_processes = 0
+        self.max_shared_by = 1
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._loop, name="memory-sampler", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            self.sample()
+            if self._stop.wait(self.interval):
+                return
+
+    def sample(self):
+        try:
+            pids = self.pids()
+            shared_by = max(1, self.shared_by())
+            per_job = rss_bytes(pids) / shared_by
+        except Exception as e:
+            logger.debug(f"[MEMORY] Sample failed: {e}")
+            return
+        self.samples += 1
+        self.total += per_job
+        if per_job >= self.peak:
+            self.peak = per_job
+            self.peak_processes = len(pids)
+        self.max_shared_by = max(self.max_shared_by, shared_by)
+
+    def stop(self) -> Dict:
+        """Stop sampling and return the job's memory report"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+        return {
+            "mode": self.mode,
+            "peak_rss_mb": round(self.peak / MB, 1),
+            "avg_rss_mb": round(self.total / self.samples / MB, 1) if self.samples else 0.0,
+            "processes_at_peak": self.peak_processes,
+            "max_jobs_sharing": self.max_shared_by,
+            "samples": self.samples
+        }
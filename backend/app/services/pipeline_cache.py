@@ -0,0 +1,121 @@
+"""
+Pipeline Result Cache
+Reuses cart + Knot JSONs when the same shopping list runs again on the same
+platform and store within the TTL, so the browser agent can be skipped.
+
+Keys are a SHA-256 over the canonicalized shopping list, the platform and the
+store. Entries are held in memory with LRU eviction.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _canonical_quantity(quantity: Any) -> str:
+    """2, 2.0 and "2" compare equal; unit strings are lowercased and whitespace-collapsed"""
+    if isinstance(quantity, (int, float)):
+        return f"{float(quantity):g}"
+    text = re.sub(r"\s+", " ", str(quantity).strip().lower())
+    try:
+        return f"{float(text):g}"
+    except ValueError:
+        return text
+
+
+def canonical_shopping_list(entries: List[Dict[str, Any]]) -> List[List[str]]:
+    """Order-independent, case/whitespace-insensitive form of a shopping list"""
+    canonical = []
+    for entry in entries:
+        item = re.sub(r"\s+", " ", str(entry.get("item", "")).strip().lower())
+        if item:
+            canonical.append([item, _canonical_quantity(entry.get("quantity", 1))])
+    return sorted(canonical)
+
+
+def cache_key(entries: List[Dict[str, Any]], platform: str, store: Optional[str]) -> str:
+    """Stable hash identifying one platform run of a shopping list"""
+    payload = {
+        "items": canonical_shopping_list(entries),
+        "platform": platform,
+        "store": (store or "").strip().lower()
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+@dataclass
+class CachedResult:
+    """Artifacts of one successful platform run"""
+    platform: str
+    cart_file: str
+    cart_json: Dict[str, Any]
+    knot_json: Dict[str, Any]
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class PipelineResultCache:
+    """Thread-safe TTL + LRU cache of per-platform pipeline results"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry.created_at > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def peek(self, key: str) -> bool:
+        """Whether a fresh entry exists, without counting a hit or miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.monotonic() - entry.created_at <= self.ttl_seconds
+
+    def put(self, key: str, result: CachedResult) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                logger.debug(f"[CACHE] Evicted {evicted.platform} result {evicted_key[:12]}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+
+# Singleton
+pipeline_cache = PipelineResultCache(
+    ttl_seconds=settings.pipeline_cache_ttl_seconds,
+    max_entries=settings.pipeline_cache_max_entries
+)
@@ -0,0 +1,224 @@
+"""
+Platform Session Manager
+One live NovaAct session per platform, shared by CartDetailAgentNova and
+EditCartAgentNova, so "apply edits, then re-read the cart" (and the reverse)
+runs on one browser instead of two back-to-back cold starts on the same
+user_data_dir.
+
+Sessions are PooledSessions (a NovaAct plus the thread that owns it), started
+on first use and stopped after PLATFORM_SESSION_IDLE_TIMEOUT_SECONDS without
+work. Operations on a platform are serialized; different platforms run in
+parallel.
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.browser_session_pool import PooledSession
+from models.cart_models import CartDiff, DiffResult, PlatformCart
+
+logger = logging.getLogger(__name__)
+
+
+class _PlatformSlot:
+    __slots__ = ("lock", "session", "last_used")
+
+    def __init__(self):
+        self.lock = threading.Lock()  # One operation per platform at a time
+        self.session: Optional[PooledSession] = None
+        self.last_used = 0.0
+
+
+class PlatformSessionManager:
+    """Shared, lazily started, idle-stopped NovaAct session per platform"""
+
+    def __init__(self, idle_timeout: float = 120):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._slots: Dict[str, _PlatformSlot] = {}
+        self._stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+        self.starts = 0
+        self.reuses = 0
+
+    # ==================== SESSIONS ====================
+
+    def _slot(self, platform: str) -> _PlatformSlot:
+        with self._lock:
+            return self._slots.setdefault(platform, _PlatformSlot())
+
+    @contextmanager
+    def session(self, platform: str):
+        """
+        Hold the platform's live session for a with-block, starting it if
+        needed. A session that raised is stopped; the next caller gets a new one.
+        """
+        slot = self._slot(platform)
+        with slot.lock:
+            session = slot.session
+            if session is not None and not session.health_check():
+                self._stop_session(session)
+                session = slot.session = None
+            if session is None:
+                session = PooledSession(platform, slot=0)
+                try:
+                    session.start()
+                except Exception:
+                    session.stop(wait=False)
+                    raise
+                slot.session = session
+                self.starts += 1
+                logger.info(f"[SESSIONS] Started shared {platform} session")
+            else:
+                self.reuses += 1
+            self._start_reaper()
+
+            try:
+                yield session
+            except Exception:
+                self._stop_session(session)
+                slot.session = None
+                raise
+            finally:
+                slot.last_used = time.monotonic()
+                session.uses += 1
+
+    def run(self, platform: str, fn: Callable, *args):
+        """Run fn(nova, *args) on the platform's session thread (blocking)"""
+        with self.session(platform) as session:
+            return session.call(fn, *args)
+
+    # ==================== WORKFLOWS ====================
+
+    async def extract_cart(self, platform: str, user_id: Optional[str] = None) -> PlatformCart:
+        from app.agents.cart_detail_agent_nova import CartDetailAgentNova
+        agent = CartDetailAgentNova(platform, user_id=user_id)
+        return await asyncio.to_thread(self.run, platform, agent.extract_on_session)
+
+    async def apply_diffs(
+        self,
+        platform: str,
+        diffs: List[CartDiff],
+        cart: Optional[PlatformCart] = None,
+        user_id: Optional[str] = None
+    ) -> List[DiffResult]:
+        from app.agents.edit_cart_agent_nova import EditCartAgentNova
+        agent = EditCartAgentNova(platform, user_id=user_id)
+        return await asyncio.to_thread(self.run, platform, agent.apply_on_session, diffs, cart)
+
+    async def edit_then_extract(
+        self,
+        platform: str,
+        diffs: Optional[List[CartDiff]] = None,
+        user_id: Optional[str] = None
+    ) -> Tuple[List[DiffResult], PlatformCart]:
+        """
+        Apply diffs, then read back the resulting cart, on one browser.
+        With diffs=None the user's pending diffs from the cart state store are used.
+        """
+        from app.agents.cart_detail_agent_nova import CartDetailAgentNova
+        from app.agents.edit_cart_agent_nova import EditCartAgentNova
+        from app.services.cart_state_store import cart_state_store
+        editor = EditCartAgentNova(platform, user_id=user_id)
+        reader = CartDetailAgentNova(platform, user_id=user_id)
+
+        def workflow(nova):
+            pending = diffs
+            if pending is None:
+                pending = cart_state_store.get(user_id).get_pending_diffs(platform) if user_id else []
+            results = editor.apply_on_session(nova, pending)
+            return results, reader.extract_on_session(nova)
+
+        return await asyncio.to_thread(self.run, platform, workflow)
+
+    async def extract_then_edit(
+        self,
+        platform: str,
+        diffs: Optional[List[CartDiff]] = None,
+        user_id: Optional[str] = None
+    ) -> Tuple[PlatformCart, List[DiffResult]]:
+        """
+        Read the cart, then apply diffs folded against it, on one browser.
+        With diffs=None the user's pending diffs from the cart state store are used.
+        """
+        from app.agents.cart_detail_agent_nova import CartDetailAgentNova
+        from app.agents.edit_cart_agent_nova import EditCartAgentNova
+        from app.services.cart_state_store import cart_state_store
+        editor = EditCartAgentNova(platform, user_id=user_id)
+        reader = CartDetailAgentNova(platform, user_id=user_id)
+
+        def workflow(nova):
+            cart = reader.extract_on_session(nova)
+            pending = diffs
+            if pending is None:
+                pending = cart_state_store.get(user_id).get_pending_diffs(platform) if user_id else []
+            return cart, editor.apply_on_session(nova, pending, cart)
+
+        return await asyncio.to_thread(self.run, platform, workflow)
+
+    # ==================== IDLE TIMEOUT ====================
+
+    def _start_reaper(self):
+        if self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._reap_loop, name="platform-session-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1.0, min(30.0, self.idle_timeout / 4))
+        while not self._stop.wait(interval):
+            self.stop_idle()
+
+    def stop_idle(self) -> int:
+        """Stop sessions idle for longer than the timeout; returns how many"""
+        now = time.monotonic()
+        with self._lock:
+            slots = list(self._slots.items())
+        stopped = 0
+        for platform, slot in slots:
+            # Busy platforms are in use, not idle
+            if not slot.lock.acquire(blocking=False):
+                continue
+            try:
+                if slot.session is not None and now - slot.last_used >= self.idle_timeout:
+                    logger.info(f"[SESSIONS] Stopping idle {platform} session")
+                    self._stop_session(slot.session)
+                    slot.session = None
+                    stopped += 1
+            finally:
+                slot.lock.release()
+        return stopped
+
+    @staticmethod
+    def _stop_session(session: PooledSession):
+        try:
+            session.stop()
+        except Exception as e:
+            logger.warning(f"[SESSIONS] Error stopping {session.platform} session: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            idle_seconds = {
+                platform: round(now - slot.last_used, 1)
+                for platform, slot in self._slots.items()
+                if slot.session is not None
+            }
+        return {"idle_seconds": idle_seconds, "starts": self.starts, "reuses": self.reuses, "idle_timeout": self.idle_timeout}
+
+    def shutdown(self):
+        self._stop.set()
+        with self._lock:
+            slots = list(self._slots.values())
+        for slot in slots:
+            with slot.lock:
+                if slot.session is not None:
+                    self._stop_session(slot.session)
+                    slot.session = None
+
+
+# Singleton
+platform_session_manager = PlatformSessionManager(idle_timeout=settings.platform_session_idle_timeout_seconds)
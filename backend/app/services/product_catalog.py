@@ -0,0 +1,382 @@
+"""
+Product Catalog
+Persistent per-platform, per-store catalog of products seen in cart
+extractions, so agents can go straight to a known product instead of
+searching and browsing for it every time.
+
+Products are indexed by the shopping list item they were bought for
+(item_products): the key is the requested item's normalize_item_name()
+output (item_key), recorded from each extracted cart line's
+ingredient_requested. A lookup only answers for that exact key, so "milk"
+never resolves to a "Coconut Milk" bought for something else; on a miss the
+agent searches the store as usual. match_requested_items() attributes the
+lines of an extracted cart to the items a run asked for.
+
+Entries older than the TTL are "stale": lookups count them but don't return
+them until a newer extraction refreshes the product. Lookup metrics are
+stored with the catalog, so runs in agent subprocesses show up in stats();
+contains() answers the same question without counting it. The driver job
+janitor purges products unseen for 4x the TTL.
+"""
+import logging
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from app.config import settings
+from app.agents.search_and_add_agents.item_names import normalize_item_name
+
+logger = logging.getLogger(__name__)
+
+# Words that say nothing about which product it is
+_STOPWORDS = {"and", "of", "the", "with", "for", "a", "an", "in", "oz", "fl", "lb", "lbs", "ct", "pk", "pack", "count"}
+
+
+def _singular(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith("oes"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def name_tokens(name: str) -> List[str]:
+    """Index tokens for a product or item name: normalized, lowercased, singular, deduplicated"""
+    tokens = []
+    for word in re.split(r"[\s/,&()]+", normalize_item_name(name).lower()):
+        word = re.sub(r"[^\w\-]", "", word).strip("-")
+        if not word or word in _STOPWORDS or word.replace(".", "").isdigit():
+            continue
+        token = _singular(word)
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def item_key(name: str) -> str:
+    """Index key for a requested shopping list item"""
+    return " ".join(name_tokens(name))
+
+
+def match_requested_items(requested: List[str], lines: List[Dict[str, Any]], min_match: float = 1.0) -> List[Dict[str, Any]]:
+    """
+    Attribute extracted cart lines to the shopping list items they were added for.
+
+    A line belongs to an item when its name covers at least min_match of the
+    item's tokens. More specific items (more tokens) pick first; an item
+    left with more than one candidate line is ambiguous ("milk" with both
+    "Coconut Milk" and "Whole Milk" in the cart) and gets none, since a wrong
+    entry would send later runs to the wrong product.
+
+    Returns copies of the lines, with "ingredient_requested" set on the matched ones.
+    """
+    lines = [dict(line) for line in lines]
+    line_tokens = [set(name_tokens(str(line.get("name") or ""))) for line in lines]
+    taken = {index for index, line in enumerate(lines) if line.get("ingredient_requested")}
+    for item in sorted(requested, key=lambda item: len(name_tokens(item)), reverse=True):
+        tokens = name_tokens(item)
+        if not tokens:
+            continue
+        candidates = [
+            index for index, candidate in enumerate(line_tokens)
+            if index not in taken and sum(1 for token in tokens if token in candidate) / len(tokens) >= min_match
+        ]
+        if len(candidates) == 1:
+            taken.add(candidates[0])
+            lines[candidates[0]]["ingredient_requested"] = item
+    return lines
+
+
+@dataclass
+class CatalogProduct:
+    platform: str
+    store: str
+    name: str
+    size: str
+    price: Optional[float]
+    product_url: str
+    sku: str
+    seen_count: int
+    last_seen: float
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.last_seen
+
+
+class ProductCatalog:
+    """SQLite-backed product catalog; one shared connection serialized by a lock"""
+
+    def __init__(self, db_path: Path, ttl_seconds: float, min_match: float = 1.0):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.min_match = min_match  # For match_requested_items
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None, timeout=5)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS products (
+                    id INTEGER PRIMARY KEY,
+                    platform TEXT NOT NULL,
+                    store TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    size TEXT NOT NULL DEFAULT '',
+                    price REAL,
+                    product_url TEXT NOT NULL DEFAULT '',
+                    sku TEXT NOT NULL DEFAULT '',
+                    seen_count INTEGER NOT NULL DEFAULT 1,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    UNIQUE (platform, store, name, size)
+                );
+                CREATE TABLE IF NOT EXISTS item_products (
+                    platform TEXT NOT NULL,
+                    store TEXT NOT NULL,
+                    item_key TEXT NOT NULL,
+                    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+                    seen_count INTEGER NOT NULL DEFAULT 1,
+                    last_seen REAL NOT NULL,
+                    PRIMARY KEY (platform, store, item_key, product_id)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS catalog_metrics (
+                    platform TEXT NOT NULL,
+                    store TEXT NOT NULL,
+                    lookups INTEGER NOT NULL DEFAULT 0,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    stale INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (platform, store)
+                );
+            """)
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._conn = conn
+        return self._conn
+
+    # ==================== WRITE ====================
+
+    def record_products(self, platform: str, store: Optional[str], items: Iterable[Dict[str, Any]]) -> int:
+        """
+        Upsert products from one cart extraction
+
+        Args:
+            items: Dicts with "name" and optionally "size", "price", "product_url",
+                "sku" and "ingredient_requested" (the shopping list item it was
+                added for; only those lines can be looked up later)
+
+        Returns:
+            Number of products recorded
+        """
+        store = (store or "").strip().lower()
+        now = time.time()
+        count = 0
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for item in items:
+                    name = str(item.get("name") or "").strip()
+                    if not name_tokens(name):
+                        continue
+                    product_id = self._upsert_locked(conn, platform, store, name, item, now)
+                    key = item_key(str(item.get("ingredient_requested") or ""))
+                    if key:
+                        conn.execute(
+                            """
+                            INSERT INTO item_products (platform, store, item_key, product_id, last_seen)
+                            VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT (platform, store, item_key, product_id) DO UPDATE SET
+                                seen_count = seen_count + 1,
+                                last_seen = excluded.last_seen
+                            """,
+                            (platform, store, key, product_id, now)
+                        )
+                    count += 1
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if count:
+            logger.debug(f"[CATALOG] Recorded {count} {platform} products for store '{store}'")
+        return count
+
+    def _upsert_locked(self, conn, platform: str, store: str, name: str, item: Dict[str, Any], now: float) -> int:
+        size = str(item.get("size") or "").strip()
+        price = _to_price(item.get("price"))
+        url = str(item.get("product_url") or "").strip()
+        sku = str(item.get("sku") or "").strip()
+        conn.execute(
+            """
+            INSERT INTO products (platform, store, name, size, price, product_url, sku, first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (platform, store, name, size) DO UPDATE SET
+                price = COALESCE(excluded.price, price),
+                product_url = CASE WHEN excluded.product_url != '' THEN excluded.product_url ELSE product_url END,
+                sku = CASE WHEN excluded.sku != '' THEN excluded.sku ELSE sku END,
+                seen_count = seen_count + 1,
+                last_seen = excluded.last_seen
+            """,
+            (platform, store, name, size, price, url, sku, now, now)
+        )
+        row = conn.execute(
+            "SELECT id FROM products WHERE platform = ? AND store = ? AND name = ? AND size = ?",
+            (platform, store, name, size)
+        ).fetchone()
+        return row["id"]
+
+    # ==================== READ ====================
+
+    def lookup(self, platform: str, store: Optional[str], item_name: str) -> Optional[CatalogProduct]:
+        """Product last bought here for exactly this item, or None (counted as a miss or stale)"""
+        store = (store or "").strip().lower()
+        key = item_key(item_name)
+        if not key:
+            return None
+
+        with self._lock:
+            conn = self._connection()
+            best, rows = self._best_locked(conn, platform, store, key)
+            hit = best is not None
+            self._count_locked(conn, platform, store, hit=hit, stale=bool(rows) and not hit)
+
+        if not hit:
+            return None
+        return CatalogProduct(
+            platform=best["platform"],
+            store=best["store"],
+            name=best["name"],
+            size=best["size"],
+            price=best["price"],
+            product_url=best["product_url"],
+            sku=best["sku"],
+            seen_count=best["picks"],
+            last_seen=best["picked"]
+        )
+
+    def contains(self, platform: str, store: Optional[str], item_name: str) -> bool:
+        """Whether lookup() would answer for this item, without counting it in the metrics"""
+        store = (store or "").strip().lower()
+        key = item_key(item_name)
+        if not key:
+            return False
+        with self._lock:
+            return self._best_locked(self._connection(), platform, store, key)[0] is not None
+
+    def _best_locked(self, conn, platform: str, store: str, key: str):
+        """(fresh product row to answer with or None, every row for the item)"""
+        rows = conn.execute(
+            """
+            SELECT p.*, i.seen_count AS picks, i.last_seen AS picked
+            FROM item_products i JOIN products p ON p.id = i.product_id
+            WHERE i.platform = ? AND i.store = ? AND i.item_key = ?
+            """,
+            (platform, store, key)
+        ).fetchall()
+
+        cutoff = time.time() - self.ttl_seconds
+        fresh = [row for row in rows if row["picked"] >= cutoff]
+        # Most often bought for this item, then most recently
+        return max(fresh, key=lambda row: (row["picks"], row["picked"]), default=None), rows
+
+    def _count_locked(self, conn, platform: str, store: str, hit: bool, stale: bool):
+        try:
+            conn.execute(
+                """
+                INSERT INTO catalog_metrics (platform, store, lookups, hits, stale) VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT (platform, store) DO UPDATE SET
+                    lookups = lookups + 1, hits = hits + excluded.hits, stale = stale + excluded.stale
+                """,
+                (platform, store, int(hit), int(stale))
+            )
+        except sqlite3.Error as e:
+            logger.debug(f"[CATALOG] Could not update metrics: {e}")
+
+    # ==================== MAINTENANCE ====================
+
+    def purge_stale(self, max_age_seconds: Optional[float] = None) -> int:
+        """Delete products not seen within max_age_seconds (default: 4x the TTL)"""
+        max_age = max_age_seconds if max_age_seconds is not None else self.ttl_seconds * 4
+        with self._lock:
+            cursor = self._connection().execute(
+                "DELETE FROM products WHERE last_seen < ?", (time.time() - max_age,)
+            )
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Per platform/store product counts, staleness and lookup hit rates"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            conn = self._connection()
+            products = conn.execute(
+                """
+                SELECT platform, store, COUNT(*) AS products,
+                       SUM(CASE WHEN last_seen < ? THEN 1 ELSE 0 END) AS stale_products,
+                       MIN(last_seen) AS oldest
+                FROM products GROUP BY platform, store
+                """,
+                (cutoff,)
+            ).fetchall()
+            metrics = {
+                (row["platform"], row["store"]): row
+                for row in conn.execute("SELECT * FROM catalog_metrics").fetchall()
+            }
+
+        now = time.time()
+        scopes = {}
+        for row in products:
+            scopes[(row["platform"], row["store"])] = {
+                "products": row["products"],
+                "stale_products": row["stale_products"],
+                "oldest_age_seconds": round(now - row["oldest"], 1)
+            }
+        for key, row in metrics.items():
+            scope = scopes.setdefault(key, {"products": 0, "stale_products": 0, "oldest_age_seconds": None})
+            scope.update({
+                "lookups": row["lookups"],
+                "hits": row["hits"],
+                "stale_lookups": row["stale"],
+                "hit_rate": round(row["hits"] / row["lookups"], 3) if row["lookups"] else 0.0
+            })
+
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "scopes": [
+                {"platform": platform, "store": store, **values}
+                for (platform, store), values in sorted(scopes.items())
+            ]
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _to_price(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace("$", "").replace(",", "").strip())
+    except ValueError:
+        return None
+
+
+# Singleton
+product_catalog = ProductCatalog(
+    db_path=settings.product_catalog_db_path,
+    ttl_seconds=settings.product_catalog_ttl_hours * 3600,
+    min_match=settings.product_catalog_min_match
+)
@@ -0,0 +1,351 @@
+"""
+Profile Snapshots
+Cheap per-session copies of a platform's signed-in browser profile, so
+parallel browsers can share one account on one host.
+
+Chrome locks its user_data_dir, and NovaAct's clone_user_data_dir copies the
+whole profile (caches included) for every browser. Instead:
+
+- snapshot(platform) copies the signed-in profile once, without caches,
+  crash dumps or Chrome's Singleton* lock files, into
+  runtime/profile_snapshots/<platform>/snapshots/<stamp>/. SignInAgentNova
+  takes one after every sign-in; clone() takes one if none exists or the
+  newest is older than PROFILE_SNAPSHOT_MAX_AGE_SECONDS.
+- clone(platform) makes a copy-on-write clone of the newest snapshot under
+  .../clones/<pid>-<id>/: reflinks (FICLONE) where the filesystem supports
+  them; otherwise hardlinks for files Chrome never rewrites in place
+  (LevelDB tables) and plain copies for the rest.
+- ProfileClone.release() deletes the clone. The browser allocator does
+  this when the lease ends; clones left behind by dead processes are
+  collected by gc().
+- export_storage_state(playwright, platform) saves a clone's cookies and
+  localStorage as Playwright storage state, for browsers that can't run on
+  a profile directory (the shared browser).
+"""
+import errno
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks, hardlinks and copies only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ioctl that makes dst share src's extents (btrfs, XFS, bcachefs, ...)
+FICLONE = 0x40049409
+
+# Directories Chrome rebuilds on demand; never worth copying
+CACHE_DIRS = {
+    "Cache", "Code Cache", "GPUCache", "ShaderCache", "GrShaderCache", "GraphiteDawnCache",
+    "DawnCache", "DawnGraphiteCache", "DawnWebGPUCache", "CacheStorage", "ScriptCache",
+    "component_crx_cache", "extensions_crx_cache", "optimization_guide_model_store",
+    "Crashpad", "Crash Reports", "BrowserMetrics", "blob_storage", "Download Service",
+}
+
+# Per-process lock/IPC files; a copy makes Chrome think the profile is in use
+SKIP_FILES = {"SingletonLock", "SingletonCookie", "SingletonSocket", "BrowserMetrics-spare.pma", "lockfile"}
+
+# Written once and never modified in place, so clones may share them
+IMMUTABLE_SUFFIXES = (".ldb", ".sst")
+
+
+@dataclass(slots=True)
+class ProfileClone:
+    """A private copy of a profile snapshot for one browser"""
+    platform: str
+    path: Path
+    snapshot: Path
+    methods: Dict[str, int] = field(default_factory=dict)  # files per copy method
+    _service: "ProfileSnapshotService" = field(repr=False, default=None)
+    released: bool = False
+
+    def release(self):
+        if not self.released and self._service is not None:
+            self._service.discard(self)
+
+
+class ProfileSnapshotService:
+    """Cache-stripped profile snapshots and copy-on-write clones per platform"""
+
+    def __init__(self, root: Path, max_age_seconds: float = 3600):
+        self.root = root
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._platform_locks: Dict[str, threading.Lock] = {}
+        self._copying: Dict[Path, int] = {}  # Snapshots being cloned right now
+        self._reflink: Optional[bool] = None if fcntl is not None else False
+        self._collected = False
+        self.snapshots_taken = 0
+        self.clones_made = 0
+        self.clones_removed = 0
+
+    # ==================== SNAPSHOTS ====================
+
+    def snapshot(self, platform: str, source: Optional[Path] = None) -> Path:
+        """
+        Take a fresh snapshot of the platform's profile (or source) and drop
+        the older ones. Returns the snapshot directory.
+        """
+        with self._platform_lock(platform):
+            return self._take_snapshot(platform, source)
+
+    def _take_snapshot(self, platform: str, source: Optional[Path]) -> Path:
+        from app.services.browser_allocator import profile_dir
+
+        source = source or profile_dir(platform)
+        if not source.is_dir():
+            raise FileNotFoundError(f"No {platform} profile at {source}; sign in first")
+
+        snapshots = self._snapshots_dir(platform)
+        snapshots.mkdir(parents=True, exist_ok=True)
+        stamp = str(time.time_ns())
+        staging = snapshots / f"{stamp}.tmp"
+        started = time.perf_counter()
+        try:
+            methods = self._copy_tree(source, staging)
+            target = snapshots / stamp
+            os.replace(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self.snapshots_taken += 1
+        logger.info(
+            f"[SNAPSHOTS] {platform} snapshot {stamp} in {time.perf_counter() - started:.2f}s "
+            f"({sum(methods.values())} files, {methods})"
+        )
+        self._drop_old_snapshots(platform, keep=target)
+        return target
+
+    def latest_snapshot(self, platform: str) -> Optional[Path]:
+        snapshots = self._snapshots_dir(platform)
+        if not snapshots.is_dir():
+            return None
+        stamps = [p for p in snapshots.iterdir() if p.is_dir() and p.name.isdigit()]
+        return max(stamps, key=lambda p: int(p.name), default=None)
+
+    def _fresh_snapshot(self, platform: str) -> Path:
+        """Newest snapshot, or a new one if it is missing or too old (caller holds the platform lock)"""
+        latest = self.latest_snapshot(platform)
+        if latest is not None and time.time() - int(latest.name) / 1e9 < self.max_age_seconds:
+            return latest
+        return self._take_snapshot(platform, None)
+
+    def _drop_old_snapshots(self, platform: str, keep: Path):
+        # Clones don't reference their snapshot once made; ones still being cloned go next time
+        with self._lock:
+            copying = set(self._copying)
+        for path in self._snapshots_dir(platform).iterdir():
+            if path == keep or path in copying or not path.is_dir():
+                continue
+            if path.name.isdigit() or self._stale_tmp(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    # ==================== CLONES ====================
+
+    def clone(self, platform: str) -> ProfileClone:
+        """Copy-on-write clone of the newest snapshot (taking one if needed)"""
+        if not self._collected:
+            self._collected = True
+            self.gc()
+
+        with self._platform_lock(platform):
+            snapshot = self._fresh_snapshot(platform)
+            with self._lock:
+                self._copying[snapshot] = self._copying.get(snapshot, 0) + 1
+        path = self._clones_dir(platform) / f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        started = time.perf_counter()
+        try:
+            methods = self._copy_tree(snapshot, path, strip=False)
+        except Exception:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        finally:
+            with self._lock:
+                self._copying[snapshot] -= 1
+                if not self._copying[snapshot]:
+                    del self._copying[snapshot]
+
+        self.clones_made += 1
+        logger.info(f"[SNAPSHOTS] Cloned {platform} profile to {path.name} in {time.perf_counter() - started:.2f}s {methods}")
+        return ProfileClone(platform, path, snapshot, methods, self)
+
+    def discard(self, clone: ProfileClone):
+        with self._lock:
+            if clone.released:
+                return
+            clone.released = True
+        shutil.rmtree(clone.path, ignore_errors=True)
+        self.clones_removed += 1
+        logger.debug(f"[SNAPSHOTS] Removed {clone.platform} clone {clone.path.name}")
+
+    def gc(self) -> int:
+        """Remove clones whose process is gone and half-written snapshots; returns how many"""
+        removed = 0
+        if not self.root.is_dir():
+            return removed
+        for platform_dir in self.root.iterdir():
+            clones = platform_dir / "clones"
+            if clones.is_dir():
+                for path in clones.iterdir():
+                    pid = path.name.split("-", 1)[0]
+                    if pid.isdigit() and int(pid) != os.getpid() and not self._pid_alive(int(pid)):
+                        shutil.rmtree(path, ignore_errors=True)
+                        removed += 1
+            snapshots = platform_dir / "snapshots"
+            if snapshots.is_dir():
+                for path in snapshots.iterdir():
+                    if self._stale_tmp(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                        removed += 1
+        if removed:
+            logger.info(f"[SNAPSHOTS] Collected {removed} orphaned profile copies")
+        return removed
+
+    def stats(self) -> Dict:
+        return {
+            "reflink": self._reflink,
+            "snapshots_taken": self.snapshots_taken,
+            "clones_made": self.clones_made,
+            "clones_removed": self.clones_removed,
+            "clones_live": self.clones_made - self.clones_removed,
+        }
+
+    # ==================== SESSION STATE ====================
+
+    def storage_state_path(self, platform: str) -> Path:
+        return self.root / platform / "storage_state.json"
+
+    def export_storage_state(self, playwright, platform: str) -> Path:
+        """
+        Save the platform's signed-in cookies and localStorage (Playwright
+        storage state) from a clone of its snapshot. Runs on the thread that
+        owns the sync Playwright instance.
+        """
+        from config.platforms import PLATFORM_CONFIGS
+
+        clone = self.clone(platform)
+        path = self.storage_state_path(platform)
+        staging = path.with_suffix(".tmp")
+        try:
+            context = playwright.chromium.launch_persistent_context(str(clone.path), headless=True)
+            try:
+                # localStorage is only exported for origins the context has visited
+                page = context.pages[0] if context.pages else context.new_page()
+                try:
+                    page.goto(PLATFORM_CONFIGS[platform]["home_url"], wait_until="domcontentloaded", timeout=30000)
+                except Exception as e:
+                    logger.warning(f"[SNAPSHOTS] {platform} home page did not load, exporting cookies only: {e}")
+                context.storage_state(path=str(staging))
+            finally:
+                context.close()
+            os.replace(staging, path)
+        finally:
+            clone.release()
+            staging.unlink(missing_ok=True)
+        logger.info(f"[SNAPSHOTS] Exported {platform} session state to {path}")
+        return path
+
+    # ==================== COPYING ====================
+
+    def _copy_tree(self, source: Path, target: Path, strip: bool = True) -> Dict[str, int]:
+        """Copy source to target file by file; strip leaves out caches and lock files"""
+        methods: Dict[str, int] = {}
+        for directory, dirnames, filenames in os.walk(source):
+            relative = Path(directory).relative_to(source)
+            if strip:
+                dirnames[:] = [d for d in dirnames if d not in CACHE_DIRS]
+            (target / relative).mkdir(parents=True, exist_ok=True)
+            for name in filenames:
+                if strip and name in SKIP_FILES:
+                    continue
+                src = Path(directory) / name
+                dst = target / relative / name
+                if src.is_symlink():
+                    if strip:
+                        continue  # Only Chrome's Singleton* files are symlinks
+                    os.symlink(os.readlink(src), dst)
+                    method = "symlink"
+                else:
+                    try:
+                        method = self._copy_file(src, dst)
+                    except FileNotFoundError:
+                        continue  # Chrome deleted it mid-walk (live profile)
+                methods[method] = methods.get(method, 0) + 1
+            # Directory symlinks (rare) are copied as links, never followed
+            for name in list(dirnames):
+                src = Path(directory) / name
+                if src.is_symlink():
+                    dirnames.remove(name)
+                    if not strip:
+                        os.symlink(os.readlink(src), target / relative / name)
+        return methods
+
+    def _copy_file(self, src: Path, dst: Path) -> str:
+        if self._reflink is not False:
+            try:
+                with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                shutil.copystat(src, dst)
+                self._reflink = True
+                return "reflink"
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+                    raise
+                dst.unlink(missing_ok=True)
+                if self._reflink is None:
+                    logger.info(f"[SNAPSHOTS] No reflink support under {self.root}; using hardlinks and copies")
+                self._reflink = False
+
+        if src.name.endswith(IMMUTABLE_SUFFIXES):
+            try:
+                os.link(src, dst)
+                return "hardlink"
+            except OSError:
+                pass  # Different filesystem or no hardlink support
+        shutil.copy2(src, dst)
+        return "copy"
+
+    # ==================== HELPERS ====================
+
+    def _snapshots_dir(self, platform: str) -> Path:
+        return self.root / platform / "snapshots"
+
+    def _clones_dir(self, platform: str) -> Path:
+        return self.root / platform / "clones"
+
+    def _platform_lock(self, platform: str) -> threading.Lock:
+        with self._lock:
+            return self._platform_locks.setdefault(platform, threading.Lock())
+
+    @staticmethod
+    def _stale_tmp(path: Path) -> bool:
+        """Staging directory of a snapshot that was never finished (older than an hour)"""
+        return path.name.endswith(".tmp") and time.time() - path.stat().st_mtime > 3600
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True  # Exists but owned by someone else
+        return True
+
+
+# Singleton
+profile_snapshots = ProfileSnapshotService(
+    root=settings.profile_snapshots_dir,
+    max_age_seconds=settings.profile_snapshot_max_age_seconds
+)
@@ -0,0 +1,248 @@
+"""
+Session Preflight
+Cheap check, before any browser starts, that a platform's stored login is
+still usable, so an expired session fails in milliseconds instead of after
+a full agent run.
+
+1. Profile: no user_data_dir/Default means the platform was never signed in.
+2. Cookies: the profile's Chrome cookie DB (read-only) or its exported
+   storage state is searched for the platform's session cookies
+   (PLATFORM_CONFIGS[...]["session_cookies"]). All of them expired means
+   re-login; an unexpired one means the session is valid.
+3. Fetch: if the cookies are inconclusive (names changed, DB unreadable),
+   one GET of the cart page with the exported storage-state cookies, no
+   redirects followed. A redirect to a login page means re-login.
+
+Anything still inconclusive counts as valid; the agent finds out the slow
+way, as before. Results are cached per platform for
+SESSION_PREFLIGHT_TTL_SECONDS, or until the profile's cookies change.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from app.config import settings
+from config.platforms import PLATFORM_CONFIGS
+
+logger = logging.getLogger(__name__)
+
+# Chrome stores cookie expiry as microseconds since 1601-01-01 UTC
+CHROME_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
+
+# Where Chrome keeps the cookie DB (newer versions moved it under Network/)
+COOKIE_DB_PATHS = ("Default/Network/Cookies", "Default/Cookies")
+
+LOGIN_URL_MARKERS = ("login", "signin", "sign-in", "auth")
+
+
+@dataclass(slots=True)
+class SessionCheck:
+    """Outcome of a preflight for one platform"""
+    platform: str
+    valid: bool
+    method: str  # "profile", "cookies", "fetch" or "none" (inconclusive)
+    reason: str
+    expires_at: Optional[datetime] = None
+    checked_at: float = field(default_factory=time.time)
+    cookies_mtime: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "platform": self.platform,
+            "valid": self.valid,
+            "method": self.method,
+            "reason": self.reason,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None
+        }
+
+
+class SessionPreflight:
+    """Cached, browser-free login checks per platform"""
+
+    def __init__(self, ttl_seconds: float = 60, fetch: bool = True, timeout: float = 5):
+        self.ttl_seconds = ttl_seconds
+        self.fetch = fetch
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._cache: Dict[str, SessionCheck] = {}
+
+    def check(self, platform: str, force: bool = False) -> SessionCheck:
+        """Cached check for one platform (force: ignore the cache)"""
+        mtime = self._cookies_mtime(platform)
+        with self._lock:
+            cached = self._cache.get(platform)
+        if (
+            cached is not None and not force
+            and time.time() - cached.checked_at < self.ttl_seconds
+            and cached.cookies_mtime == mtime
+        ):
+            return cached
+
+        started = time.perf_counter()
+        try:
+            result = self._check(platform)
+        except Exception as e:
+            result = SessionCheck(platform, True, "none", f"Preflight error: {e}")
+        result.cookies_mtime = mtime
+        with self._lock:
+            self._cache[platform] = result
+        logger.info(
+            f"[PREFLIGHT] {platform}: {'valid' if result.valid else 'needs sign-in'} via {result.method} "
+            f"({result.reason}) in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return result
+
+    def check_many(self, platforms: List[str]) -> Dict[str, SessionCheck]:
+        """Check several platforms at once"""
+        if len(platforms) <= 1:
+            return {platform: self.check(platform) for platform in platforms}
+        with ThreadPoolExecutor(max_workers=len(platforms), thread_name_prefix="preflight") as executor:
+            return dict(zip(platforms, executor.map(self.check, platforms)))
+
+    def invalidate(self, platform: Optional[str] = None):
+        """Forget cached results (after a sign-in)"""
+        with self._lock:
+            if platform is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(platform, None)
+
+    # ==================== CHECKS ====================
+
+    def _check(self, platform: str) -> SessionCheck:
+        from app.services.browser_allocator import profile_dir
+
+        profile = profile_dir(platform)
+        if not (profile / "Default").is_dir():
+            return SessionCheck(platform, False, "profile", "Never signed in (no browser profile)")
+
+        cookies, source = self._session_cookies(platform, profile)
+        if cookies:
+            now = datetime.now(timezone.utc)
+            # Session cookies without an expiry die with the browser; they say nothing once it's closed
+            persistent = [expires for _, expires in cookies if expires is not None]
+            live = [expires for expires in persistent if expires > now]
+            if live:
+                return SessionCheck(platform, True, "cookies", f"Session cookie valid ({source})", expires_at=max(live))
+            if persistent:
+                return SessionCheck(
+                    platform, False, "cookies", f"Session cookies expired ({source})", expires_at=max(persistent)
+                )
+
+        if self.fetch:
+            fetched = self._check_fetch(platform)
+            if fetched is not None:
+                return fetched
+        return SessionCheck(platform, True, "none", "Inconclusive; leaving it to the agent")
+
+    def _session_cookies(self, platform: str, profile: Path) -> Tuple[List[Tuple[str, Optional[datetime]]], str]:
+        """[(name, expiry or None)] of the platform's session cookies, and where they came from"""
+        names = set(PLATFORM_CONFIGS[platform].get("session_cookies") or ())
+        if not names:
+            return [], "none"
+        domain = self._domain(platform)
+
+        for relative in COOKIE_DB_PATHS:
+            path = profile / relative
+            if not path.exists():
+                continue
+            try:
+                # immutable: never takes locks, so a running browser is not disturbed
+                conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, timeout=1)
+                try:
+                    rows = conn.execute(
+                        "SELECT name, expires_utc, has_expires FROM cookies WHERE host_key LIKE ?",
+                        (f"%{domain}",)
+                    ).fetchall()
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                logger.debug(f"[PREFLIGHT] Could not read {path}: {e}")
+                continue
+            return [
+                (name, CHROME_EPOCH + timedelta(microseconds=expires) if has_expires and expires else None)
+                for name, expires, has_expires in rows
+                if name in names
+            ], "cookie DB"
+
+        state = self._storage_state(platform)
+        if state is not None:
+            return [
+                (cookie["name"], datetime.fromtimestamp(cookie["expires"], timezone.utc) if cookie.get("expires", -1) > 0 else None)
+                for cookie in state.get("cookies", [])
+                if cookie.get("name") in names and cookie.get("domain", "").endswith(domain)
+            ], "storage state"
+        return [], "none"
+
+    def _check_fetch(self, platform: str) -> Optional[SessionCheck]:
+        """One cart page request with the stored cookies; None if it can't tell"""
+        import httpx
+
+        state = self._storage_state(platform)
+        if state is None:
+            return None
+        domain = self._domain(platform)
+        cookies = {c["name"]: c["value"] for c in state.get("cookies", []) if c.get("domain", "").endswith(domain)}
+        config = PLATFORM_CONFIGS[platform]
+        try:
+            with httpx.Client(follow_redirects=False, timeout=self.timeout, headers={"User-Agent": "Mozilla/5.0"}) as client:
+                response = client.get(config["cart_url"], cookies=cookies)
+        except httpx.HTTPError as e:
+            logger.debug(f"[PREFLIGHT] {platform} fetch failed: {e}")
+            return None
+
+        if response.is_redirect:
+            location = urljoin(config["cart_url"], response.headers.get("location", ""))
+            if any(marker in urlsplit(location).path.lower() for marker in LOGIN_URL_MARKERS):
+                return SessionCheck(platform, False, "fetch", f"Cart page redirects to {urlsplit(location).path}")
+            return None
+        if response.status_code == 401:
+            return SessionCheck(platform, False, "fetch", "Cart page answered 401")
+        if response.status_code == 200:
+            return SessionCheck(platform, True, "fetch", "Cart page loads with the stored cookies")
+        return None  # 403 and friends are usually bot protection, not the session
+
+    # ==================== HELPERS ====================
+
+    @staticmethod
+    def _domain(platform: str) -> str:
+        host = urlsplit(PLATFORM_CONFIGS[platform]["home_url"]).hostname or ""
+        return host[4:] if host.startswith("www.") else host
+
+    @staticmethod
+    def _storage_state(platform: str) -> Optional[Dict]:
+        from app.services.profile_snapshots import profile_snapshots
+
+        path = profile_snapshots.storage_state_path(platform)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _cookies_mtime(platform: str) -> float:
+        from app.services.browser_allocator import profile_dir
+
+        profile = profile_dir(platform)
+        for relative in COOKIE_DB_PATHS:
+            try:
+                return (profile / relative).stat().st_mtime
+            except OSError:
+                continue
+        return 0.0
+
+
+# Singleton
+session_preflight = SessionPreflight(
+    ttl_seconds=settings.session_preflight_ttl_seconds,
+    fetch=settings.session_preflight_fetch,
+    timeout=settings.session_preflight_timeout_seconds
+)
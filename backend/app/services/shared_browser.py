@@ -0,0 +1,251 @@
+"""
+Shared Browser
+One Chromium process per worker for agent_execution_mode = "shared": every
+platform agent attaches to it over CDP with its own NovaAct and works in its
+own tab, instead of launching a full browser per agent.
+
+The browser runs on a throwaway user_data_dir under runtime/shared_browser/.
+Before a platform's first tab opens, the browser is seeded with that
+platform's stored session (cookies and localStorage exported from its
+profile snapshot, see ProfileSnapshotService.export_storage_state). Cookies and storage
+are scoped to each site's origin, so Instacart, Uber Eats and DoorDash tabs
+keep separate sessions in the one context.
+
+The popup observer is installed once on the shared context. Request
+blocking is set up per tab, on the attaching NovaAct's connection: tracker
+domains in the browser over CDP, and opt-in resource-type routes on the tab
+only, since a context-wide route would send every tab's requests through
+handlers on threads that may be idle.
+
+Playwright objects of the browser itself live on one owner thread; each
+NovaAct belongs to the thread that attached it, as usual.
+"""
+import json
+import logging
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from app.config import settings
+from app.services.browser_allocator import browser_allocator
+from app.services.browser_profile import browser_profile, install_popup_dismissal, install_request_blocking, nova_options
+from app.services.profile_snapshots import profile_snapshots
+from config.platforms import PLATFORM_CONFIGS
+
+logger = logging.getLogger(__name__)
+
+# Restores one origin's localStorage from the seeded state on first visit
+LOCAL_STORAGE_SCRIPT = """
+(() => {
+    const items = (%s)[location.origin];
+    if (!items) return;
+    try {
+        for (const [name, value] of items) {
+            if (localStorage.getItem(name) === null) localStorage.setItem(name, value);
+        }
+    } catch (e) {}
+})();
+"""
+
+
+class _ContextHandle:
+    """Adapter so install_popup_dismissal can target the shared context"""
+
+    def __init__(self, context):
+        self.page = context.pages[0] if context.pages else context.new_page()
+
+
+class SharedBrowser:
+    """A single Chromium per worker process that platform agents attach to as tabs"""
+
+    def __init__(self, runtime_dir: Path):
+        self.runtime_dir = runtime_dir
+        self._lock = threading.Lock()
+        self._owner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-browser")
+        self._playwright = None
+        self._context = None
+        self._closed = True
+        self._user_data_dir: Optional[Path] = None
+        self.lease = None
+        self._seeded: Dict[str, float] = {}  # platform -> mtime of the state it was seeded with
+        self.attached = 0
+        self.starts = 0
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.lease.port}"
+
+    # ==================== ATTACH ====================
+
+    def attach(self, platform: str, **nova_kwargs):
+        """
+        Start a NovaAct in a new tab of the shared browser, with the platform's
+        stored session. The calling thread owns the NovaAct; stop it with detach().
+        """
+        from nova_act import NovaAct
+
+        with self._lock:
+            self._ensure_started()
+            self._owner.submit(self._seed, platform).result()
+
+        # Headless and the rest of the launch options belong to the shared browser
+        profile = browser_profile(platform)
+        options = {k: v for k, v in nova_options(profile).items() if k != "headless"}
+        kwargs = {
+            **options,
+            "starting_page": PLATFORM_CONFIGS[platform]["home_url"],
+            "cdp_endpoint_url": self.endpoint,
+            **nova_kwargs
+        }
+        nova = NovaAct(**kwargs)
+        nova.start()
+        install_request_blocking(nova, profile, label=f"{platform} tab", page_only=True)
+        with self._lock:
+            self.attached += 1
+        logger.info(f"[SHARED BROWSER] {platform} attached ({self.attached} tabs)")
+        return nova
+
+    def detach(self, nova):
+        """Close the NovaAct's tab and disconnect it; the browser keeps running"""
+        try:
+            nova.page.close()
+        except Exception:
+            pass
+        try:
+            nova.stop()
+        finally:
+            with self._lock:
+                self.attached -= 1
+
+    def run(self, platform: str, fn: Callable, *args):
+        """Run fn(nova, *args) on a tab attached for the duration of the call (calling thread)"""
+        nova = self.attach(platform)
+        try:
+            return fn(nova, *args)
+        finally:
+            self.detach(nova)
+
+    # ==================== BROWSER ====================
+
+    def _ensure_started(self):
+        if not self._closed and self._owner.submit(self._alive).result():
+            return
+        self._owner.submit(self._launch).result()
+
+    def _alive(self) -> bool:
+        try:
+            self._context.cookies("about:blank")
+            return True
+        except Exception:
+            logger.warning("[SHARED BROWSER] Browser is gone, starting a new one")
+            return False
+
+    def _launch(self):
+        from playwright.sync_api import sync_playwright
+
+        self._stop_browser()
+        self._user_data_dir = self.runtime_dir / f"browser-{time.time_ns()}"
+        self._user_data_dir.mkdir(parents=True, exist_ok=True)
+        self.lease = browser_allocator.lease()
+        profile = browser_profile(None)
+        try:
+            self._playwright = sync_playwright().start()
+            self._context = self._playwright.chromium.launch_persistent_context(
+                str(self._user_data_dir),
+                headless=bool(profile.get("headless", False)),
+                args=[self.lease.browser_args]
+            )
+        except Exception:
+            self._stop_browser()
+            raise
+        self._closed = False
+        self._seeded.clear()
+        self.starts += 1
+
+        install_popup_dismissal(_ContextHandle(self._context), profile, label="shared browser")
+        logger.info(f"[SHARED BROWSER] Started on port {self.lease.port}")
+
+    def _seed(self, platform: str):
+        """Load the platform's stored cookies and localStorage into the shared context (owner thread)"""
+        path = profile_snapshots.storage_state_path(platform)
+        try:
+            if not path.exists() or self._stale(platform, path):
+                profile_snapshots.export_storage_state(self._playwright, platform)
+        except Exception as e:
+            logger.warning(f"[SHARED BROWSER] Could not export {platform} session state: {e}")
+        if not path.exists():
+            logger.warning(f"[SHARED BROWSER] No stored {platform} session; its tab starts signed out")
+            return
+
+        mtime = path.stat().st_mtime
+        if self._seeded.get(platform) == mtime:
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("cookies"):
+            self._context.add_cookies(state["cookies"])
+        origins = {
+            origin["origin"]: [[item["name"], item["value"]] for item in origin.get("localStorage", [])]
+            for origin in state.get("origins", [])
+        }
+        if origins:
+            self._context.add_init_script(LOCAL_STORAGE_SCRIPT % json.dumps(origins))
+        self._seeded[platform] = mtime
+        logger.info(f"[SHARED BROWSER] Seeded {platform} session ({len(state.get('cookies', []))} cookies, {len(origins)} origins)")
+
+    @staticmethod
+    def _stale(platform: str, path: Path) -> bool:
+        """True if the profile has a newer snapshot than the exported state"""
+        latest = profile_snapshots.latest_snapshot(platform)
+        return latest is not None and int(latest.name) / 1e9 > path.stat().st_mtime
+
+    # ==================== MEMORY ====================
+
+    def pids(self) -> List[int]:
+        """Process ids of the browser (main process and its children)"""
+        if self._closed or self._user_data_dir is None:
+            return []
+        import psutil
+
+        marker = f"--user-data-dir={self._user_data_dir}"
+        for process in psutil.Process().children(recursive=True):
+            try:
+                if marker in process.cmdline() and not any(a.startswith("--type=") for a in process.cmdline()):
+                    return [process.pid] + [child.pid for child in process.children(recursive=True)]
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return []
+
+    def stats(self) -> Dict:
+        return {"running": not self._closed, "tabs": self.attached, "starts": self.starts}
+
+    # ==================== SHUTDOWN ====================
+
+    def _stop_browser(self):
+        try:
+            if self._context is not None:
+                self._context.close()
+        except Exception as e:
+            logger.warning(f"[SHARED BROWSER] Error closing browser: {e}")
+        try:
+            if self._playwright is not None:
+                self._playwright.stop()
+        except Exception:
+            pass
+        if self.lease is not None:
+            self.lease.release()
+        if self._user_data_dir is not None:
+            shutil.rmtree(self._user_data_dir, ignore_errors=True)
+        self._context = self._playwright = self.lease = self._user_data_dir = None
+        self._closed = True
+
+    def shutdown(self):
+        with self._lock:
+            self._owner.submit(self._stop_browser).result()
+        self._owner.shutdown(wait=False)
+
+
+# Singleton
+shared_browser = SharedBrowser(runtime_dir=settings.runtime_dir / "shared_browser")
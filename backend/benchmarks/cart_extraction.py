@@ -0,0 +1,98 @@
+"""
+Cart extraction benchmark.
+
+Replays recorded Nova Act cart responses (benchmarks/data/cart_responses.json)
+through app.agents.cart_extraction and the legacy single-regex parser, and
+reports parse rate (responses whose items all came back), item recall and
+parse time.
+
+Usage (from backend/):
+    python -m benchmarks.cart_extraction [--iterations 1000]
+
+Add a corpus entry whenever a real response fails to parse: `response` is the
+raw act text, `parsed_response` the schema-validated value if there was one.
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from app.agents.cart_extraction import parse_cart_response
+
+CORPUS_PATH = Path(__file__).parent / "data" / "cart_responses.json"
+
+_LEGACY_LINE = re.compile(r'(.+?)\s*\|\s*Qty:\s*(\d+)\s*\|\s*Price:\s*\$?([\d.]+)\s*\|\s*Size:\s*(.+)', re.IGNORECASE)
+
+
+def legacy_parse(response) -> list:
+    """The pre-JSON search-and-add parser, kept as the baseline"""
+    return [m.group(1).strip() for m in map(_LEGACY_LINE.search, response.response.split("\n")) if m]
+
+
+def structured_parse(response) -> list:
+    return [item.name for item in parse_cart_response(response).items]
+
+
+def _as_act_result(entry: dict):
+    """Shape a corpus entry like a Nova Act ActResult"""
+    parsed = entry.get("parsed_response")
+    return SimpleNamespace(response=entry.get("response", ""), parsed_response=parsed, matches_schema=parsed is not None)
+
+
+def _matches(expected: str, names: list) -> bool:
+    expected = expected.lower()
+    return any(expected in name.lower() for name in names)
+
+
+def run(parser, corpus: list, iterations: int) -> dict:
+    responses = [_as_act_result(entry) for entry in corpus]
+    parsed_ok = 0
+    expected_total = 0
+    recalled = 0
+    failures = []
+
+    for entry, response in zip(corpus, responses):
+        names = parser(response)
+        expected = entry["expected_items"]
+        hits = sum(1 for name in expected if _matches(name, names))
+        expected_total += len(expected)
+        recalled += hits
+        if hits == len(expected) and len(names) == len(expected):
+            parsed_ok += 1
+        else:
+            failures.append(entry["name"])
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for response in responses:
+            parser(response)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "parse_rate": parsed_ok / len(corpus),
+        "item_recall": recalled / expected_total if expected_total else 1.0,
+        "us_per_response": elapsed / (iterations * len(corpus)) * 1e6,
+        "failures": failures
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--iterations", type=int, default=1000)
+    args = arg_parser.parse_args()
+
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    print(f"{len(corpus)} recorded responses, {args.iterations} iterations\n")
+    print(f"{'parser':<12} {'parse rate':>10} {'item recall':>12} {'µs/response':>12}")
+    for name, parser in (("legacy", legacy_parse), ("structured", structured_parse)):
+        result = run(parser, corpus, args.iterations)
+        print(f"{name:<12} {result['parse_rate']:>10.0%} {result['item_recall']:>12.0%} {result['us_per_response']:>12.1f}")
+        if result["failures"]:
+            print(f"  missed: {', '.join(result['failures'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,144 @@
 # config/platforms.py
 
+# Third-party analytics/ad hosts no agent needs; requests to them (and their subdomains) are aborted
+TRACKER_DOMAINS = [
+    "doubleclick.net", "googlesyndication.com", "google-analytics.com", "googletagmanager.com",
+    "googleadservices.com", "facebook.net", "connect.facebook.net", "bat.bing.com", "analytics.tiktok.com",
+    "segment.io", "segment.com", "amplitude.com", "hotjar.com", "fullstory.com", "optimizely.com",
+    "branch.io", "braze.com", "criteo.com", "adsrvr.org", "js-agent.newrelic.com", "quantserve.com",
+]
+
+# Browser settings applied to every agent's browser; platforms override keys under "browser"
+DEFAULT_BROWSER_PROFILE = {
+    "headless": False,  # Visible for demo/debugging; BROWSER_HEADLESS overrides for workers
+    "viewport": {"width": 1600, "height": 900},
+    # Playwright resource types to abort (image, media, font, stylesheet, ...). Off by
+    # default: Nova Act picks products from screenshots and needs images and icon
+    # fonts, and type blocking runs a Python route handler for every request.
+    "blocked_resource_types": [],
+    "blocked_domains": TRACKER_DOMAINS,  # Blocked inside the browser (CDP), no Python callback
+    "auto_dismiss_popups": True,  # Close modals as they appear (utils/popup_handler.py)
+}
+
+# CSS selectors for the scripted Playwright flows (app/agents/scripted_flows.py).
+# Any step whose selector is missing or doesn't match falls back to Nova Act,
+# so a site redesign costs speed, not correctness. Comma-separated lists match
+# any of the alternatives.
+SELECTOR_KEYS = (
+    "search_input",        # Store search box; Enter submits
+    "product_card",        # One search result
+    "product_name",        # Name inside a product card
+    "add_button",          # Add-to-cart button inside a product card / on a product page
+    "increment_button",    # "+" stepper shown once the product is in the cart
+    "cart_count",          # Header badge with the number of items in the cart
+    "cart_item",           # One cart line on the cart page
+    "cart_item_name",
+    "cart_item_price",
+    "cart_item_quantity",  # Text or <select>/<input> value
+    "cart_item_size",
+    "cart_item_remove",    # Remove button inside a cart line
+    "cart_subtotal",
+    "cart_empty",          # Shown when the cart has no items
+)
+
 PLATFORM_CONFIGS = {
     "instacart": {
         "name": "Instacart",
+        "home_url": "https://www.instacart.com",
         "merchant_id": 40,  # Knot API merchant ID
         "search_url": "https://www.instacart.com/store/s?k={}",  # Correct: uses k= not q=
         "cart_url": "https://www.instacart.com/store/cart",
         "login_url": "https://www.instacart.com/login",
         "user_data_dir": "./user_data_instacart",
+        # Login cookies checked by the session preflight (app/services/session_preflight.py);
+        # if none are found the preflight falls back to fetching the cart page
+        "session_cookies": ["remember_user_token", "_instacart_session_id"],
+        "store_name": "Stop & shop",  # Store the search-and-add agent picks
+        "cart_file": "instacart_cart_details.json",  # Written by the agent into cart_jsons/
+        "max_parallel_item_tasks": 3,  # Browsers used for per-item tasks
+        "browser": {**DEFAULT_BROWSER_PROFILE},
+        "selectors": {
+            "search_input": "input#search-bar-input, input[aria-label*='Search' i]",
+            "product_card": "[data-testid='item-card'], li[data-testid*='item_list_item']",
+            "product_name": "[data-testid='item-card-name'], h2, h3",
+            "add_button": "button[aria-label^='Add' i], button:has-text('Add')",
+            "increment_button": "button[aria-label*='Increment' i], button[aria-label*='Increase' i]",
+            "cart_count": "[data-testid='cart-button-count'], button[aria-label*='cart' i] span",
+            "cart_item": "[data-testid='cart-item'], li[data-testid*='cart_item']",
+            "cart_item_name": "[data-testid='cart-item-name'], h3, a[href*='/products/']",
+            "cart_item_price": "[data-testid='cart-item-price'], [class*='price' i]",
+            "cart_item_quantity": "select, [data-testid='cart-item-quantity']",
+            "cart_item_size": "[data-testid='cart-item-size'], [class*='size' i]",
+            "cart_item_remove": "button[aria-label^='Remove' i], button:has-text('Remove')",
+            "cart_subtotal": "[data-testid='cart-subtotal'], [class*='subtotal' i]",
+            "cart_empty": "text=/your cart is empty/i",
+        },
     },
     "ubereats": {
         "name": "Uber Eats",
+        "home_url": "https://www.ubereats.com",
         "merchant_id": 36,
         "search_url": "https://www.ubereats.com/search?q={}",
         "cart_url": "https://www.ubereats.com/cart",
         "login_url": "https://www.ubereats.com/login",
         "user_data_dir": "./user_data_ubereats",
+        "session_cookies": ["sid", "jwt-session"],
+        "store_name": "Target",
+        "cart_file": "uber_cart_details.json",
+        "max_parallel_item_tasks": 2,
+        "browser": {**DEFAULT_BROWSER_PROFILE},
+        "selectors": {
+            "search_input": "input[data-testid='search-input'], input[aria-label*='Search' i]",
+            "product_card": "[data-testid='store-item-thumbnail'], li[data-testid*='store-item']",
+            "product_name": "[data-testid='rich-text'], span[data-testid*='item-title'], h3",
+            "add_button": "button[aria-label*='Add' i], button[data-testid='quick-add-button']",
+            "increment_button": "button[aria-label*='Increase' i], button[aria-label*='Increment' i]",
+            "cart_count": "[data-testid='view-carts-badge'], [data-testid='cart-badge']",
+            "cart_item": "[data-testid='cart-item'], li[data-testid*='cart-item']",
+            "cart_item_name": "[data-testid='cart-item-title'], [data-testid='rich-text'], h3",
+            "cart_item_price": "[data-testid='cart-item-price'], [class*='price' i]",
+            "cart_item_quantity": "select, [data-testid='quantity-selector']",
+            "cart_item_size": "[data-testid='cart-item-subtitle']",
+            "cart_item_remove": "button[aria-label^='Remove' i], button:has-text('Remove')",
+            "cart_subtotal": "[data-testid='subtotal'], [class*='subtotal' i]",
+            "cart_empty": "text=/cart is empty|add items to start a cart/i",
+        },
     },
     "doordash": {
         "name": "DoorDash",
+        "home_url": "https://www.doordash.com",
         "merchant_id": 19,
         "search_url": "https://www.doordash.com/store/search/?query={}",
         "cart_url": "https://www.doordash.com/cart/",
         "login_url": "https://www.doordash.com/consumer/login",
         "user_data_dir": "./user_data_doordash",
+        "session_cookies": ["ddweb_token", "dd_session_id"],
+        "store_name": None,
+        "cart_file": "doordash_cart_details.json",
+        "max_parallel_item_tasks": 2,
+        "browser": {**DEFAULT_BROWSER_PROFILE},
+        "selectors": {
+            "search_input": "input[data-anchor-id='StoreSearchInput'], input[aria-label*='Search' i]",
+            "product_card": "[data-anchor-id='MenuItem'], [data-testid='GenericItemCard']",
+            "product_name": "[data-telemetry-id='storeMenuItem.title'], h3, span[data-testid*='ItemName']",
+            "add_button": "button[aria-label^='Add' i], button[data-testid='quick-add-button']",
+            "increment_button": "button[aria-label*='Increase' i], button[aria-label*='Increment' i]",
+            "cart_count": "[data-testid='OrderCartIconButton'] span, [data-anchor-id='OrderCartIconButton'] span",
+            "cart_item": "[data-anchor-id='OrderCartItem'], [data-testid='OrderCartItem']",
+            "cart_item_name": "[data-testid='OrderCartItemName'], span[data-telemetry-id*='itemName'], h3",
+            "cart_item_price": "[data-testid='OrderCartItemPrice'], [class*='price' i]",
+            "cart_item_quantity": "select, [data-testid='OrderCartItemQuantity']",
+            "cart_item_size": "[data-testid='OrderCartItemOptions']",
+            "cart_item_remove": "button[aria-label^='Remove' i], button:has-text('Remove')",
+            "cart_subtotal": "[data-testid='OrderCartSubtotal'], [class*='subtotal' i]",
+            "cart_empty": "text=/cart is empty|your cart is empty/i",
+        },
     },
 }
 
 # Global settings
 BROWSER_ARGS = ["--disable-blink-features=AutomationControlled"]
-HEADLESS = False  # Always visible for demo/debugging
+HEADLESS = DEFAULT_BROWSER_PROFILE["headless"]
 MAX_RETRIES = 3
 PARALLEL_EXECUTION = True
 
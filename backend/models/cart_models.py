@@ -1,10 +1,13 @@
 # models/cart_models.py
 
 from dataclasses import dataclass, field, asdict
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from enum import Enum
 import json
+import os
+import threading
+import uuid
 
 class ItemStatus(Enum):
     """Status of an item in cart"""
@@ -13,7 +16,7 @@ class ItemStatus(Enum):
     FAILED = "failed"
     OUT_OF_STOCK = "out_of_stock"
 
-@dataclass
+@dataclass(slots=True)
 class CartItem:
     """
     Single item in a platform's cart
@@ -28,6 +31,7 @@ class CartItem:
         sku: Product SKU for Knot API integration (optional)
         status: Current status of this item
         timestamp: When this item was added
+        confidence: How reliably the item was extracted from the platform (0-1)
     """
     ingredient_requested: str
     product_name: str
@@ -38,6 +42,7 @@ class CartItem:
     sku: Optional[str] = None
     status: ItemStatus = ItemStatus.ADDED
     timestamp: datetime = field(default_factory=datetime.now)
+    confidence: float = 1.0
     
     def to_dict(self) -> dict:
         """Convert to JSON-serializable dict"""
@@ -53,7 +58,10 @@ class CartItem:
         data['timestamp'] = datetime.fromisoformat(data['timestamp'])
         return cls(**data)
 
-@dataclass
+def _line_total(item: CartItem) -> float:
+    return item.price * item.quantity if item.status == ItemStatus.ADDED else 0.0
+
+@dataclass(slots=True)
 class PlatformCart:
     """
     Complete cart state for one delivery platform
@@ -81,20 +89,38 @@ class PlatformCart:
     timestamp: datetime = field(default_factory=datetime.now)
     session_valid: bool = True
     
+    def __post_init__(self):
+        # Carts built with items=[...] start from their totals; stored totals
+        # (e.g. one read off the platform in from_dict) are kept
+        if self.items and not self.subtotal:
+            self.subtotal = sum(_line_total(item) for item in self.items)
+        if not self.total:
+            self._update_total()
+    
     def calculate_totals(self):
-        """Recalculate subtotal and total from items"""
-        self.subtotal = sum(item.price * item.quantity for item in self.items if item.status == ItemStatus.ADDED)
+        """Recalculate subtotal and total from items (after editing items directly)"""
+        self.subtotal = sum(_line_total(item) for item in self.items)
+        self._update_total()
+    
+    def _update_total(self):
         self.total = self.subtotal + self.delivery_fee + self.service_fee + self.tax
     
     def add_item(self, item: CartItem):
-        """Add item and recalculate totals"""
+        """Add item and update the running totals"""
         self.items.append(item)
-        self.calculate_totals()
+        self.subtotal += _line_total(item)
+        self._update_total()
     
     def remove_item(self, ingredient_requested: str):
         """Remove item by ingredient name"""
-        self.items = [item for item in self.items if item.ingredient_requested != ingredient_requested]
-        self.calculate_totals()
+        kept = []
+        for item in self.items:
+            if item.ingredient_requested == ingredient_requested:
+                self.subtotal -= _line_total(item)
+            else:
+                kept.append(item)
+        self.items = kept
+        self._update_total()
     
     def to_dict(self) -> dict:
         """Convert to JSON-serializable dict"""
@@ -118,7 +144,7 @@ class PlatformCart:
         data['timestamp'] = datetime.fromisoformat(data['timestamp'])
         return cls(**data)
 
-@dataclass
+@dataclass(slots=True)
 class CartDiff:
     """
     Record of user edit to a platform cart
@@ -132,16 +158,19 @@ class CartDiff:
         item: The CartItem being modified
         timestamp: When this change was made
         applied: Whether this diff has been applied to actual cart
+        diff_id: Stable identifier used by the CartState journal
     """
     platform: str
     action: str  # "add", "remove", "update_quantity"
     item: CartItem
     timestamp: datetime = field(default_factory=datetime.now)
     applied: bool = False
+    diff_id: str = field(default_factory=lambda: uuid.uuid4().hex)
     
     def to_dict(self) -> dict:
         """Convert to JSON-serializable dict"""
         return {
+            "diff_id": self.diff_id,
             "platform": self.platform,
             "action": self.action,
             "item": self.item.to_dict(),
@@ -156,6 +185,136 @@ class CartDiff:
         data['timestamp'] = datetime.fromisoformat(data['timestamp'])
         return cls(**data)
 
+@dataclass(slots=True)
+class NetChange:
+    """
+    One cart operation left after folding a platform's pending diffs
+    
+    Attributes:
+        platform: Platform name
+        action: "add" (quantity more units), "remove" (the whole line) or
+            "update_quantity" (set the line to quantity units)
+        item: Item to change; item.quantity is the units to add or the target quantity
+        diffs: The pending diffs this change stands for
+    """
+    platform: str
+    action: str
+    item: CartItem
+    diffs: List[CartDiff] = field(default_factory=list)
+    
+    @property
+    def quantity(self) -> int:
+        return self.item.quantity
+
+@dataclass(slots=True)
+class DiffResult:
+    """
+    Outcome of one CartDiff after compaction and application
+    
+    Attributes:
+        diff: The original diff
+        success: Whether its net change reached the platform cart (or it folded away)
+        net_action: The net change it was folded into, "noop" if it cancelled out
+        error: Why it failed, if it did
+    """
+    diff: CartDiff
+    success: bool
+    net_action: str
+    error: Optional[str] = None
+    
+    def to_dict(self) -> dict:
+        return {
+            "diff": self.diff.to_dict(),
+            "success": self.success,
+            "net_action": self.net_action,
+            "error": self.error
+        }
+
+def item_key(product_name: str) -> str:
+    """Case/whitespace-insensitive product identity used to fold diffs"""
+    return " ".join(product_name.lower().split())
+
+def compact_diffs(diffs: List[CartDiff], cart: Optional[PlatformCart] = None) -> Tuple[List[NetChange], List[CartDiff]]:
+    """
+    Fold diffs (in timestamp order) into the minimal net change per product
+    
+    Each product's quantity is replayed from its quantity in `cart`: add
+    increases it, remove sets it to 0, update_quantity sets it. A product not
+    in `cart` counts as present (with the diff's quantity) if its first diff
+    is a remove or update, since those are made from cart lines; otherwise
+    as absent. The net change is then:
+    
+        unchanged          -> nothing (e.g. add then remove of a new item)
+        0 units            -> remove
+        absent before      -> add the final quantity
+        only adds          -> add the difference
+        anything else      -> update_quantity to the final quantity
+    
+    Returns:
+        (net changes, diffs that folded away to nothing)
+    """
+    groups: Dict[str, List[CartDiff]] = {}
+    for diff in sorted(diffs, key=lambda d: d.timestamp or datetime.min):
+        groups.setdefault(item_key(diff.item.product_name), []).append(diff)
+    
+    baseline_items = {}
+    if cart is not None:
+        for item in cart.items:
+            if item.status == ItemStatus.ADDED:
+                baseline_items[item_key(item.product_name)] = item
+    
+    changes: List[NetChange] = []
+    cancelled: List[CartDiff] = []
+    for key, group in groups.items():
+        existing = baseline_items.get(key)
+        if existing is not None:
+            baseline = existing.quantity
+        elif group[0].action in ("remove", "update_quantity"):
+            baseline = max(1, group[0].item.quantity) if group[0].action == "remove" else None
+        else:
+            baseline = 0
+        
+        quantity = baseline
+        only_adds = True
+        for diff in group:
+            if diff.action == "add":
+                quantity = (quantity or 0) + max(1, diff.item.quantity)
+            elif diff.action == "remove":
+                quantity = 0
+                only_adds = False
+            elif diff.action == "update_quantity":
+                quantity = diff.item.quantity
+                only_adds = False
+        
+        if quantity == baseline:
+            cancelled.extend(group)
+            continue
+        
+        latest = group[-1].item
+        template = existing or latest
+        if quantity <= 0:
+            action, units = "remove", template.quantity
+        elif not baseline:
+            action, units = ("add", quantity) if baseline == 0 else ("update_quantity", quantity)
+        elif only_adds:
+            action, units = "add", quantity - baseline
+        else:
+            action, units = "update_quantity", quantity
+        
+        item = CartItem(
+            ingredient_requested=latest.ingredient_requested or template.ingredient_requested,
+            product_name=template.product_name,
+            product_url=latest.product_url or template.product_url,
+            price=latest.price,
+            quantity=units,
+            image_url=latest.image_url,
+            sku=latest.sku or template.sku,
+            status=latest.status
+        )
+        changes.append(NetChange(platform=group[0].platform, action=action, item=item, diffs=group))
+    
+    return changes, cancelled
+
 class CartState:
     """
     Global cart state manager
@@ -163,47 +322,109 @@ class CartState:
     Manages all platform carts and tracks diffs for user edits.
     Provides persistence to JSON file.
     
+    Persistence is a snapshot (filepath) plus an append-only journal
+    (filepath + ".journal", one JSON record per line). Once a state is bound
+    to a file (save_to_file / load_from_file), every recorded diff, applied
+    mark, cart replacement and ingredient list is appended to the journal
+    instead of rewriting the state; after `snapshot_every` records the
+    journal is folded into a new snapshot. Snapshots are written to a
+    temporary file and renamed into place, so a crash never leaves a
+    half-written state. Edits made directly on a PlatformCart's items are
+    only persisted by the next snapshot.
+    
+    Pending diffs are indexed per platform, so get_pending_diffs and
+    mark_diffs_applied don't scan the whole diff history.
+    
     Usage:
         state = CartState()
         state.add_platform_cart(instacart_cart)
         state.record_diff("instacart", "remove", milk_item)
         state.save_to_file()
     """
-    def __init__(self):
+    def __init__(self, snapshot_every: int = 500):
         self.platform_carts: Dict[str, PlatformCart] = {}
         self.diffs: List[CartDiff] = []
         self.ingredients_requested: List[str] = []
+        self.snapshot_every = snapshot_every
+        self._pending: Dict[str, Dict[str, CartDiff]] = {}  # platform -> diff_id -> diff, in record order
+        self._filepath: Optional[str] = None
+        self._journal_records = 0
+        self._lock = threading.RLock()
+    
+    # ==================== CARTS ====================
     
     def add_platform_cart(self, cart: PlatformCart):
         """Add or update a platform cart"""
-        self.platform_carts[cart.platform_name] = cart
+        with self._lock:
+            self.platform_carts[cart.platform_name] = cart
+            self._journal({"op": "cart", "cart": cart.to_dict()})
     
     def get_cart(self, platform_name: str) -> Optional[PlatformCart]:
         """Get cart for specific platform"""
         return self.platform_carts.get(platform_name)
     
-    def record_diff(self, platform: str, action: str, item: CartItem):
+    def set_ingredients_requested(self, ingredients: List[str]):
+        with self._lock:
+            self.ingredients_requested = list(ingredients)
+            self._journal({"op": "ingredients", "ingredients": self.ingredients_requested})
+    
+    # ==================== DIFFS ====================
+    
+    def record_diff(self, platform: str, action: str, item: CartItem) -> CartDiff:
         """Record user edit as a diff"""
         diff = CartDiff(platform=platform, action=action, item=item)
+        with self._lock:
+            self._add_diff(diff)
+            self._journal({"op": "diff", "diff": diff.to_dict()})
+        return diff
+    
+    def _add_diff(self, diff: CartDiff):
         self.diffs.append(diff)
+        if not diff.applied:
+            self._pending.setdefault(diff.platform, {})[diff.diff_id] = diff
     
     def get_pending_diffs(self, platform: str) -> List[CartDiff]:
         """Get unapplied diffs for a platform"""
-        return [d for d in self.diffs if d.platform == platform and not d.applied]
+        with self._lock:
+            pending = self._pending.get(platform, {})
+            # Diffs marked applied directly (e.g. by EditCartAgentNova) leave the index here
+            stale = [diff for diff in pending.values() if diff.applied]
+            if stale:
+                self._mark_applied_locked(platform, stale)
+            return list(pending.values())
+    
+    def compact_pending_diffs(self, platform: str) -> Tuple[List[NetChange], List[CartDiff]]:
+        """Fold a platform's unapplied diffs into net changes against its known cart"""
+        return compact_diffs(self.get_pending_diffs(platform), self.get_cart(platform))
     
-    def mark_diffs_applied(self, platform: str):
-        """Mark all diffs for platform as applied"""
-        for diff in self.diffs:
-            if diff.platform == platform:
-                diff.applied = True
+    def mark_diffs_applied(self, platform: str, diffs: Optional[List[CartDiff]] = None):
+        """Mark diffs for platform as applied (all pending ones, or just `diffs`)"""
+        with self._lock:
+            targets = list(self._pending.get(platform, {}).values()) if diffs is None else diffs
+            self._mark_applied_locked(platform, targets)
+    
+    def _mark_applied_locked(self, platform: str, diffs: List[CartDiff]):
+        pending = self._pending.get(platform, {})
+        ids = []
+        for diff in diffs:
+            diff.applied = True
+            if pending.pop(diff.diff_id, None) is not None:
+                ids.append(diff.diff_id)
+        if ids:
+            self._journal({"op": "applied", "platform": platform, "diff_ids": ids})
     
     def get_total_across_platforms(self) -> float:
         """Calculate total cost across all platforms"""
         return sum(cart.total for cart in self.platform_carts.values())
     
-    def save_to_file(self, filepath: str = "data/cart_state.json"):
-        """Persist entire state to JSON file"""
-        data = {
+    # ==================== PERSISTENCE ====================
+    
+    @staticmethod
+    def journal_path(filepath: str) -> str:
+        return filepath + ".journal"
+    
+    def to_dict(self) -> dict:
+        return {
             "platform_carts": {
                 name: cart.to_dict() 
                 for name, cart in self.platform_carts.items()
@@ -212,29 +433,104 @@ class CartState:
             "ingredients_requested": self.ingredients_requested,
             "saved_at": datetime.now().isoformat()
         }
-        
-        import os
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
+    
+    def save_to_file(self, filepath: str = "data/cart_state.json", journal: bool = True):
+        """
+        Write a snapshot of the entire state atomically and start a new
+        journal; later changes are appended to the journal (journal=False:
+        leave the state unbound, e.g. when a store batches snapshots)
+        """
+        with self._lock:
+            directory = os.path.dirname(filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_path = f"{filepath}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.to_dict(), f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
+            
+            # The snapshot now covers everything journaled so far
+            journal_file = self.journal_path(filepath)
+            if os.path.exists(journal_file):
+                os.remove(journal_file)
+            self._filepath = filepath if journal else None
+            self._journal_records = 0
+    
+    def _journal(self, record: dict):
+        """Append one change to the journal (no-op until bound to a file)"""
+        if self._filepath is None:
+            return
+        with open(self.journal_path(self._filepath), 'a') as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._journal_records += 1
+        if self._journal_records >= self.snapshot_every:
+            self.save_to_file(self._filepath)
+    
+    def _apply_record(self, record: dict):
+        op = record.get("op")
+        if op == "diff":
+            self._add_diff(CartDiff.from_dict(record["diff"]))
+        elif op == "applied":
+            pending = self._pending.get(record["platform"], {})
+            for diff_id in record["diff_ids"]:
+                diff = pending.pop(diff_id, None)
+                if diff is not None:
+                    diff.applied = True
+        elif op == "cart":
+            cart = PlatformCart.from_dict(record["cart"])
+            self.platform_carts[cart.platform_name] = cart
+        elif op == "ingredients":
+            self.ingredients_requested = record["ingredients"]
     
     @classmethod
-    def load_from_file(cls, filepath: str = "data/cart_state.json"):
-        """Load state from JSON file"""
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-        
+    def load_from_file(cls, filepath: str = "data/cart_state.json", journal: bool = True):
+        """Load the snapshot, replay the journal on top, and keep journaling to it (unless journal=False)"""
         state = cls()
-        state.ingredients_requested = data.get('ingredients_requested', [])
         
-        # Reconstruct platform carts
-        for name, cart_data in data.get('platform_carts', {}).items():
-            state.platform_carts[name] = PlatformCart.from_dict(cart_data)
+        if os.path.exists(filepath):
+            with open(filepath, 'r') as f:
+                data = json.load(f)
+            
+            state.ingredients_requested = data.get('ingredients_requested', [])
+            
+            # Reconstruct platform carts
+            for name, cart_data in data.get('platform_carts', {}).items():
+                state.platform_carts[name] = PlatformCart.from_dict(cart_data)
+            
+            # Reconstruct diffs
+            for diff_data in data.get('diffs', []):
+                state._add_diff(CartDiff.from_dict(diff_data))
         
-        # Reconstruct diffs
-        for diff_data in data.get('diffs', []):
-            state.diffs.append(CartDiff.from_dict(diff_data))
+        journal_file = cls.journal_path(filepath)
+        torn = False
+        if os.path.exists(journal_file):
+            with open(journal_file, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        torn = True  # Torn last line from a crash mid-append
+                        break
+                    state._apply_record(record)
+                    state._journal_records += 1
+        elif not os.path.exists(filepath):
+            raise FileNotFoundError(filepath)
         
+        state._filepath = filepath
+        if torn:
+            # Fold the readable records into a snapshot so new ones don't follow the torn line
+            state.save_to_file(filepath)
+        if not journal:
+            state._filepath = None
         return state
-
+    
+    @property
+    def weight(self) -> int:
+        """Rough in-memory size: one per state, cart item and diff"""
+        return 1 + len(self.diffs) + sum(len(cart.items) for cart in self.platform_carts.values())
@@ -1,4 +1,24 @@
 # utils/popup_handler.py
+"""
+Popup auto-dismisser
+
+Instead of polling the page for close buttons, an init script installs one
+MutationObserver per document. Whenever a modal/dialog container becomes
+visible, the observer clicks its close control (CLOSE_SELECTORS) in the same
+frame, or sends Escape if it has none, and records what it dismissed in
+window.__popupDismisser.log (mirrored to sessionStorage, so the report
+survives navigations within a site).
+
+Install it once per browser context (install_popup_dismisser) and every page
+and navigation gets the observer; agents never wait on popup handling, and
+can read back what was dismissed with dismissed_popups(). Both Playwright
+APIs are supported: the async functions below for async pages and the *_sync
+variants for NovaAct's sync page.
+"""
+
+import json
+import re
+from typing import Dict, List
 
 from playwright.async_api import Page
 
@@ -19,48 +39,145 @@ CLOSE_SELECTORS = [
     "button :text('×')",
 ]
 
-async def dismiss_popups(page: Page, attempts: int = 6) -> None:
+# Containers the observer treats as popups; close controls outside them are never clicked
+POPUP_CONTAINERS = (
+    "[role='dialog'], [role='alertdialog'], [aria-modal='true'], dialog[open], "
+    "[class*='modal' i], [class*='popup' i], [class*='popover' i], [class*='interstitial' i]"
+)
+
+_TEXT_SELECTOR = re.compile(r":(?:has-)?text\('(.+?)'\)")
+
+# Playwright text selectors become button labels; the rest are plain CSS the browser can match
+CLOSE_TEXTS = [m.group(1).lower() for s in CLOSE_SELECTORS for m in [_TEXT_SELECTOR.search(s)] if m]
+CSS_CLOSE_SELECTORS = [s for s in CLOSE_SELECTORS if not _TEXT_SELECTOR.search(s)]
+
+AUTO_DISMISS_SCRIPT = """
+(() => {
+    if (window.__popupDismisser) return;
+    const SELECTOR = %(selector)s;
+    const TEXTS = %(texts)s;
+    const CONTAINERS = %(containers)s;
+    // Kept in sessionStorage so the report survives same-site navigations
+    const KEY = "__popupDismisser";
+    let log = [];
+    try { log = JSON.parse(sessionStorage.getItem(KEY) || "[]"); } catch (e) {}
+    const save = () => { try { sessionStorage.setItem(KEY, JSON.stringify(log.slice(-100))); } catch (e) {} };
+    const handled = new WeakSet();
+    window.__popupDismisser = { log, save };
+
+    const visible = (el) => {
+        if (!el || el.closest("[aria-hidden='true']")) return false;
+        const rect = el.getBoundingClientRect();
+        const style = getComputedStyle(el);
+        return rect.width > 0 && rect.height > 0 && style.visibility !== "hidden" && style.display !== "none";
+    };
+    const label = (el) => (el.getAttribute("aria-label") || el.innerText || el.className || el.tagName).toString().trim().slice(0, 80);
+
+    const closeControl = (box) => {
+        for (const el of box.querySelectorAll(SELECTOR)) {
+            if (visible(el)) return { el, how: "selector" };
+        }
+        for (const el of box.querySelectorAll("button, [role='button']")) {
+            const text = (el.innerText || "").trim().toLowerCase();
+            if (visible(el) && TEXTS.includes(text)) return { el, how: "text" };
+        }
+        return null;
+    };
+
+    const sweep = () => {
+        for (const box of document.querySelectorAll(CONTAINERS)) {
+            if (handled.has(box) || !visible(box)) continue;
+            handled.add(box);
+            const control = closeControl(box);
+            const entry = { popup: label(box), url: location.href, at: Date.now() };
+            try {
+                if (control) {
+                    control.el.click();
+                    Object.assign(entry, { action: "click", how: control.how, control: label(control.el) });
+                } else {
+                    box.dispatchEvent(new KeyboardEvent("keydown", { key: "Escape", code: "Escape", keyCode: 27, bubbles: true }));
+                    entry.action = "escape";
+                }
+            } catch (e) {
+                entry.action = "error";
+                entry.error = String(e);
+            }
+            log.push(entry);
+            save();
+        }
+    };
+
+    let scheduled = false;
+    const schedule = () => {
+        if (scheduled) return;
+        scheduled = true;
+        requestAnimationFrame(() => { scheduled = false; sweep(); });
+    };
+
+    const start = () => {
+        new MutationObserver(schedule).observe(document.documentElement, {
+            childList: true, subtree: true, attributes: true,
+            attributeFilter: ["class", "style", "open", "aria-hidden", "aria-modal"]
+        });
+        sweep();
+    };
+    if (document.documentElement) start();
+    else document.addEventListener("DOMContentLoaded", start, { once: true });
+})();
+""" % {
+    "selector": json.dumps(", ".join(CSS_CLOSE_SELECTORS)),
+    "texts": json.dumps(CLOSE_TEXTS),
+    "containers": json.dumps(POPUP_CONTAINERS),
+}
+
+_READ_LOG = """
+(clear) => {
+    const d = window.__popupDismisser;
+    if (!d) return [];
+    const out = d.log.slice();
+    if (clear) { d.log.length = 0; d.save(); }
+    return out;
+}
+"""
+
+
+async def install_popup_dismisser(page: Page) -> None:
+    """
+    Install the auto-dismiss observer on the page's context (every future
+    document) and on the page's current document.
+    """
+    await page.context.add_init_script(AUTO_DISMISS_SCRIPT)
+    await page.evaluate(AUTO_DISMISS_SCRIPT)
+
+
+async def dismissed_popups(page: Page, clear: bool = False) -> List[Dict]:
+    """What the observer dismissed on the current document: [{popup, action, control, url, at}]"""
+    try:
+        return await page.evaluate(_READ_LOG, clear)
+    except Exception:
+        return []
+
+
+async def dismiss_popups(page: Page) -> List[Dict]:
     """
-    Aggressively dismiss popups, modals, and dialogs
-    
-    Strategy:
-    1. Press Escape key (works for many modals)
-    2. Find and click visible close buttons
-    3. Handle dialogs specifically
-    
-    Args:
-        page: Playwright page object
-        attempts: Number of dismissal cycles
+    Make sure the observer runs on this page and return what it has dismissed.
+
+    Kept for callers of the old polling dismisser; it no longer waits or
+    loops, the observer closes popups as they appear.
     """
-    for _ in range(attempts):
-        try:
-            # Escape key first
-            await page.keyboard.press("Escape")
-            await page.wait_for_timeout(150)
-            
-            # Try all close button selectors
-            for sel in CLOSE_SELECTORS:
-                loc = page.locator(sel).filter(has_not=page.locator("[aria-hidden='true']")).first
-                if await loc.is_visible():
-                    try:
-                        await loc.click(timeout=700)
-                        await page.wait_for_timeout(200)
-                    except Exception:
-                        pass
-            
-            # Handle dialog elements specifically
-            dialogs = page.get_by_role("dialog")
-            count = await dialogs.count()
-            for i in range(count):
-                dlg = dialogs.nth(i)
-                if await dlg.is_visible():
-                    inner_close = dlg.locator(", ".join(CLOSE_SELECTORS)).first
-                    if await inner_close.is_visible():
-                        try:
-                            await inner_close.click(timeout=700)
-                            await page.wait_for_timeout(200)
-                        except Exception:
-                            pass
-        except Exception:
-            pass
+    await page.evaluate(AUTO_DISMISS_SCRIPT)
+    return await dismissed_popups(page)
+
+
+def install_popup_dismisser_sync(page) -> None:
+    """install_popup_dismisser() for a sync Playwright page (e.g. nova.page)"""
+    page.context.add_init_script(AUTO_DISMISS_SCRIPT)
+    page.evaluate(AUTO_DISMISS_SCRIPT)
+
 
+def dismissed_popups_sync(page, clear: bool = False) -> List[Dict]:
+    """dismissed_popups() for a sync Playwright page"""
+    try:
+        return page.evaluate(_READ_LOG, clear)
+    except Exception:
+        return []
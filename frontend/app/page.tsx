@@ -9,7 +9,7 @@ import { KeywordChips } from '@/components/KeywordChips';
 import { Header } from '@/components/Header';
 import { useJobStatus } from '@/hooks/useJobStatus';
 import { useAuth } from '@/hooks/useAuth';
-import { getPreferences } from '@/lib/api';
+import { getPreferences, importKnotJSONs } from '@/lib/api';
 
 export default function Home() {
   const [stage, setStage] = useState<Stage>('search');
@@ -20,6 +20,7 @@ export default function Home() {
   const [jobId, setJobId] = useState<string | null>(null);
   const [platforms, setPlatforms] = useState<PlatformSummary[]>([]);
   const [preferences, setPreferences] = useState<string[]>([]);
+  const [importedJobId, setImportedJobId] = useState<string | null>(null);
   
   const { data: jobStatus } = useJobStatus(jobId);
   const { token } = useAuth();
@@ -91,6 +92,14 @@ export default function Home() {
     loadComparison();
   }
   
+  // Save this job's orders (its own knot_api_jsons) to the signed-in user's history
+  useEffect(() => {
+    if (jobId && token && jobStatus?.status === 'success' && importedJobId !== jobId) {
+      setImportedJobId(jobId);
+      importKnotJSONs(token, jobId).catch((err) => console.error('Error importing orders:', err));
+    }
+  }, [jobId, token, jobStatus?.status, importedJobId]);
+  
   // Reset to stage 1
   const handleReset = () => {
     setStage('search');
@@ -9,6 +9,69 @@ interface JobStatusData {
   cart_count: number;
   knot_api_count: number;
   message?: string;
+  queue_position?: number | null;
+  eta_seconds?: number | null;
+  current_item?: string | null;
+}
+
+interface JobEvent {
+  id: number;
+  type: string;
+  data: Record<string, any>;
+}
+
+const INITIAL_STATUS: JobStatusData = {
+  status: 'pending',
+  cart_count: 0,
+  knot_api_count: 0,
+};
+
+function isTerminal(status: JobStatus) {
+  return status === 'success' || status === 'error';
+}
+
+// Fold one server-sent event into the status shown by the UI
+function applyEvent(prev: JobStatusData, event: JobEvent): JobStatusData {
+  const { data } = event;
+  switch (event.type) {
+    case 'queued':
+      return {
+        ...prev,
+        queue_position: data.queue_position,
+        eta_seconds: data.eta_seconds,
+        message: prev.status === 'pending' ? `Waiting in queue (position ${data.queue_position})` : prev.message,
+      };
+    case 'status':
+      return {
+        ...prev,
+        status: data.status,
+        queue_position: null,
+        cart_count: data.cart_count ?? prev.cart_count,
+        knot_api_count: data.knot_api_count ?? prev.knot_api_count,
+        message: data.status === 'success'
+          ? `Completed successfully. Generated ${data.knot_api_count ?? prev.knot_api_count} platform summaries.`
+          : data.message ?? prev.message,
+      };
+    case 'agent_started':
+      return { ...prev, message: `Started ${data.platform} agent` };
+    case 'item_searching':
+      return { ...prev, current_item: data.item, message: `Searching ${data.platform} for "${data.item}"` };
+    case 'item_result':
+      return {
+        ...prev,
+        message: data.success
+          ? `Added "${data.item}" on ${data.platform}`
+          : `Could not add "${data.item}" on ${data.platform}`,
+      };
+    case 'agent_finished':
+      return { ...prev, message: `${data.platform} agent ${data.success ? 'finished' : 'failed'}` };
+    case 'stage':
+      return data.stage === 'knot' ? { ...prev, message: 'Building price comparison' } : prev;
+    case 'artifacts':
+      return { ...prev, cart_count: data.cart_count, knot_api_count: data.knot_api_count };
+    default:
+      return prev;
+  }
 }
 
 export function useJobStatus(jobId: string | null) {
@@ -20,10 +83,13 @@ export function useJobStatus(jobId: string | null) {
     
     let isMounted = true;
     let timeoutId: NodeJS.Timeout;
+    let source: EventSource | null = null;
+    let finished = false;
     
+    // Fallback when the event stream is unavailable
     async function poll() {
       try {
-        const result = await api.getDriverStatus(jobId);
+        const result = await api.getDriverStatus(jobId!);
         if (isMounted) {
           setData(result);
           
@@ -39,14 +105,36 @@ export function useJobStatus(jobId: string | null) {
       }
     }
     
-    poll();
+    if (typeof EventSource === 'undefined') {
+      poll();
+    } else {
+      source = new EventSource(api.driverEventsUrl(jobId));
+      
+      source.onmessage = (msg) => {
+        if (!isMounted) return;
+        const event: JobEvent = JSON.parse(msg.data);
+        if (event.type === 'status' && isTerminal(event.data.status)) {
+          finished = true;
+          source?.close();
+        }
+        setData((prev) => applyEvent(prev ?? INITIAL_STATUS, event));
+      };
+      
+      source.onerror = () => {
+        // Stream dropped before the job finished: switch to polling
+        source?.close();
+        if (isMounted && !finished) {
+          poll();
+        }
+      };
+    }
     
     return () => {
       isMounted = false;
+      source?.close();
       clearTimeout(timeoutId);
     };
   }, [jobId]);
   
   return { data, error };
 }
-
@@ -50,7 +50,7 @@ export const api = {
   },
   
   async startDriver() {
-    return apiFetch<{ job_id: string }>('/run-driver', {
+    return apiFetch<{ job_id: string; queue_position?: number | null }>('/run-driver', {
       method: 'POST',
     });
   },
@@ -62,9 +62,15 @@ export const api = {
       cart_count: number;
       knot_api_count: number;
       message?: string;
+      queue_position?: number | null;
+      eta_seconds?: number | null;
     }>(`/run-driver/status?job_id=${jobId}`);
   },
   
+  driverEventsUrl(jobId: string) {
+    return `${BASE_URL}/run-driver/${jobId}/events`;
+  },
+  
   async getComparison(jobId: string) {
     return apiFetch<{ job_id: string; platforms: PlatformSummary[] }>(
       `/comparison/${jobId}`
@@ -57,8 +57,9 @@ async function fetchAPI(endpoint: string, token: string, options?: RequestInit)
   return res.json()
 }
 
-export async function importKnotJSONs(token: string) {
-  return fetchAPI('/api/orders/import-knot', token, { method: 'POST' })
+export async function importKnotJSONs(token: string, jobId?: string) {
+  const query = jobId ? `?job_id=${encodeURIComponent(jobId)}` : ''
+  return fetchAPI(`/api/orders/import-knot${query}`, token, { method: 'POST' })
 }
 
 export async function getOrders(token: string, limit = 50, offset = 0): Promise<OrderSummary[]> {